@@ -0,0 +1 @@
+"""Benchmarks for the AaC Document Model plugin, run against synthetic document models and a fake AI service."""
@@ -0,0 +1,143 @@
+"""A local stand-in for an OpenAI-compatible chat completions service with configurable latency and errors."""
+
+import argparse
+import json
+import random
+import threading
+import time
+from hashlib import sha256
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeAIServer:
+    """
+    Answer chat completions with a digest of the prompt after a simulated latency.
+
+    Each request waits latency seconds, plus up to jitter seconds more, and then fails with error_status at the
+    given error_rate or otherwise answers.  Failed requests carry a retry-after-ms header of retry_after_ms so
+    clients retry them quickly.  Responses report usage as one token per four prompt characters.  The server
+    runs on a background thread from start until stop, or for the duration of a with block.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 429,
+        retry_after_ms: int = 10,
+        port: int = 0,
+        seed: int = 0,
+    ):
+        """Create the server, listening on the port or on any free port by default."""
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after_ms = retry_after_ms
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _ChatCompletionHandler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+
+    @property
+    def url(self) -> str:
+        """Get the base URL of the OpenAI-compatible API, as used for AAC_AI_URL."""
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def serve_forever(self) -> None:
+        """Answer requests on this thread until stopped."""
+        self._server.serve_forever()
+
+    def start(self) -> None:
+        """Start answering requests on a background thread."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        """Stop answering requests and close the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        """Start the server."""
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop the server."""
+        self.stop()
+
+    def next_outcome(self) -> tuple[float, bool]:
+        """Draw the delay and whether the next request fails."""
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return delay, failed
+
+
+class _ChatCompletionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):  # noqa: N802
+        fake = self.server.fake
+        request = json.loads(self.rfile.read(int(self.headers["content-length"])))
+        delay, failed = fake.next_outcome()
+        time.sleep(delay)
+        if failed:
+            self._send_json(fake.error_status, {"error": {"message": "Simulated error", "type": "fake_error"}}, {"retry-after-ms": str(fake.retry_after_ms)})
+            return
+
+        prompt = request["messages"][-1]["content"]
+        content = f"```markdown\nSection {sha256(prompt.encode()).hexdigest()[:12]}\n\n# Heading\nBody text for the section.\n```"
+        prompt_tokens = sum(len(message["content"]) for message in request["messages"]) // 4
+        self._send_json(200, {
+            "id": "fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 16, "total_tokens": prompt_tokens + 16},
+        })
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    """Run the fake AI service until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds each request takes.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many more seconds, drawn at random for each request.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="The share of requests that fail.")
+    parser.add_argument("--error-status", type=int, default=429, help="The HTTP status of failed requests.")
+    args = parser.parse_args()
+
+    server = FakeAIServer(args.latency, args.jitter, args.error_rate, args.error_status, port=args.port)
+    print(f"Serving a fake AI service at {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
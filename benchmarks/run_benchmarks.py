@@ -0,0 +1,199 @@
+"""
+Benchmark the document model plugin on synthetic document models against a fake AI service.
+
+Run from the repository root, for example:
+
+    python -m benchmarks.run_benchmarks --sizes small medium
+    python -m benchmarks.run_benchmarks --sizes small medium --save
+
+The median time of each benchmark is compared with the stored baselines, and the run fails if any is slower
+than its baseline by more than the tolerance or has no baseline.  --save stores the times as the new baselines
+instead.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from tempfile import TemporaryDirectory
+from typing import Callable
+from unittest.mock import patch
+
+from benchmarks.fake_ai_server import FakeAIServer
+from benchmarks.synthetic_models import SIZES, ModelSize, write_synthetic_model
+
+
+BASELINES_FILE = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+DEFAULT_SIZES = ["small", "medium"]
+DEFAULT_TOLERANCE = 0.25
+# differences smaller than this are timer noise, whatever the relative change
+MIN_REGRESSION_SECONDS = 0.05
+
+BENCHMARKS = ["parse", "doc_from_model", "write_doc", "vcrm_from_model", "vcrm_to_csv", "vcrm_to_markdown", "vcrm_to_edges_csv", "vcrm_to_summary_csv"]
+
+
+class BenchmarkSettings:
+    """The settings of a benchmark run."""
+
+    def __init__(self, repeat: int = 3, max_workers: int = 16, latency: float = 0.05, jitter: float = 0.0, error_rate: float = 0.0):
+        """Create the settings, with the fake AI service's latency and error rate."""
+        self.repeat = repeat
+        self.max_workers = max_workers
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+    def to_dict(self) -> dict:
+        """Get the settings stored with the baselines."""
+        return dict(vars(self))
+
+
+def _time(function: Callable[[], object], repeat: int) -> float:
+    """Get the median wall-clock time of calling the function."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def run_size(size: ModelSize, settings: BenchmarkSettings, work_dir: str) -> dict[str, float]:
+    """
+    Run every benchmark on a synthetic model of the given size.
+
+    Parsing is timed once, since a model can only be loaded into the language context once.  The document is
+    generated without the response cache or manifest, so every section is requested from the fake AI service.
+    """
+    from aac.context.language_context import LanguageContext
+
+    from aac_doc_mdl.ai_util import get_client
+    from aac_doc_mdl.doc import doc_from_model, vcrm_from_model, vcrm_to_csv, vcrm_to_markdown, write_doc
+    from aac_doc_mdl.doc_prompts import create_document_prompt
+    from aac_doc_mdl.doc_vcrm import vcrm_to_edges_csv, vcrm_to_summary_csv
+
+    architecture_file, title = write_synthetic_model(work_dir, size)
+
+    start = time.perf_counter()
+    definitions = LanguageContext().parse_and_load(architecture_file)
+    results = {"parse": time.perf_counter() - start}
+    model = [definition for definition in definitions if definition.name == title][0].instance
+
+    with FakeAIServer(settings.latency, settings.jitter, settings.error_rate) as server:
+        environment = {"AAC_AI_URL": server.url, "AAC_AI_MODEL": "benchmark", "AAC_AI_KEY": "benchmark", "AAC_AI_TYPE": ""}
+        with patch.dict(os.environ, environment):
+            client, ai_model, _, _ = get_client("benchmark", use_async=True)
+            docs = []
+            results["doc_from_model"] = _time(
+                lambda: docs.append(doc_from_model(model, create_document_prompt, client, ai_model, True, True, 0.2, 0, settings.max_workers)),
+                settings.repeat,
+            )
+
+    results["write_doc"] = _time(lambda: write_doc(work_dir, "doc", docs[-1], False), settings.repeat)
+    vcrms = []
+    results["vcrm_from_model"] = _time(lambda: vcrms.append(vcrm_from_model(model, True)), settings.repeat)
+    results["vcrm_to_csv"] = _time(lambda: vcrm_to_csv(vcrms[-1], os.path.join(work_dir, "vcrm.csv")), settings.repeat)
+    results["vcrm_to_markdown"] = _time(lambda: vcrm_to_markdown(vcrms[-1], os.path.join(work_dir, "vcrm.md")), settings.repeat)
+    results["vcrm_to_edges_csv"] = _time(lambda: vcrm_to_edges_csv(vcrms[-1], os.path.join(work_dir, "vcrm-edges.csv")), settings.repeat)
+    results["vcrm_to_summary_csv"] = _time(lambda: vcrm_to_summary_csv(vcrms[-1], os.path.join(work_dir, "vcrm-summary.csv")), settings.repeat)
+    return results
+
+
+def run_benchmarks(sizes: list[ModelSize], settings: BenchmarkSettings, on_size: Callable[[str, dict[str, float]], None] = None) -> dict[str, dict[str, float]]:
+    """
+    Run the benchmarks for each size, returning the median seconds of each benchmark by size name.
+
+    on_size is given the name and results of each size as soon as they are available.
+    """
+    results = {}
+    with TemporaryDirectory() as work_dir:
+        for size in sizes:
+            size_dir = os.path.join(work_dir, size.name)
+            os.mkdir(size_dir)
+            results[size.name] = run_size(size, settings, size_dir)
+            if on_size is not None:
+                on_size(size.name, results[size.name])
+    return results
+
+
+def find_regressions(results: dict[str, dict[str, float]], baselines: dict[str, dict[str, float]], tolerance: float) -> list[str]:
+    """Describe each benchmark that is slower than its baseline by more than the tolerance, or that has no baseline."""
+    regressions = []
+    for size_name, size_results in results.items():
+        for benchmark, seconds in size_results.items():
+            baseline = baselines.get(size_name, {}).get(benchmark)
+            if baseline is None:
+                regressions.append(f"{size_name} {benchmark}: no baseline, record one with --save")
+                continue
+            if seconds > baseline * (1 + tolerance) and seconds - baseline > MIN_REGRESSION_SECONDS:
+                regressions.append(f"{size_name} {benchmark}: {seconds:.3f}s is {seconds / baseline - 1:.0%} slower than the {baseline:.3f}s baseline")
+    return regressions
+
+
+def load_baselines(file_path: str) -> dict:
+    """Load the stored baselines, or none if the file does not exist."""
+    if not os.path.exists(file_path):
+        return {"settings": {}, "results": {}}
+    with open(file_path) as baselines_file:
+        return json.load(baselines_file)
+
+
+def save_baselines(file_path: str, results: dict[str, dict[str, float]], settings: BenchmarkSettings) -> None:
+    """Store the results as the baselines of their sizes, keeping the baselines of other sizes."""
+    baselines = load_baselines(file_path)
+    baselines["settings"] = settings.to_dict()
+    baselines["results"].update({size_name: {benchmark: round(seconds, 4) for benchmark, seconds in size_results.items()} for size_name, size_results in results.items()})
+    with open(file_path, "w") as baselines_file:
+        json.dump(baselines, baselines_file, indent=2)
+        baselines_file.write("\n")
+
+
+def _format_results(size_name: str, size_results: dict[str, float], baselines: dict[str, dict[str, float]]) -> str:
+    lines = []
+    for benchmark, seconds in size_results.items():
+        baseline = baselines.get(size_name, {}).get(benchmark)
+        baseline_text = f"{baseline:9.3f}" if baseline is not None else f"{'-':>9}"
+        lines.append(f"{size_name:<8} {benchmark:<20} {seconds:9.3f} {baseline_text}")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] = None) -> int:
+    """Run the benchmarks from the command line, returning the exit status."""
+    parser = argparse.ArgumentParser(description="Benchmark the document model plugin on synthetic document models.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=DEFAULT_SIZES, help="The model sizes to benchmark.")
+    parser.add_argument("--repeat", type=int, default=3, help="The number of times each benchmark runs.  The median is reported.")
+    parser.add_argument("--max-workers", type=int, default=16, help="The number of sections generated at the same time.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds each fake AI request takes.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many more seconds for each fake AI request.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="The share of fake AI requests that are throttled.")
+    parser.add_argument("--baselines", default=BASELINES_FILE, help="The baselines file.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="How much slower than its baseline a benchmark may be.")
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baselines.")
+    args = parser.parse_args(argv)
+
+    settings = BenchmarkSettings(args.repeat, args.max_workers, args.latency, args.jitter, args.error_rate)
+    baselines = load_baselines(args.baselines)
+    print(f"{'size':<8} {'benchmark':<20} {'seconds':>9} {'baseline':>9}")
+    results = run_benchmarks(
+        [SIZES[name] for name in args.sizes],
+        settings,
+        lambda size_name, size_results: print(_format_results(size_name, size_results, baselines["results"]), flush=True),
+    )
+
+    if args.save:
+        save_baselines(args.baselines, results, settings)
+        print(f"Saved the baselines to {args.baselines}")
+        return 0
+    if baselines["settings"] and baselines["settings"] != settings.to_dict():
+        print(f"Warning: the baselines were recorded with different settings: {baselines['settings']}")
+    regressions = find_regressions(results, baselines["results"], args.tolerance)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
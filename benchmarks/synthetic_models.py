@@ -0,0 +1,154 @@
+"""Synthetic AaC document models shaped like the trade study sample, at several sizes."""
+
+import math
+import os
+
+import yaml
+
+
+class ModelSize:
+    """The shape of a synthetic document model."""
+
+    def __init__(self, name: str, sections: int, depth: int, reqs: int, scenarios_per_behavior: int, behaviors_per_section: int = 2):
+        """Create a size with the given number of sections (including the root), tree depth and requirements."""
+        self.name = name
+        self.sections = sections
+        self.depth = depth
+        self.reqs = reqs
+        self.scenarios_per_behavior = scenarios_per_behavior
+        self.behaviors_per_section = behaviors_per_section
+
+    def get_prefix(self) -> str:
+        """Get the prefix of the model names and requirement IDs, unique to the size."""
+        return self.name.upper()
+
+
+SIZES = {
+    size.name: size
+    for size in [
+        ModelSize("tiny", sections=5, depth=2, reqs=20, scenarios_per_behavior=2),
+        ModelSize("small", sections=20, depth=3, reqs=200, scenarios_per_behavior=3),
+        ModelSize("medium", sections=100, depth=4, reqs=2000, scenarios_per_behavior=4),
+        ModelSize("large", sections=400, depth=5, reqs=10000, scenarios_per_behavior=5),
+    ]
+}
+
+
+def get_parent_indexes(sections: int, depth: int) -> list[int]:
+    """
+    Get the index of each section's parent in a tree of the given number of sections, filled level by level.
+
+    The branching factor is chosen so the tree is about depth levels below the root.  The root has no parent,
+    so its entry is -1.
+    """
+    branching = max(2, math.ceil(sections ** (1 / max(1, depth))))
+    return [-1] + [(index - 1) // branching for index in range(1, sections)]
+
+
+def _get_req_id(prefix: str, index: int) -> str:
+    return f"{prefix}-{index + 1:05d}"
+
+
+def _get_parent_req_id(prefix: str, index: int) -> str:
+    return f"{prefix}-P{index + 1:04d}"
+
+
+def _create_spec_documents(size: ModelSize) -> list[dict]:
+    """Create the requirement specification, each requirement tracing to one of a tenth as many parents."""
+    prefix = size.get_prefix()
+    parent_count = max(1, size.reqs // 10)
+    parent_ids = [_get_parent_req_id(prefix, index) for index in range(parent_count)]
+    req_ids = [_get_req_id(prefix, index) for index in range(size.reqs)]
+
+    documents = [
+        {"req_spec": {"name": f"{prefix} Parent Specification", "description": "The parent requirements.", "requirements": parent_ids}},
+        {"req_spec": {"name": f"{prefix} Specification", "description": "The document requirements.", "requirements": req_ids}},
+    ]
+    for index, parent_id in enumerate(parent_ids):
+        documents.append({"req": {"name": f"Parent {index + 1}", "id": parent_id, "shall": f"The document shall meet parent need {index + 1}."}})
+    for index, req_id in enumerate(req_ids):
+        documents.append({"req": {
+            "name": f"Requirement {index + 1}",
+            "id": req_id,
+            "shall": f"The document shall describe topic {index + 1} in enough detail for a reviewer to assess it.",
+            "parents": [parent_ids[index % parent_count]],
+        }})
+    return documents
+
+
+def _create_behavior(section_index: int, behavior_index: int, req_ids: list[list[str]]) -> dict:
+    scenarios = []
+    for scenario_index, scenario_req_ids in enumerate(req_ids):
+        scenarios.append({
+            "name": f"Scenario {section_index}.{behavior_index}.{scenario_index}",
+            "requirements": scenario_req_ids,
+            "given": ["The document file exists."],
+            "when": ["You read the document."],
+            "then": [
+                f"There is a description of item {scenario_index + 1} of behavior {behavior_index + 1}.",
+                "The description cites its sources.",
+            ],
+        })
+    return {
+        "name": f"Behavior {section_index}.{behavior_index}",
+        "description": f"Describe part {behavior_index + 1} of section {section_index}.  Each item is covered in its own paragraph.",
+        "acceptance": [{"name": f"Behavior {section_index}.{behavior_index}", "scenarios": scenarios}],
+    }
+
+
+def _create_model_documents(size: ModelSize) -> tuple[str, list[dict]]:
+    """Create the document model, tracing every requirement from one scenario."""
+    prefix = size.get_prefix()
+    parents = get_parent_indexes(size.sections, size.depth)
+    names = [f"{prefix} Document"] + [f"{prefix} Section {index:04d}" for index in range(1, size.sections)]
+    children: list[list[int]] = [[] for _ in range(size.sections)]
+    for index, parent in enumerate(parents):
+        if parent >= 0:
+            children[parent].append(index)
+
+    scenario_count = size.sections * size.behaviors_per_section * size.scenarios_per_behavior
+    reqs_per_scenario = max(1, math.ceil(size.reqs / scenario_count))
+    req_ids = [_get_req_id(prefix, index) for index in range(size.reqs)]
+
+    documents = []
+    scenario = 0
+    for index, name in enumerate(names):
+        behaviors = []
+        for behavior_index in range(size.behaviors_per_section):
+            scenario_req_ids = []
+            for _ in range(size.scenarios_per_behavior):
+                start = (scenario * reqs_per_scenario) % size.reqs
+                scenario_req_ids.append(req_ids[start:start + reqs_per_scenario])
+                scenario += 1
+            behaviors.append(_create_behavior(index, behavior_index, scenario_req_ids))
+        model = {
+            "name": name,
+            "description": f"Section {index} of the synthetic document.  It summarizes the material of its behaviors and sub-sections.",
+        }
+        if children[index]:
+            model["components"] = [{"name": f"section_{child}", "model": names[child]} for child in children[index]]
+        model["behavior"] = behaviors
+        documents.append({"model": model})
+    return names[0], documents
+
+
+def write_synthetic_model(path: str, size: ModelSize) -> tuple[str, str]:
+    """
+    Write a synthetic document model of the given size into the path.
+
+    The requirements go in a specification file imported by the document model file.  The model names and
+    requirement IDs start with the size's prefix, so models of different sizes can be loaded together.
+
+    Returns:
+        The path of the document model file and the title of its root model.
+    """
+    prefix = size.get_prefix().lower()
+    spec_file_name = f"{prefix}_reqs.aac"
+    with open(os.path.join(path, spec_file_name), "w") as spec_file:
+        yaml.safe_dump_all(_create_spec_documents(size), spec_file, sort_keys=False)
+
+    title, model_documents = _create_model_documents(size)
+    architecture_file = os.path.join(path, f"{prefix}_doc.aac")
+    with open(architecture_file, "w") as model_file:
+        yaml.safe_dump_all([{"import": {"files": [f"./{spec_file_name}"]}}] + model_documents, model_file, sort_keys=False)
+    return architecture_file, title
@@ -12,7 +12,8 @@ runtime_dependencies = [
     "aac ~= 0.4.11",
     "openai ~= 1.30.5",
     "pydantic ~= 2.8.2",
-    "jinja2 ~= 3.1.4"
+    "jinja2 ~= 3.1.4",
+    "pypdf ~= 6.0"
 ]
 
 test_dependencies = [
@@ -38,7 +39,7 @@ setup(
     install_requires=runtime_dependencies,
     setup_requires=test_dependencies,
     tests_require=test_dependencies,
-    extras_require={"test": test_dependencies},
+    extras_require={"test": test_dependencies, "http2": ["h2 ~= 4.1"]},
     entry_points={
         "aac": ["aac-doc-mdl=aac_doc_mdl"],
     },
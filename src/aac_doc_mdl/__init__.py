@@ -15,12 +15,11 @@ from aac.execute.aac_execution_result import ExecutionResult, ExecutionStatus
 from aac.execute.plugin_runner import PluginRunner
 from aac.in_out.files.aac_file import AaCFile
 
-from aac_doc_mdl.document_model_impl import (
-    plugin_name,
-    gen_doc_outline,
-    gen_doc_draft,
-    gen_doc_vcrm,
-)
+from aac_doc_mdl.definition_snapshot import parse_and_load
+
+# The command implementations are imported by the run functions rather than here.  They depend on the AI
+# client, PDF rendering and document model libraries, which are slow to import, and every aac command loads
+# this module when registering plugins.
 
 
 document_model_aac_file_name = "document_model.aac"
@@ -34,6 +33,11 @@ def run_gen_doc_outline(
     parent_reqs: bool,
     output: str,
     temperature: float,
+    max_workers: int,
+    batch_requests: str,
+    batch_results: str,
+    profile: bool,
+    resume: bool,
 ) -> ExecutionResult:
     """
         An AI powered command that uses your model definition to generate an annotated outline of the document with abstracts for each section.  The output is a markdown file and a PDF generated from the markdown.
@@ -48,17 +52,24 @@ def run_gen_doc_outline(
     no_pdf (bool): Instructs the plugin to not generate a PDF file, resulting only in a markdown file.
     gen_eval (bool): Instructs the plugin to generate an evaluation model where descriptions are replaced with AI generated abstracts.  Disabled by default.
     parent_reqs (bool): Tells AaC to include parent requirements from your spec in the metadata output.  Default does not include parent requirements.output (str): The location to output generated document.  Default is current working directory.temperature (float): The temperature passed into the AI text generator.  Default value is 0.1
+    max_workers (int): The maximum number of document sections generated by the AI at the same time.  Default value is 1
+    batch_requests (str): Write the AI requests to this OpenAI Batch API JSONL file instead of generating the document.
+    batch_results (str): Generate the document from this OpenAI Batch API JSONL results file instead of calling the AI.
+    profile (bool): Record per-section latency, token usage, retries and cache hits along with the time of each phase, and write them to JSON and Prometheus files next to the output.
+    resume (bool): Reuse the sections completed by an earlier run that was stopped, instead of starting over.
 
        Returns:
             The results of the execution of the plugin gen-doc-outline command.
     """
 
+    from aac_doc_mdl.document_model_impl import plugin_name, gen_doc_outline
+
     result = ExecutionResult(
         plugin_name, "gen-doc-outline", ExecutionStatus.SUCCESS, []
     )
 
     gen_doc_outline_result = gen_doc_outline(
-        title, architecture_file, no_pdf, gen_eval, parent_reqs, output, temperature
+        title, architecture_file, no_pdf, gen_eval, parent_reqs, output, temperature, max_workers, batch_requests, batch_results, profile, resume
     )
     if not gen_doc_outline_result.is_success():
         return gen_doc_outline_result
@@ -76,6 +87,11 @@ def run_gen_doc_draft(
     content_only: bool,
     parent_reqs: bool,
     temperature: float,
+    max_workers: int,
+    batch_requests: str,
+    batch_results: str,
+    profile: bool,
+    resume: bool,
 ) -> ExecutionResult:
     """
         An AI powered command that uses your model definition to generate an a draft of the document with content for each section.  The output is a markdown file and a PDF generated from the markdown.
@@ -90,15 +106,22 @@ def run_gen_doc_draft(
     no_pdf (bool): Instructs the plugin to not generate a PDF file, resulting only in a markdown file
     output (str): The location to output generated document.  Default is current working directory.content_only (bool): Instructs the plugin to only produce document content, eliminating additional data such as requirements and test information.
     parent_reqs (bool): Tells AaC to include parent requirements from your spec in the metadata output.  Default does not include parent requirements.temperature (float): The temperature passed into the AI text generator.  Default value is 0.2
+    max_workers (int): The maximum number of document sections generated by the AI at the same time.  Default value is 1
+    batch_requests (str): Write the AI requests to this OpenAI Batch API JSONL file instead of generating the document.
+    batch_results (str): Generate the document from this OpenAI Batch API JSONL results file instead of calling the AI.
+    profile (bool): Record per-section latency, token usage, retries and cache hits along with the time of each phase, and write them to JSON and Prometheus files next to the output.
+    resume (bool): Reuse the sections completed by an earlier run that was stopped, instead of starting over.
 
        Returns:
             The results of the execution of the plugin gen-doc-draft command.
     """
 
+    from aac_doc_mdl.document_model_impl import plugin_name, gen_doc_draft
+
     result = ExecutionResult(plugin_name, "gen-doc-draft", ExecutionStatus.SUCCESS, [])
 
     gen_doc_draft_result = gen_doc_draft(
-        title, architecture_file, no_pdf, output, content_only, parent_reqs, temperature
+        title, architecture_file, no_pdf, output, content_only, parent_reqs, temperature, max_workers, batch_requests, batch_results, profile, resume
     )
     if not gen_doc_draft_result.is_success():
         return gen_doc_draft_result
@@ -108,8 +131,50 @@ def run_gen_doc_draft(
     return result
 
 
+def run_gen_doc_all(
+    documents_file: str,
+    no_pdf: bool,
+    output: str,
+    outline: bool,
+    parent_reqs: bool,
+    temperature: float,
+    max_workers: int,
+    profile: bool,
+    resume: bool,
+) -> ExecutionResult:
+    """
+        An AI powered command that generates a draft, or an outline, of every document listed in a documents file.  Every architecture file is parsed once and the sections of all the documents are generated from one queue of AI requests.
+
+        Args:
+            documents_file (str): A path to a YAML file listing the documents, each with a title and an architecture-file.
+    no_pdf (bool): Instructs the plugin to not generate PDF files, resulting only in markdown files.
+    output (str): The location to output generated documents.  Default is current working directory.
+    outline (bool): Generate outlines with abstracts instead of drafts.
+    parent_reqs (bool): Tells AaC to include parent requirements from your spec in the metadata output.  Default does not include parent requirements.
+    temperature (float): The temperature passed into the AI text generator.  Default value is 0.2
+    max_workers (int): The maximum number of document sections generated by the AI at the same time, across all documents.  Default value is 1
+    profile (bool): Record per-section latency, token usage, retries and cache hits along with the time of each phase, and write them to JSON and Prometheus files in the output directory.
+    resume (bool): Reuse the sections completed by an earlier run that was stopped, instead of starting over.
+
+       Returns:
+            The results of the execution of the plugin gen-doc-all command.
+    """
+
+    from aac_doc_mdl.document_model_impl import plugin_name, gen_doc_all
+
+    result = ExecutionResult(plugin_name, "gen-doc-all", ExecutionStatus.SUCCESS, [])
+
+    gen_doc_all_result = gen_doc_all(documents_file, no_pdf, output, outline, parent_reqs, temperature, max_workers, profile, resume)
+    if not gen_doc_all_result.is_success():
+        return gen_doc_all_result
+    else:
+        result.add_messages(gen_doc_all_result.messages)
+
+    return result
+
+
 def run_gen_doc_vcrm(
-    title: str, doc_architecture_file: str, output: str, parent_reqs: bool
+    title: str, doc_architecture_file: str, output: str, parent_reqs: bool, formats: str, watch: bool
 ) -> ExecutionResult:
     """
         Generate a verification cross-reference matrix for you document.  The creates a table with all the requirements as rows, document sections as columns, and an indicator showing the trace from requirement to section.
@@ -118,15 +183,19 @@ def run_gen_doc_vcrm(
             title (str): The name of the root document model.
     doc_architecture_file (str): A path to a YAML file containing an AaC-defined document model to evaluate.
     output (str): The location to output generated document.  Default is current working directory.parent_reqs (bool): Tells AaC to include parent requirements from your spec in the VCRM output.  Default does not include parent requirements.
+    formats (str): A comma separated list of the VCRM formats to write: matrix, edges, edges-jsonl or summary.  Default is matrix.
+    watch (bool): Keep running and rewrite the VCRM each time one of the architecture files changes, until interrupted.
 
        Returns:
             The results of the execution of the plugin gen-doc-vcrm command.
     """
 
+    from aac_doc_mdl.document_model_impl import plugin_name, gen_doc_vcrm
+
     result = ExecutionResult(plugin_name, "gen-doc-vcrm", ExecutionStatus.SUCCESS, [])
 
     gen_doc_vcrm_result = gen_doc_vcrm(
-        title, doc_architecture_file, output, parent_reqs
+        title, doc_architecture_file, output, parent_reqs, formats, watch
     )
     if not gen_doc_vcrm_result.is_success():
         return gen_doc_vcrm_result
@@ -136,6 +205,40 @@ def run_gen_doc_vcrm(
     return result
 
 
+def run_gen_doc_render(
+    doc_file: str, output: str, no_pdf: bool, content_only: bool, parent_reqs: bool, no_parent_reqs: bool, template_dir: str
+) -> ExecutionResult:
+    """
+        Render the markdown, and a PDF generated from it, again from the document tree that gen-doc-outline, gen-doc-draft and gen-doc-all save next to each document.  The AI is not called, so templates and output options can be changed without generating the document again.
+
+        Args:
+            doc_file (str): A path to the document tree file saved next to a generated document.
+    output (str): The location to output the rendered document.  Default is current working directory.
+    no_pdf (bool): Instructs the plugin to not generate a PDF file, resulting only in a markdown file.
+    content_only (bool): Instructs the plugin to only produce document content, eliminating additional data such as requirements and test information.
+    parent_reqs (bool): Tells AaC to include parent requirements in the metadata output.  Default includes them if the document was generated with them.
+    no_parent_reqs (bool): Tells AaC to leave parent requirements out of the metadata output, even if the document was generated with them.
+    template_dir (str): A directory with output templates used in place of the plugin's templates with the same names.
+
+       Returns:
+            The results of the execution of the plugin gen-doc-render command.
+    """
+
+    from aac_doc_mdl.document_model_impl import plugin_name, gen_doc_render
+
+    result = ExecutionResult(plugin_name, "gen-doc-render", ExecutionStatus.SUCCESS, [])
+
+    gen_doc_render_result = gen_doc_render(
+        doc_file, output, no_pdf, content_only, parent_reqs, no_parent_reqs, template_dir
+    )
+    if not gen_doc_render_result.is_success():
+        return gen_doc_render_result
+    else:
+        result.add_messages(gen_doc_render_result.messages)
+
+    return result
+
+
 @hookimpl
 def register_plugin() -> None:
     """
@@ -144,19 +247,21 @@ def register_plugin() -> None:
 
     active_context = LanguageContext()
     document_model_aac_file = join(dirname(__file__), document_model_aac_file_name)
-    definitions = active_context.parse_and_load(document_model_aac_file)
+    definitions = parse_and_load(document_model_aac_file)
 
     document_model_plugin_definition = [
-        definition for definition in definitions if definition.name == plugin_name
+        definition for definition in definitions if definition.get_root_key() == "plugin"
     ][0]
 
     plugin_instance = document_model_plugin_definition.instance
     for file_to_load in plugin_instance.definition_sources:
-        active_context.parse_and_load(file_to_load)
+        parse_and_load(file_to_load)
 
     plugin_runner = PluginRunner(plugin_definition=document_model_plugin_definition)
     plugin_runner.add_command_callback("gen-doc-outline", run_gen_doc_outline)
     plugin_runner.add_command_callback("gen-doc-draft", run_gen_doc_draft)
+    plugin_runner.add_command_callback("gen-doc-all", run_gen_doc_all)
     plugin_runner.add_command_callback("gen-doc-vcrm", run_gen_doc_vcrm)
+    plugin_runner.add_command_callback("gen-doc-render", run_gen_doc_render)
 
     active_context.register_plugin_runner(plugin_runner)
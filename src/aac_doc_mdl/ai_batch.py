@@ -0,0 +1,90 @@
+"""The AaC Document Model plugin offline AI batch files in the OpenAI Batch API JSONL format."""
+
+import json
+from typing import Optional
+
+from aac_doc_mdl.ai_cache import ResponseCache
+
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+AZURE_BATCH_ENDPOINT = "/chat/completions"
+
+
+def get_custom_id(model: str, temperature: float, system_prompt: str, prompt: str) -> str:
+    """
+    Get the batch custom_id for an AI request.
+
+    The id is derived from everything sent to the AI, so it is the same every time the request is made and a
+    results file can only answer the requests it was generated for.
+    """
+    return "section-" + ResponseCache.key(model, temperature, system_prompt, prompt)
+
+
+def write_batch_requests(path: str, model: str, temperature: float, system_prompt: str, prompts: list[str], endpoint: str = BATCH_ENDPOINT) -> int:
+    """Write a Batch API request file with one chat completion per distinct prompt, returning the number of requests."""
+    custom_ids = set()
+    with open(path, "w") as batch_file:
+        for prompt in prompts:
+            custom_id = get_custom_id(model, temperature, system_prompt, prompt)
+            if custom_id in custom_ids:
+                continue
+            custom_ids.add(custom_id)
+            request = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": endpoint,
+                "body": {
+                    "model": model,
+                    "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": prompt}],
+                    "temperature": temperature,
+                },
+            }
+            batch_file.write(json.dumps(request) + "\n")
+    return len(custom_ids)
+
+
+class BatchResults:
+    """
+    The AI responses from a Batch API results file.
+
+    Pass it to generate_all in place of an AI client to produce the document from the batch results.
+    """
+
+    def __init__(self, path: str):
+        """Read the results file, keeping the response or error for each request."""
+        self.path = path
+        self.responses: dict[str, str] = {}
+        self.errors: dict[str, str] = {}
+        with open(path) as batch_file:
+            for line in batch_file:
+                if line.strip():
+                    self._add_result(json.loads(line))
+
+    def _add_result(self, result: dict) -> None:
+        custom_id = result["custom_id"]
+        response = result.get("response") or {}
+        body = response.get("body") or {}
+        if result.get("error"):
+            self.errors[custom_id] = result["error"].get("message", str(result["error"]))
+        elif not response:
+            self.errors[custom_id] = "the line has no response, it is not a Batch API result"
+        elif response.get("status_code") != 200:
+            error = body.get("error") or {}
+            self.errors[custom_id] = error.get("message", f"status code {response.get('status_code')}")
+        else:
+            self.responses[custom_id] = body["choices"][0]["message"]["content"]
+
+    def get_response(self, model: str, temperature: float, system_prompt: str, prompt: str) -> Optional[str]:
+        """Get the response to an AI request, or None if the results have no response for it."""
+        return self.responses.get(get_custom_id(model, temperature, system_prompt, prompt))
+
+    def get_missing_messages(self, model: str, temperature: float, system_prompt: str, prompts: list[str]) -> list[str]:
+        """Describe each prompt that the results cannot answer."""
+        messages = []
+        for index, prompt in enumerate(prompts):
+            custom_id = get_custom_id(model, temperature, system_prompt, prompt)
+            if custom_id in self.errors:
+                messages.append(f"Batch request {custom_id} for section {index + 1} failed: {self.errors[custom_id]}")
+            elif custom_id not in self.responses:
+                messages.append(f"{self.path} has no result for section {index + 1} ({custom_id}).  Was the model changed after the batch requests were written?")
+        return messages
@@ -0,0 +1,176 @@
+"""The AaC Document Model plugin persistent AI response cache."""
+
+import os
+import sqlite3
+import time
+from concurrent.futures import Future
+from hashlib import sha256
+from threading import Lock
+from typing import Callable, Optional
+
+from aac_doc_mdl.env_settings import get_env_number
+
+
+DEFAULT_CACHE_DIR = os.path.join("~", ".cache", "aac-doc-mdl")
+DEFAULT_MAX_MB = 256
+DEFAULT_MAX_AGE_DAYS = 30
+
+CACHE_FILE_NAME = "ai_responses.sqlite"
+
+
+class ResponseCache:
+    """
+    An on-disk cache of AI responses keyed on a hash of everything that was sent to the AI.
+
+    Entries older than max_age_days are dropped and the least recently used entries are evicted once the
+    stored responses exceed max_bytes.  Identical requests made at the same time during a run share a single
+    call to the AI.
+    """
+
+    def __init__(self, path: str, max_bytes: int, max_age_days: float):
+        """Open (or create) the cache database at the given path."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 24 * 60 * 60
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self._lock = Lock()
+        self._in_flight: dict[str, Future] = {}
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._connection.commit()
+        self.evict()
+
+    @staticmethod
+    def key(model: str, temperature: float, system_prompt: str, prompt: str) -> str:
+        """Create the cache key for an AI request."""
+        digest = sha256()
+        for part in (model, repr(float(temperature)), system_prompt, prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up a cached response, returning None if there isn't one."""
+        with self._lock:
+            return self._get(key)
+
+    def get_many(self, keys: list[str]) -> dict[str, str]:
+        """Look up several keys at once, returning the cached responses by key.  Repeated keys are counted as shared requests."""
+        responses = {}
+        looked_up = set()
+        with self._lock:
+            for key in keys:
+                if key in looked_up:
+                    self.shared += 1
+                    continue
+                looked_up.add(key)
+                response = self._get(key)
+                if response is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    responses[key] = response
+        return responses
+
+    def put(self, key: str, response: str) -> None:
+        """Store a response in the cache."""
+        with self._lock:
+            self._put(key, response)
+
+    def get_or_generate(self, key: str, generate_func: Callable[[], str]) -> str:
+        """Return the cached response for the key, calling generate_func at most once per key if there isn't one."""
+        generate_here = False
+        with self._lock:
+            response = self._get(key)
+            if response is not None:
+                self.hits += 1
+                return response
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.shared += 1
+            else:
+                self.misses += 1
+                future = self._in_flight[key] = Future()
+                generate_here = True
+        if not generate_here:
+            return future.result()
+
+        try:
+            response = generate_func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(response)
+            with self._lock:
+                self._put(key, response)
+            return response
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def evict(self) -> None:
+        """Remove expired entries and trim the cache to its size limit, least recently used first."""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.max_age_seconds,))
+            total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._connection.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall()
+                expired = []
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    expired.append((key,))
+                    total -= size
+                self._connection.executemany("DELETE FROM responses WHERE key = ?", expired)
+            self._connection.commit()
+
+    def close(self) -> None:
+        """Apply the eviction policy and close the cache database."""
+        self.evict()
+        self._connection.close()
+
+    def get_stats_message(self) -> str:
+        """Describe the cache activity for this run."""
+        return f"AI response cache: {self.hits} hits, {self.misses} misses, {self.shared} shared in-flight requests"
+
+    def _get(self, key: str) -> Optional[str]:
+        row = self._connection.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._connection.commit()
+        return row[0]
+
+    def _put(self, key: str, response: str) -> None:
+        now = time.time()
+        self._connection.execute(
+            "INSERT OR REPLACE INTO responses (key, response, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, response, len(response.encode("utf-8")), now, now),
+        )
+        self._connection.commit()
+
+
+def get_cache() -> Optional[ResponseCache]:
+    """Get the AI response cache configured by the environment, or None if caching is disabled."""
+    aac_ai_cache = os.getenv("AAC_AI_CACHE")
+    if aac_ai_cache is not None and aac_ai_cache.lower() == "false":
+        return None
+
+    aac_ai_cache_dir = os.getenv("AAC_AI_CACHE_DIR")
+    if aac_ai_cache_dir is None or aac_ai_cache_dir == "":
+        aac_ai_cache_dir = DEFAULT_CACHE_DIR
+    max_mb = get_env_number("AAC_AI_CACHE_MAX_MB", DEFAULT_MAX_MB)
+    max_age_days = get_env_number("AAC_AI_CACHE_MAX_AGE_DAYS", DEFAULT_MAX_AGE_DAYS)
+
+    cache_path = os.path.join(os.path.expanduser(aac_ai_cache_dir), CACHE_FILE_NAME)
+    return ResponseCache(cache_path, int(max_mb * 1024 * 1024), max_age_days)
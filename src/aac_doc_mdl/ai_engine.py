@@ -0,0 +1,299 @@
+"""The AaC Document Model plugin asynchronous AI generation engine."""
+
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+from openai import APIConnectionError, APIStatusError
+
+from aac_doc_mdl.ai_transport import get_client_pool
+from aac_doc_mdl.doc_metrics import RequestStats
+from aac_doc_mdl.doc_prompts import estimate_tokens
+from aac_doc_mdl.env_settings import get_env_number
+
+
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 60.0
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+class TokenBucket:
+    """A token bucket refilled continuously at a per minute rate."""
+
+    def __init__(self, per_minute: float):
+        """Create a full bucket holding one minute of tokens."""
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1) -> None:
+        """Wait until the amount is available and take it from the bucket."""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+    def consume(self, amount: float) -> None:
+        """Take tokens without waiting, leaving the bucket in debt if needed."""
+        self._refill()
+        self.tokens -= amount
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class AdaptiveLimiter:
+    """
+    Limit the number of requests in flight using additive increase, multiplicative decrease (AIMD).
+
+    The limit grows by about one per limit's worth of successful requests and is halved each time the AI
+    service throttles a request.
+    """
+
+    def __init__(self, max_limit: int):
+        """Start at the maximum limit."""
+        self.max_limit = max(1, max_limit)
+        self.limit = float(self.max_limit)
+        self.active = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        """Wait for a free request slot."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < int(self.limit))
+            self.active += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Release the request slot."""
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        """Additively increase the limit."""
+        self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+    def on_throttle(self) -> None:
+        """Multiplicatively decrease the limit."""
+        self.limit = max(1.0, self.limit / 2)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Check if an AI request error is transient and worth retrying.  Requests that timed out are retried."""
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    # asyncio.TimeoutError is only an alias of TimeoutError from Python 3.11
+    return isinstance(error, (APIConnectionError, TimeoutError, asyncio.TimeoutError))
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Get the delay in seconds requested by the AI service's Retry-After headers, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+
+    retry_after_ms = response.headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = response.headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return None
+
+
+def _get_task_responses(tasks: list[asyncio.Task], cancelled: set[asyncio.Task], on_error) -> list[Optional[str]]:
+    """Get the responses of finished request tasks, raising the first failure unless failures go to on_error."""
+    if on_error is None:
+        for task in tasks:
+            if task not in cancelled and task.exception() is not None:
+                raise task.exception()
+    responses = []
+    for index, task in enumerate(tasks):
+        if task not in cancelled:
+            responses.append(task.result())
+            continue
+        if on_error is None:
+            raise TimeoutError("The run deadline passed before every AI request finished")
+        on_error(index, TimeoutError("The run deadline passed before the AI responded"))
+        responses.append(None)
+    return responses
+
+
+class GenerationEngine:
+    """Run AI chat completions concurrently on an asyncio event loop within the service's rate limits."""
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        system_prompt: str,
+        max_workers: int,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_base: float = DEFAULT_BACKOFF_BASE,
+        backoff_max: float = DEFAULT_BACKOFF_MAX,
+        request_timeout: Optional[float] = None,
+    ):
+        """Create an engine for an AsyncOpenAI or AsyncAzureOpenAI client.  Each request attempt is given up after request_timeout seconds, if set."""
+        self.client = client
+        self.model = model
+        self.system_prompt = system_prompt
+        self.max_workers = max_workers
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.request_timeout = request_timeout
+        self.retries = 0
+        self.throttled = 0
+
+    @classmethod
+    def from_env(cls, client, model: str, system_prompt: str, max_workers: int):
+        """Create an engine with rate limits, timeout and retry policy from the AAC_AI_* environment variables."""
+        return cls(
+            client,
+            model,
+            system_prompt,
+            max_workers,
+            requests_per_minute=get_env_number("AAC_AI_RPM", None),
+            tokens_per_minute=get_env_number("AAC_AI_TPM", None),
+            max_retries=get_env_number("AAC_AI_MAX_RETRIES", DEFAULT_MAX_RETRIES),
+            backoff_base=get_env_number("AAC_AI_BACKOFF_BASE", DEFAULT_BACKOFF_BASE),
+            backoff_max=get_env_number("AAC_AI_BACKOFF_MAX", DEFAULT_BACKOFF_MAX),
+            request_timeout=get_env_number("AAC_AI_REQUEST_TIMEOUT", None),
+        )
+
+    def generate_all(
+        self,
+        temp: float,
+        prompts: list[str],
+        on_response: Callable[[int, str], None] = None,
+        on_stats: Callable[[int, RequestStats], None] = None,
+        on_error: Callable[[int, Exception], None] = None,
+        deadline: Optional[float] = None,
+    ) -> list[str]:
+        """
+        Generate the responses for all prompts, returned in the same order as the prompts.
+
+        If given, on_response is called with the prompt index and response as soon as each response arrives,
+        just after on_stats is called with the prompt index and the request's latency, token usage and retries.
+        The requests run on the shared client pool's event loop, which the pooled connections belong to.
+
+        Without on_error, the first request that fails after its retries fails the whole call.  With it, each
+        failure is passed to on_error with the prompt index, the other requests carry on and the failed prompt's
+        response is None.  Requests still unfinished at the deadline, a time.monotonic() time, are cancelled and
+        fail with a TimeoutError.
+        """
+        return get_client_pool().run(self._generate_all(temp, prompts, on_response, on_stats, on_error, deadline))
+
+    async def _generate_all(self, temp: float, prompts: list[str], on_response, on_stats, on_error, deadline) -> list[Optional[str]]:
+        # the rate limiting primitives must be created on the running event loop
+        self._limiter = AdaptiveLimiter(self.max_workers)
+        self._request_bucket = TokenBucket(self.requests_per_minute) if self.requests_per_minute else None
+        self._token_bucket = TokenBucket(self.tokens_per_minute) if self.tokens_per_minute else None
+
+        async def generate_one(index: int, prompt: str) -> Optional[str]:
+            start = time.perf_counter()
+            try:
+                response, usage, retries = await self._generate(temp, prompt)
+            except Exception as error:
+                if on_error is None:
+                    raise
+                on_error(index, error)
+                return None
+            if on_stats is not None:
+                on_stats(index, RequestStats.from_usage(time.perf_counter() - start, usage, retries))
+            if on_response is not None:
+                on_response(index, response)
+            return response
+
+        tasks = [asyncio.ensure_future(generate_one(index, prompt)) for index, prompt in enumerate(prompts)]
+        if not tasks:
+            return []
+        timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+        _, pending = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.ALL_COMPLETED if on_error is not None else asyncio.FIRST_EXCEPTION)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return _get_task_responses(tasks, pending, on_error)
+
+    async def _generate(self, temp: float, prompt: str) -> tuple[str, object, int]:
+        """Send a request, retrying transient errors, and return the response, its token usage and the number of retries."""
+        # charged against the tokens-per-minute budget before the request is sent
+        estimated_tokens = estimate_tokens(self.system_prompt + prompt)
+        attempt = 0
+        while True:
+            if self._request_bucket is not None:
+                await self._request_bucket.acquire()
+            if self._token_bucket is not None:
+                await self._token_bucket.acquire(estimated_tokens)
+
+            async with self._limiter:
+                try:
+                    r = await self._create(temp, prompt)
+                except Exception as e:
+                    error = e
+                else:
+                    self._limiter.on_success()
+                    usage = getattr(r, "usage", None)
+                    if self._token_bucket is not None and usage is not None and usage.total_tokens > estimated_tokens:
+                        self._token_bucket.consume(usage.total_tokens - estimated_tokens)
+                    return r.choices[0].message.content, usage, attempt
+
+            if isinstance(error, APIStatusError) and error.status_code == 429:
+                self.throttled += 1
+                self._limiter.on_throttle()
+            delay = self._get_retry_delay(error, attempt)
+            if delay is None:
+                raise error
+            self.retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _get_retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Get the seconds to wait before retrying a request that failed on the given attempt, or None if it is not retried."""
+        if not is_retryable(error) or attempt >= self.max_retries:
+            return None
+        delay = get_retry_after(error)
+        if delay is None:
+            # exponential backoff with full jitter
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return delay
+
+    async def _create(self, temp: float, prompt: str):
+        """Send one request, giving up after the request timeout."""
+        request = self.client.chat.completions.create(
+            messages=[{"role": "system", "content": self.system_prompt}, {"role": "user", "content": prompt}],
+            model=self.model,
+            temperature=temp,
+        )
+        if self.request_timeout is None:
+            return await request
+        try:
+            return await asyncio.wait_for(request, self.request_timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"The AI request took more than {self.request_timeout:g}s") from None
@@ -0,0 +1,144 @@
+"""The AaC Document Model plugin pooled HTTP transport shared by the AI clients."""
+
+import asyncio
+import atexit
+import os
+import threading
+from typing import Callable, Optional
+
+import httpx
+
+from aac_doc_mdl.env_settings import get_env_number
+
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE = 20
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 600.0
+
+
+class TransportSettings:
+    """The connection pool, keep-alive, HTTP/2 and timeout settings of the AI clients' HTTP transport."""
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive: int = DEFAULT_MAX_KEEPALIVE,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        http2: bool = False,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+    ):
+        """Create the settings, keeping no more idle connections than the pool can hold."""
+        self.max_connections = max_connections
+        self.max_keepalive = min(max_keepalive, max_connections)
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+    @classmethod
+    def from_env(cls):
+        """Create the settings from the AAC_AI_* environment variables."""
+        return cls(
+            max_connections=get_env_number("AAC_AI_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS),
+            max_keepalive=get_env_number("AAC_AI_MAX_KEEPALIVE", DEFAULT_MAX_KEEPALIVE),
+            keepalive_expiry=get_env_number("AAC_AI_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY),
+            http2=os.getenv("AAC_AI_HTTP2", "").lower() == "true",
+            connect_timeout=get_env_number("AAC_AI_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT),
+            read_timeout=get_env_number("AAC_AI_READ_TIMEOUT", DEFAULT_READ_TIMEOUT),
+        )
+
+    def get_key(self) -> tuple:
+        """Get a key identifying these settings."""
+        return (self.max_connections, self.max_keepalive, self.keepalive_expiry, self.http2, self.connect_timeout, self.read_timeout)
+
+    def get_limits(self) -> httpx.Limits:
+        """Get the connection pool limits."""
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def get_timeout(self) -> httpx.Timeout:
+        """Get the request timeouts.  Writing a request and waiting for a pooled connection share the read timeout."""
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+
+def create_http_client(settings: TransportSettings, verify: bool, proxies: dict[str, str], use_async: bool = False):
+    """
+    Create a pooled httpx client.
+
+    proxies maps URL patterns such as "http://" and "https://" to proxy URLs.  Each proxy gets its own pooled
+    transport with the same settings, and requests to other URLs use the client's default transport.
+    """
+    client_class, transport_class = (httpx.AsyncClient, httpx.AsyncHTTPTransport) if use_async else (httpx.Client, httpx.HTTPTransport)
+    options = {"verify": verify, "http2": settings.http2, "limits": settings.get_limits()}
+    mounts = {pattern: transport_class(proxy=proxy, **options) for pattern, proxy in proxies.items() if proxy}
+    return client_class(timeout=settings.get_timeout(), mounts=mounts or None, **options)
+
+
+class ClientPool:
+    """
+    The AI clients shared by every command run in a process.
+
+    A client is created the first time it is asked for with a given configuration and reused after that, so
+    its pooled connections are kept alive between requests and between commands.  Async clients belong to
+    the pool's event loop, which run uses to run the coroutines that call them.  The clients are closed when
+    the process exits.
+    """
+
+    def __init__(self):
+        """Create an empty pool."""
+        self._clients: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    def get(self, key: tuple, create_client: Callable[[], object]):
+        """Get the client for the key, creating it if there is none yet."""
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = create_client()
+                self._clients[key] = client
+            return client
+
+    def run(self, coroutine):
+        """
+        Run a coroutine to completion on the pool's event loop.
+
+        The loop is kept between calls so the connections of the async clients stay usable.  Calls from
+        different threads take turns.
+        """
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+            return self._loop.run_until_complete(coroutine)
+
+    def close(self) -> None:
+        """Close every client and the event loop."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            # httpx async clients close with aclose, the openai async clients with an awaitable close
+            closing = (getattr(client, "aclose", None) or client.close)()
+            if asyncio.iscoroutine(closing):
+                self.run(closing)
+        with self._loop_lock:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+                self._loop.close()
+            self._loop = None
+
+
+_client_pool = ClientPool()
+atexit.register(_client_pool.close)
+
+
+def get_client_pool() -> ClientPool:
+    """Get the process's shared AI client pool."""
+    return _client_pool
@@ -1,8 +1,10 @@
 """The AaC Document Model plugin AI utility implementation."""
 
+import importlib.util
 import os
-import httpx
-from openai import (OpenAI, AzureOpenAI)
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 
 from aac.execute.aac_execution_result import (
     ExecutionResult,
@@ -11,6 +13,10 @@ from aac.execute.aac_execution_result import (
     MessageLevel,
 )
 
+from aac_doc_mdl.ai_batch import BatchResults
+from aac_doc_mdl.doc_metrics import SOURCE_BATCH, SOURCE_CACHE, RequestStats
+from aac_doc_mdl.env_settings import get_env_number
+
 
 DOC_MDL_SYSTEM_PROMPT = """
 You are an expert technical writer with over 20 years of experience writing high quality professional technical documents.  Your experience includes creating technical proposals, technical processes, and technical design documentation.  You understand the critical importance of compliance and completeness.  You also understand in the importance of concise text, using the right word rather than arbitrarily substituting alternatives, and maintaining a highly professional tone.  You understand that readers prefer technical content is short direct sentences to ease comprehension.  You understand that you are not the expert in the content and emphasize ensuring your stakeholder guidance and requirements are addressed in documents you create.  You never make stuff up.  You adhere strictly to facts in your document creation to ensure you establish and maintain trust with the reader.  You don't repeat yourself.
@@ -19,8 +25,16 @@ The next document you write will be your best ever.  It will precisely adhere to
 """
 
 
-def get_client(plugin_name: str):
-    """Get the client for the AI model."""
+def get_client(plugin_name: str, use_async: bool = False):
+    """
+    Get the client for the AI model.
+
+    When use_async is set the client is an AsyncOpenAI or AsyncAzureOpenAI client for use with the
+    GenerationEngine, which handles retries itself.
+
+    Clients are shared by every call in the process with the same configuration and use a pooled HTTP
+    transport configured by the AAC_AI_* environment variables, see TransportSettings.
+    """
 
     # returns client, model, error_bool, execution_result_if_error
     aac_ai_url = os.getenv("AAC_AI_URL")
@@ -76,30 +90,58 @@ def get_client(plugin_name: str):
     if not aac_ssl_verify:
         print("WARNING: SSL verification is disabled.")
 
+    # the AI client libraries are slow to import, so they are only imported once a client is needed
+    from aac_doc_mdl.ai_transport import TransportSettings
+
+    transport_settings = TransportSettings.from_env()
+    if transport_settings.http2 and importlib.util.find_spec("h2") is None:
+        return None, None, True, ExecutionResult(
+            plugin_name,
+            "Shall statement quality",
+            ExecutionStatus.GENERAL_FAILURE,
+            [
+                ExecutionMessage(
+                    "AAC_AI_HTTP2 is true but the h2 package is not installed.  Install it with `pip install aac-doc-mdl[http2]`.",
+                    MessageLevel.ERROR,
+                    None,
+                    None,
+                )
+            ],
+        )
+
+    proxies = {}
     if ((aac_http_proxy is not None and len(aac_http_proxy) > 0)
             or (aac_https_proxy is not None and len(aac_https_proxy) > 0)):
-
-        # return client with proxy configuration
         print("INFO: Using proxy configuration.")
         proxies = {'http://': aac_http_proxy, 'https://': aac_https_proxy}
-        http_client = httpx.Client(proxies=proxies, verify=aac_ssl_verify)
-        if use_az:
-            return AzureOpenAI(
-                azure_endpoint=aac_ai_url,
-                api_key=aac_ai_key,
-                api_version=aac_ai_api_version,
-                http_client=http_client), aac_ai_model, False, None
-        else:
-            return OpenAI(base_url=aac_ai_url, api_key=aac_ai_key, http_client=http_client), aac_ai_model, False, None
-
-    # return client without proxy configuration
-    if use_az:
-        return AzureOpenAI(
-            azure_endpoint=aac_ai_url,
-            api_key=aac_ai_key,
-            api_version=aac_ai_api_version), aac_ai_model, False, None
+
+    client = _get_shared_client(use_async, use_az, aac_ai_url, aac_ai_key, aac_ai_api_version, proxies, aac_ssl_verify, transport_settings)
+    return client, aac_ai_model, False, None
+
+
+def _get_shared_client(use_async, use_az, url, key, api_version, proxies, ssl_verify, transport_settings):
+    """Get the pooled client for the configuration, creating it the first time the configuration is used."""
+    from openai import (OpenAI, AzureOpenAI, AsyncOpenAI, AsyncAzureOpenAI)
+    from aac_doc_mdl.ai_engine import DEFAULT_MAX_RETRIES
+    from aac_doc_mdl.ai_transport import create_http_client, get_client_pool
+
+    if use_async:
+        openai_class, azure_openai_class = AsyncOpenAI, AsyncAzureOpenAI
+        # the GenerationEngine handles retries itself
+        max_retries = 0
     else:
-        return OpenAI(base_url=aac_ai_url, api_key=aac_ai_key), aac_ai_model, False, None
+        openai_class, azure_openai_class = OpenAI, AzureOpenAI
+        max_retries = get_env_number("AAC_AI_MAX_RETRIES", DEFAULT_MAX_RETRIES)
+
+    def create_client():
+        http_client = create_http_client(transport_settings, ssl_verify, proxies, use_async)
+        client_options = {"http_client": http_client, "timeout": transport_settings.get_timeout(), "max_retries": max_retries}
+        if use_az:
+            return azure_openai_class(azure_endpoint=url, api_key=key, api_version=api_version, **client_options)
+        return openai_class(base_url=url, api_key=key, **client_options)
+
+    client_key = (use_async, use_az, url, key, api_version, tuple(sorted(proxies.items())), ssl_verify, transport_settings.get_key(), max_retries)
+    return get_client_pool().get(client_key, create_client)
 
 
 def generate(client, model, temp, prompt):
@@ -117,10 +159,163 @@ def generate(client, model, temp, prompt):
     """
     # response = "AI response goes here"
     # return response
+    response, _ = _generate_with_stats(client, model, temp, prompt)
+    return response
+
+
+def _generate_with_stats(client, model, temp, prompt) -> tuple[str, RequestStats]:
+    """Generate an AI response, also returning the time it took and the tokens it used."""
+    start = time.perf_counter()
     r = client.chat.completions.create(
         messages=[{"role": "system", "content": DOC_MDL_SYSTEM_PROMPT}, {"role": "user", "content": prompt}],
         model=model,
         temperature=temp,
     )
-    response = r.choices[0].message.content
-    return response
+    return r.choices[0].message.content, RequestStats.from_usage(time.perf_counter() - start, getattr(r, "usage", None))
+
+
+def generate_all(client, model, temp, prompts, max_workers=1, cache=None, on_response=None, on_stats=None, on_error=None, deadline=None):
+    """
+    Generate AI responses for a list of prompts.
+
+    Args:
+        client: The client for the AI model.  Async clients are run through the rate limited GenerationEngine,
+            and BatchResults answer the prompts from an offline batch results file.
+        model: The AI model to use for generating the responses.
+        temp:  The Gen AI temperature parameter to control variability (0-1) with lower values being less 'creative'.
+        prompts: The input prompts for generating the responses.
+        max_workers: The maximum number of requests sent to the AI model at the same time.
+        cache: An optional ResponseCache used to reuse responses from earlier requests.
+        on_response: An optional callback given the prompt index and response as soon as each response is available.
+            It is always called on the calling thread.
+        on_stats: An optional callback given the prompt index and the RequestStats of its response, called just
+            before on_response.
+        on_error: An optional callback given the prompt index and the error of each request that failed after its
+            retries.  Without it the first failure is raised.  With it the other requests carry on.
+        deadline: An optional time.monotonic() time after which requests still waiting fail with a TimeoutError.
+
+    Returns:
+        The generated AI responses in the same order as the prompts, with None for any that failed.
+    """
+    from openai import AsyncOpenAI
+
+    if isinstance(client, AsyncOpenAI):
+        return _generate_all_async(client, model, temp, prompts, max_workers, cache, on_response, on_stats, on_error, deadline)
+    if isinstance(client, BatchResults):
+        return _generate_all_from_batch(client, model, temp, prompts, cache, on_response, on_stats)
+    return _generate_all_threaded(client, model, temp, prompts, max_workers, cache, on_response, on_stats, on_error, deadline)
+
+
+def _generate_all_threaded(client, model, temp, prompts, max_workers, cache, on_response, on_stats, on_error, deadline):
+    """Generate AI responses with a synchronous client, using a thread for each request in flight."""
+
+    def generate_one(prompt):
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError("The run deadline passed before the AI request was sent")
+        return _generate_cached(client, model, temp, prompt, cache)
+
+    def deliver(index, get_result):
+        try:
+            response, stats = get_result()
+        except Exception as error:
+            if on_error is None:
+                raise
+            on_error(index, error)
+            return
+        responses[index] = response
+        _notify(on_response, on_stats, index, response, stats)
+
+    responses = [None] * len(prompts)
+    if max_workers <= 1 or len(prompts) <= 1:
+        for index, prompt in enumerate(prompts):
+            deliver(index, partial(generate_one, prompt))
+        return responses
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(prompts))) as executor:
+        futures = {executor.submit(generate_one, prompt): index for index, prompt in enumerate(prompts)}
+        for future in as_completed(futures):
+            deliver(futures[future], future.result)
+    return responses
+
+
+def _generate_cached(client, model, temp, prompt, cache) -> tuple[str, RequestStats]:
+    """Generate an AI response with a synchronous client, reusing the cached response if there is one."""
+    if cache is None:
+        return _generate_with_stats(client, model, temp, prompt)
+    generated = []
+
+    def generate_and_keep_stats():
+        response, stats = _generate_with_stats(client, model, temp, prompt)
+        generated.append(stats)
+        return response
+
+    key = cache.key(model, temp, DOC_MDL_SYSTEM_PROMPT, prompt)
+    response = cache.get_or_generate(key, generate_and_keep_stats)
+    return response, generated[0] if generated else RequestStats(SOURCE_CACHE)
+
+
+def _notify(on_response, on_stats, index: int, response: str, stats: RequestStats) -> None:
+    """Pass a response's stats and then the response to the callbacks that were given."""
+    if on_stats is not None:
+        on_stats(index, stats)
+    if on_response is not None:
+        on_response(index, response)
+
+
+def _generate_all_async(client, model, temp, prompts, max_workers, cache, on_response, on_stats, on_error=None, deadline=None):
+    """Generate AI responses with the GenerationEngine, looking up the whole batch in the cache first."""
+    from aac_doc_mdl.ai_engine import GenerationEngine
+
+    engine = GenerationEngine.from_env(client, model, DOC_MDL_SYSTEM_PROMPT, max_workers)
+    if cache is None:
+        return engine.generate_all(temp, prompts, on_response, on_stats, on_error, deadline)
+
+    keys = [cache.key(model, temp, DOC_MDL_SYSTEM_PROMPT, prompt) for prompt in prompts]
+    responses = cache.get_many(keys)
+
+    # identical prompts are only sent once
+    missing = {}
+    indexes_by_key = {}
+    for index, (key, prompt) in enumerate(zip(keys, prompts)):
+        if key in responses:
+            _notify(on_response, on_stats, index, responses[key], RequestStats(SOURCE_CACHE))
+        else:
+            missing.setdefault(key, prompt)
+            indexes_by_key.setdefault(key, []).append(index)
+    missing_keys = list(missing)
+
+    generated_stats = {}
+
+    def on_generated_stats(missing_index, stats):
+        generated_stats[missing_keys[missing_index]] = stats
+
+    def on_generated(missing_index, response):
+        key = missing_keys[missing_index]
+        cache.put(key, response)
+        responses[key] = response
+        for position, index in enumerate(indexes_by_key[key]):
+            # repeats of a prompt share the one response
+            _notify(on_response, on_stats, index, response, generated_stats.pop(key) if position == 0 else RequestStats(SOURCE_CACHE))
+
+    def on_generated_error(missing_index, error):
+        for index in indexes_by_key[missing_keys[missing_index]]:
+            on_error(index, error)
+
+    engine.generate_all(temp, list(missing.values()), on_generated, on_generated_stats, on_generated_error if on_error is not None else None, deadline)
+    return [responses.get(key) for key in keys]
+
+
+def _generate_all_from_batch(batch_results, model, temp, prompts, cache, on_response, on_stats):
+    """Answer the prompts from batch results, adding the responses to the cache for later interactive runs."""
+    missing_messages = batch_results.get_missing_messages(model, temp, DOC_MDL_SYSTEM_PROMPT, prompts)
+    if missing_messages:
+        raise ValueError("\n".join(missing_messages))
+
+    responses = []
+    for index, prompt in enumerate(prompts):
+        response = batch_results.get_response(model, temp, DOC_MDL_SYSTEM_PROMPT, prompt)
+        if cache is not None:
+            cache.put(cache.key(model, temp, DOC_MDL_SYSTEM_PROMPT, prompt), response)
+        responses.append(response)
+        _notify(on_response, on_stats, index, response, RequestStats(SOURCE_BATCH))
+    return responses
@@ -0,0 +1,147 @@
+"""The AaC Document Model plugin snapshot cache of parsed architecture files."""
+
+import os
+import pickle
+import tempfile
+from hashlib import sha256
+from importlib.metadata import version
+from typing import Optional
+
+from aac.context.constants import ROOT_KEY_IMPORT
+from aac.context.definition import Definition
+from aac.context.definition_parser import DefinitionParser
+from aac.context.language_context import LanguageContext
+from aac.in_out.parser import parse
+from aac.in_out.paths import sanitize_filesystem_path
+
+
+SNAPSHOT_VERSION = 1
+DEFAULT_SNAPSHOT_DIR = os.path.join("~", ".cache", "aac-doc-mdl", "definitions")
+
+# a file's size, modification time and content hash, or None if it does not exist
+FileFingerprint = Optional[tuple[int, int, str]]
+
+
+class DefinitionSnapshotCache:
+    """
+    An on-disk cache of the parsed definitions of an architecture file and everything it imports.
+
+    Each snapshot records the size, modification time and content hash of every file that was read, along with
+    every file that was imported but missing.  A snapshot is only used if none of those files changed.  Files
+    whose modification time changed are hashed, so touching a file without editing it keeps the snapshot.
+
+    The snapshot holds the definitions as they come out of the parser, before they are loaded into the
+    LanguageContext, because the loaded instances use classes generated at runtime.  Loading the parsed
+    definitions is cheap compared to parsing the YAML again.
+    """
+
+    def __init__(self, directory: str):
+        """Keep snapshots in the given directory."""
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, architecture_file: str) -> list[Definition]:
+        """Parse an architecture file and its imports, reusing the snapshot if nothing changed."""
+        if os.linesep in architecture_file:
+            return parse(architecture_file)
+        file_path = sanitize_filesystem_path(architecture_file)
+        if not os.path.isfile(file_path):
+            return parse(architecture_file)
+
+        snapshot_path = self._get_snapshot_path(file_path)
+        definitions = self._load(snapshot_path)
+        if definitions is not None:
+            self.hits += 1
+            return definitions
+
+        self.misses += 1
+        definitions = parse(architecture_file)
+        self._save(snapshot_path, definitions)
+        return definitions
+
+    def _get_snapshot_path(self, file_path: str) -> str:
+        key = sha256(f"{SNAPSHOT_VERSION}\0{version('aac')}\0{file_path}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def _load(self, snapshot_path: str) -> Optional[list[Definition]]:
+        try:
+            with open(snapshot_path, "rb") as snapshot_file:
+                # the fingerprints are stored ahead of the definitions so a stale snapshot is rejected cheaply
+                fingerprints = pickle.load(snapshot_file)
+                for file_path, fingerprint in fingerprints.items():
+                    if not _is_unchanged(file_path, fingerprint):
+                        return None
+                return pickle.load(snapshot_file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError, ValueError):
+            return None
+
+    def _save(self, snapshot_path: str, definitions: list[Definition]) -> None:
+        fingerprints = {file_path: get_fingerprint(file_path) for file_path in get_source_files(definitions)}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            file_descriptor, partial_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        except OSError:
+            # the definitions were parsed, they just won't be reused by the next command
+            return
+        try:
+            with os.fdopen(file_descriptor, "wb") as snapshot_file:
+                pickle.dump(fingerprints, snapshot_file, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(definitions, snapshot_file, pickle.HIGHEST_PROTOCOL)
+            os.replace(partial_path, snapshot_path)
+        except (OSError, pickle.PicklingError):
+            os.remove(partial_path)
+
+
+def get_source_files(definitions: list[Definition]) -> set[str]:
+    """Get the files the definitions were parsed from, along with every file they import."""
+    source_files = set()
+    for definition in definitions:
+        source_files.add(definition.source.uri)
+        if definition.get_root_key() == ROOT_KEY_IMPORT:
+            # resolved the same way the aac parser resolves imports
+            arch_file_dir = os.path.dirname(os.path.realpath(definition.source.uri))
+            for import_path in definition.structure[ROOT_KEY_IMPORT]["files"] or []:
+                source_files.add(sanitize_filesystem_path(os.path.join(arch_file_dir, import_path.removeprefix(f".{os.path.sep}"))))
+    return source_files
+
+
+def get_fingerprint(file_path: str) -> FileFingerprint:
+    """Get a file's size, modification time and content hash, or None if it cannot be read."""
+    try:
+        stat = os.stat(file_path)
+        with open(file_path, "rb") as source_file:
+            return stat.st_size, stat.st_mtime_ns, sha256(source_file.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _is_unchanged(file_path: str, fingerprint: FileFingerprint) -> bool:
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return fingerprint is None
+    if fingerprint is None or stat.st_size != fingerprint[0]:
+        return False
+    if stat.st_mtime_ns == fingerprint[1]:
+        return True
+    current = get_fingerprint(file_path)
+    return current is not None and current[2] == fingerprint[2]
+
+
+def get_snapshot_cache() -> Optional[DefinitionSnapshotCache]:
+    """Get the definition snapshot cache configured by the environment, or None if it is disabled."""
+    if os.getenv("AAC_DEFINITION_CACHE", "").lower() == "false":
+        return None
+    directory = os.getenv("AAC_DEFINITION_CACHE_DIR") or os.path.expanduser(DEFAULT_SNAPSHOT_DIR)
+    return DefinitionSnapshotCache(directory)
+
+
+def parse_and_load(architecture_file: str) -> list[Definition]:
+    """Parse an architecture file and load its definitions into the LanguageContext, using a snapshot if possible."""
+    context = LanguageContext()
+    snapshot_cache = get_snapshot_cache()
+    if snapshot_cache is None:
+        return context.parse_and_load(architecture_file)
+    definitions = snapshot_cache.parse(architecture_file)
+    return DefinitionParser().load_definitions(context, definitions)
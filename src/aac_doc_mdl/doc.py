@@ -1,16 +1,15 @@
-from typing import ForwardRef
-from pydantic import BaseModel
+from typing import Iterable, Optional
 
 import os
 import json
 import csv
-from jinja2 import Environment, FileSystemLoader
-from markdown2 import markdown
-from weasyprint import HTML
 
 from aac.context.language_context import LanguageContext
 
-from aac_doc_mdl.ai_util import generate
+from aac_doc_mdl.ai_util import DOC_MDL_SYSTEM_PROMPT, generate_all
+from aac_doc_mdl.doc_metrics import SOURCE_FAILED, SOURCE_MANIFEST, SOURCE_PACKED, SOURCE_SHARED, RequestStats, measure
+from aac_doc_mdl.doc_pdf import get_pdf_settings, write_pdf
+from aac_doc_mdl.doc_templates import OUTPUT_ENG_TEMPLATE, OUTPUT_MAIN_TEMPLATE, TemplateEngine, get_template_engine
 
 # The doc dict keys will be:
 #  - title (str):  The title of the section taken from the model name.
@@ -34,95 +33,329 @@ from aac_doc_mdl.ai_util import generate
 # useful in the tests I've been able to create.  I'm a bit concerned that the potentially non-useful content here
 # may negatively impact the GenAI output. If it turns out to be useful, or perhaps just harmless, it can be added.
 
-# I am a bit concerned that doing all this with keys and dicts will get messy in the code.  I'm going to use
-# pydantic to create the data model and then export it to a dict to use as input to Jinja2.  This is my first time
-# using pydantic, so I'll be learning as I go with this one.
+# I am a bit concerned that doing all this with keys and dicts will get messy in the code.  The data model is a set
+# of small slotted classes instead.  The templates still get dicts, built by a thin view layer: a section's view is
+# created once, and each requirement has a single instance and a single view dict however many sections and tests
+# reference it.  Pydantic is only used to serialize a generated document, see doc_schema.
 
 
-class Req(BaseModel):
-    id: str
-    shall: str
+class Req:
+    """A requirement.  Each requirement has one instance, shared by everything that references it."""
 
+    __slots__ = ("id", "shall", "_view")
 
-class Test(BaseModel):
-    name: str
-    reqs: list[Req]
-    criteria: list[str]
+    def __init__(self, id: str, shall: str):
+        """Create a requirement with its ID and shall statement."""
+        self.id = id
+        self.shall = shall
+        self._view = None
 
+    def get_view(self) -> dict:
+        """Get the template view of the requirement, created once and shared by every section view."""
+        if self._view is None:
+            self._view = {"id": self.id, "shall": self.shall}
+        return self._view
 
-class Content(BaseModel):
-    heading: str
-    description: str
-    tests: list[Test]
 
+class Test:
+    """An acceptance test of a section's content, created from a scenario."""
 
-Doc = ForwardRef('Doc')
+    __slots__ = ("name", "reqs", "criteria")
 
+    def __init__(self, name: str, reqs: list[Req], criteria: list[str]):
+        """Create a test with the requirements it verifies and its criteria."""
+        self.name = name
+        self.reqs = reqs
+        self.criteria = criteria
 
-class Doc(BaseModel):
-    title: str
-    description: str
-    generated: str
-    output: str
-    sections: list[Doc] = []
-    content: list[Content]
-    reqs: list[Req]
+    def get_view(self) -> dict:
+        """Get the template view of the test."""
+        return {"name": self.name, "reqs": [req.get_view() for req in self.reqs], "criteria": self.criteria}
 
 
-class VcrmTrace(BaseModel):
-    title: str
-    req_ids: list[str]
+class Content:
+    """A part of a section's content, created from a behavior."""
 
+    __slots__ = ("heading", "description", "tests")
 
-class VCRM(BaseModel):
-    all_reqs: list[Req]
-    all_sections: list[str]
-    traces: list[VcrmTrace]
+    def __init__(self, heading: str, description: str, tests: list[Test]):
+        """Create the content with its acceptance tests."""
+        self.heading = heading
+        self.description = description
+        self.tests = tests
 
+    def get_view(self) -> dict:
+        """Get the template view of the content."""
+        return {"heading": self.heading, "description": self.description, "tests": [test.get_view() for test in self.tests]}
 
-Doc.model_rebuild()
 
+class Doc:
+    """
+    A document section, created from a model, and its sub-sections.
 
-def _req_from_id(id, parent_reqs) -> list[Req]:
-    """Look up a requirement based on the req ID and create the Req."""
-    context = LanguageContext()
+    Sections created from the same model share their content and requirements lists.
+    """
 
-    all_reqs = context.get_definitions_by_root('req')
-    # print(f"DEBUG: All reqs = {[req.instance.id for req in all_reqs]}")
-    for req_def in all_reqs:
-        req = req_def.instance
-        if req.id == id:
-            if not parent_reqs:
-                return [Req(id=id, shall=req.shall)]
-            else:
-                # print(f"DEBUG:  id {id} looking for parent reqs {req.parents}")
-                if len(req.parents) == 0:
-                    return [Req(id=id, shall=req.shall)]
-                else:
-                    ret_val = [Req(id=id, shall=req.shall)]
-                    for parent_id in req.parents:
-                        ret_val.extend(_req_from_id(parent_id, parent_reqs))
-                    return ret_val
+    __slots__ = ("title", "description", "generated", "output", "sections", "content", "reqs")
+
+    def __init__(self, title: str, description: str, generated: str, output: str, sections: list = None, content: list[Content] = None, reqs: list[Req] = None):
+        """Create a section."""
+        self.title = title
+        self.description = description
+        self.generated = generated
+        self.output = output
+        self.sections: list[Doc] = sections if sections is not None else []
+        self.content = content if content is not None else []
+        self.reqs = reqs if reqs is not None else []
+
+
+class VcrmTrace:
+    """
+    The requirements traced by one document section.
+
+    Each requirement ID has a matching (behavior, scenario) source naming the acceptance scenario it was traced
+    through, or a pair of empty names if the section lists the requirement itself.
+    """
+
+    __slots__ = ("title", "req_ids", "sources")
+
+    def __init__(self, title: str, req_ids: list[str], sources: list[tuple[str, str]] = None):
+        """Create the trace of the section with the given title."""
+        self.title = title
+        self.req_ids = req_ids
+        self.sources = sources if sources is not None else [("", "")] * len(req_ids)
+
+
+class VCRM:
+    """A verification cross-reference matrix of the requirements traced by each section of a document."""
 
-    # just return empty list if I don't find anything
-    # print(f"DEBUG: couldn't find req for id {id} in {[req.instance.id for req in all_reqs]}")
-    return []
+    __slots__ = ("all_reqs", "all_sections", "traces")
 
+    def __init__(self, all_reqs: list[Req], all_sections: list[str], traces: list[VcrmTrace]):
+        """Create the matrix from the traced requirements and the traces of the sections in document order."""
+        self.all_reqs = all_reqs
+        self.all_sections = all_sections
+        self.traces = traces
 
-def _test_from_scenario(scenario, parent_reqs) -> Test:
+
+class ReqIndex:
+    """
+    An index of the requirements in the language context, built once per run.
+
+    Looking up a requirement returns the requirement itself and, when parent_reqs is set, every requirement
+    it traces to through its parents.  Each requirement appears once in the result and parent cycles are ignored.
+    """
+
+    def __init__(self, parent_reqs: bool, reqs: Optional[Iterable] = None):
+        """
+        Index every requirement definition currently loaded in the language context.
+
+        If reqs is given, the requirements indexed are these objects with an id, shall and parents instead.
+        """
+        self.parent_reqs = parent_reqs
+        self._reqs: dict[str, Req] = {}
+        self._parents: dict[str, list[str]] = {}
+        self._closures: dict[str, list[str]] = {}
+
+        if reqs is None:
+            reqs = [req_def.instance for req_def in LanguageContext().get_definitions_by_root('req')]
+        for req in reqs:
+            if req.id not in self._reqs:
+                self._reqs[req.id] = Req(id=req.id, shall=req.shall)
+                self._parents[req.id] = list(req.parents or [])
+
+    def update(self, removed_reqs: list, added_reqs: list) -> set[str]:
+        """
+        Update the index with requirement definitions unloaded from and loaded into the language context.
+
+        Returns the IDs of the requirements that were added, removed or given different parents, which are the
+        ones that change what a model traces to.  A requirement whose shall statement changed is replaced, so it
+        is looked up with the new statement.
+        """
+        previous_parents = {req.id: self._parents.pop(req.id, None) for req in removed_reqs}
+        for req in removed_reqs:
+            self._reqs.pop(req.id, None)
+        for req in added_reqs:
+            if req.id not in self._reqs:
+                self._reqs[req.id] = Req(id=req.id, shall=req.shall)
+                self._parents[req.id] = list(req.parents or [])
+
+        changed = {req_id for req_id, parents in previous_parents.items() if self._parents.get(req_id) != parents}
+        changed.update(req.id for req in added_reqs if req.id not in previous_parents)
+        if changed:
+            self._closures.clear()
+        return changed
+
+    def get(self, id: str) -> Optional[Req]:
+        """Get the requirement with the given ID, or None if not found."""
+        return self._reqs.get(id)
+
+    def get_parents(self, id: str) -> list[str]:
+        """Get the IDs of the parents of the requirement with the given ID, or an empty list if not found."""
+        return self._parents.get(id, [])
+
+    def lookup(self, id: str) -> list[Req]:
+        """Get the requirement with the given ID, and its parents if enabled, or an empty list if not found."""
+        if id not in self._reqs:
+            return []
+        if not self.parent_reqs:
+            return [self._reqs[id]]
+        return [self._reqs[req_id] for req_id in self._get_closure(id)]
+
+    def _get_closure(self, id: str) -> list[str]:
+        closure = self._closures.get(id)
+        if closure is None:
+            closure, _ = self._build_closure(id, set())
+        return closure
+
+    def _build_closure(self, id: str, in_progress: set[str]) -> tuple[list[str], bool]:
+        """Walk the parents depth first, returning the ID closure and whether it is complete enough to memoize."""
+        in_progress.add(id)
+        closure = [id]
+        seen = {id}
+        complete = True
+        for parent_id in self._parents[id]:
+            if parent_id not in self._reqs:
+                continue
+            if parent_id in in_progress:
+                # a cycle back to a requirement still being walked, so this result depends on where we started
+                complete = False
+                continue
+            parent_closure = self._closures.get(parent_id)
+            if parent_closure is None:
+                parent_closure, parent_complete = self._build_closure(parent_id, in_progress)
+                complete = complete and parent_complete
+            for req_id in parent_closure:
+                if req_id not in seen:
+                    seen.add(req_id)
+                    closure.append(req_id)
+        in_progress.discard(id)
+        if complete:
+            self._closures[id] = closure
+        return closure, complete
+
+
+class ModelGraph:
+    """
+    An index of the document model component graph in the language context, built once per run.
+
+    Each component's model is looked up once, and the content, requirements and traced requirement IDs of a
+    model are built once however many sections use it.  Models are walked iteratively, so deep documents do not
+    exhaust the stack, and a component that refers back to one of its own ancestors is skipped so a cyclic
+    model still describes a finite document.
+    """
+
+    def __init__(self, req_index: ReqIndex):
+        """Create an empty index that looks up requirements in the given ReqIndex."""
+        self.req_index = req_index
+        self._models: dict[str, object] = {}
+        self._parts: dict[str, tuple[list[Content], list[Req]]] = {}
+        self._traces: dict[str, tuple[list[str], list[tuple[str, str]]]] = {}
+        # the requirement IDs each traced model refers to, whether or not they were found
+        self._trace_refs: dict[str, set[str]] = {}
+
+    def update(self, model_names: set[str], removed_reqs: list, added_reqs: list) -> None:
+        """
+        Update the index with definitions unloaded from and loaded into the language context.
+
+        Everything built from the models with the given names is built again when next asked for, along with the
+        traces that refer to a requirement that was added, removed or given different parents.  When parent
+        requirements are included such a change can reach any trace through the parent closures, so every trace
+        is built again.  The rest of the index is kept.
+        """
+        traced_req_ids = self.req_index.update(removed_reqs, added_reqs)
+        for name in model_names:
+            self._models.pop(name, None)
+            self._parts.pop(name, None)
+            self._traces.pop(name, None)
+            self._trace_refs.pop(name, None)
+        if removed_reqs or added_reqs:
+            # the content holds the requirements themselves, so a new shall statement changes it
+            self._parts.clear()
+        if traced_req_ids:
+            stale = list(self._traces) if self.req_index.parent_reqs else [name for name, refs in self._trace_refs.items() if refs & traced_req_ids]
+            for name in stale:
+                del self._traces[name]
+                del self._trace_refs[name]
+
+    def get_model(self, name: str):
+        """Get the model with the given name, or None if there is not exactly one definition with the name."""
+        if name not in self._models:
+            model_defs = LanguageContext().get_definitions_by_name(name)
+            self._models[name] = model_defs[0].instance if len(model_defs) == 1 else None
+        return self._models[name]
+
+    def walk(self, aac_model) -> tuple[list[tuple[object, int, str, Optional[int]]], list]:
+        """
+        Walk the sections of a model in depth-first pre-order.
+
+        Returns a (model, depth, path, parent position) entry for each section and the components whose model
+        could not be found.  The path identifies a section by the component names leading to it, and the
+        parent position is the index of the parent section's entry, or None for the root.
+        """
+        nodes = []
+        missing = []
+        stack = [(aac_model, 0, aac_model.name, None, frozenset())]
+        while stack:
+            model, depth, path, parent_position, ancestors = stack.pop()
+            position = len(nodes)
+            nodes.append((model, depth, path, parent_position))
+            ancestors = ancestors | {model.name}
+
+            children = []
+            for comp in model.components:
+                comp_model = self.get_model(comp.model)
+                if comp_model is None:
+                    missing.append(comp)
+                elif comp_model.name in ancestors:
+                    print(f"ERROR - component {comp.name} of {model.name} refers back to {comp.model}, skipping it")
+                else:
+                    children.append((comp_model, depth + 1, f"{path}/{comp.name}:{comp.model}", position, ancestors))
+            stack.extend(reversed(children))
+        return nodes, missing
+
+    def get_parts(self, aac_model) -> tuple[list[Content], list[Req]]:
+        """Get the content built from a model's behaviors and the requirements it lists."""
+        parts = self._parts.get(aac_model.name)
+        if parts is None:
+            content = [_content_from_behavior(entry, self.req_index) for entry in aac_model.behavior]
+            reqs = [req for model_req in aac_model.requirements for req in self.req_index.lookup(model_req)]
+            parts = self._parts[aac_model.name] = (content, reqs)
+        return parts
+
+    def get_trace(self, aac_model) -> tuple[list[str], list[tuple[str, str]]]:
+        """
+        Get the IDs of the requirements a model traces to, directly and through its acceptance scenarios.
+
+        The (behavior, scenario) source of each requirement ID is returned with them.
+        """
+        trace = self._traces.get(aac_model.name)
+        if trace is None:
+            refs = set(aac_model.requirements)
+            req_ids = [req.id for id in aac_model.requirements for req in self.req_index.lookup(id)]
+            sources = [("", "")] * len(req_ids)
+            for item in aac_model.behavior:
+                for feature in item.acceptance:
+                    for scenario in feature.scenarios:
+                        refs.update(scenario.requirements)
+                        scenario_req_ids = [req.id for id in scenario.requirements for req in self.req_index.lookup(id)]
+                        req_ids.extend(scenario_req_ids)
+                        sources.extend([(item.name, scenario.name)] * len(scenario_req_ids))
+            trace = self._traces[aac_model.name] = (req_ids, sources)
+            self._trace_refs[aac_model.name] = refs
+        return trace
+
+
+def _test_from_scenario(scenario, req_index: ReqIndex) -> Test:
     """Build a test object from a feature in the AaC model."""
     reqs = []
     for id in scenario.requirements:
-        reqs.extend(_req_from_id(id, parent_reqs))
+        reqs.extend(req_index.lookup(id))
 
-    criteria = []
-    for line in scenario.then:
-        criteria.append(line)
-    test = Test(name=scenario.name, reqs=reqs, criteria=criteria)
-    return test
+    return Test(name=scenario.name, reqs=reqs, criteria=list(scenario.then))
 
 
-def _content_from_behavior(behavior, parent_reqs) -> Content:
+def _content_from_behavior(behavior, req_index: ReqIndex) -> Content:
     """Create a Content from an AaC behavior."""
     heading = behavior.name
     description = behavior.description
@@ -130,21 +363,16 @@ def _content_from_behavior(behavior, parent_reqs) -> Content:
 
     for feature in behavior.acceptance:
         for scenario in feature.scenarios:
-            tests.append(_test_from_scenario(scenario, parent_reqs))
+            tests.append(_test_from_scenario(scenario, req_index))
     return Content(heading=heading, description=description, tests=tests)
 
 
 def _add_markdown_indent(md: str, indent: int) -> str:
     if indent > 0:
-        lines = md.split("\n")
-        update = ""
-        for line in lines:
-            if line.strip().startswith("#"):
-                update = update + "#" * indent + line + "\n"
-            else:
-                update = update + line + "\n"
-        # print(f"DEBUG: _add_markdown_indent\ninput: {md}\noutput: {update}")
-        return update
+        prefix = "#" * indent
+        return "".join(
+            (prefix + line if line.strip().startswith("#") else line) + "\n" for line in md.split("\n")
+        )
     return md
 
 
@@ -153,18 +381,35 @@ def _add_block_quote(md: str) -> str:
     return "\n".join(["> " + line for line in lines])
 
 
-def _create_markdown_content(include_eng: bool, indent: int, doc: Doc) -> str:
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    env = Environment(loader=FileSystemLoader(current_dir))
-    jinja_main_template = env.get_template("./output_template_main.jinja2")
-    main_markdown_text = jinja_main_template.render(doc.model_dump())
-    # print(f"DEBUG: main_markdown_text\n{main_markdown_text}")
-    eng_markdown_text = ""
+def _get_section_view(doc: Doc) -> dict:
+    """Create the template view of a section.  Sub-sections are only summarized by title and description."""
+    return {
+        "title": doc.title,
+        "description": doc.description,
+        "generated": doc.generated,
+        "output": doc.output,
+        "content": [content.get_view() for content in doc.content],
+        "reqs": [req.get_view() for req in doc.reqs],
+        "sections": [{"title": section.title, "description": section.description} for section in doc.sections],
+    }
+
+
+def _render_markdown_parts(include_eng: bool, view: dict, template_engine: TemplateEngine = None) -> tuple[str, Optional[str]]:
+    """Render a section's main markdown, and its engineering markdown if included, with headings at the top level."""
+    if template_engine is None:
+        template_engine = get_template_engine()
+    main_markdown_text = template_engine.render(OUTPUT_MAIN_TEMPLATE, view)
+    eng_markdown_text = template_engine.render(OUTPUT_ENG_TEMPLATE, view) if include_eng else None
+    return main_markdown_text, eng_markdown_text
+
+
+def _indent_markdown_content(main_markdown_text: str, eng_markdown_text: Optional[str], indent: int) -> str:
+    """Combine a section's rendered markdown at the heading depth of where the section appears."""
     if indent > 0:
         main_markdown_text = _add_markdown_indent(main_markdown_text, indent)
-    if include_eng:
-        jinja_eng_template = env.get_template("./output_template_eng.jinja2")
-        eng_markdown_text = jinja_eng_template.render(doc.model_dump())
+    if eng_markdown_text is None:
+        eng_markdown_text = ""
+    else:
         if indent > 0:
             eng_markdown_text = _add_markdown_indent(eng_markdown_text, indent)
         eng_markdown_text = _add_block_quote(eng_markdown_text)
@@ -172,201 +417,499 @@ def _create_markdown_content(include_eng: bool, indent: int, doc: Doc) -> str:
     return f"{main_markdown_text}\n{eng_markdown_text}"
 
 
-def doc_from_model(aac_model, ai_prompt_func, ai_client, ai_model, include_eng, parent_reqs, temperature, indent) -> Doc:
-    """Create a Doc from an AaC model."""
-    title = aac_model.name
-    description = aac_model.description
-    sections = []
-    content = []
-    reqs = []
+def _doc_tree_from_model(aac_model, model_graph: ModelGraph, indent, nodes: list[tuple[Doc, int, str]]) -> Doc:
+    """Build the Doc tree for an AaC model without generating any AI content.
 
-    context = LanguageContext()
+    Every section created is appended to nodes along with its heading indent and its path in the component
+    tree, in depth-first pre-order.  Sections built from the same model share its content and requirements.
+    """
+    model_nodes, missing = model_graph.walk(aac_model)
+    for comp in missing:
+        print(f"ERROR - must be 1 model with name {comp.name}")
 
-    # print(f"DEBUG: building document - {title}")
+    docs = []
+    for model, depth, path, parent_position in model_nodes:
+        content, reqs = model_graph.get_parts(model)
+        doc = Doc(title=model.name, description=model.description, generated="", output="", sections=[], content=content, reqs=reqs)
+        if parent_position is not None:
+            docs[parent_position].sections.append(doc)
+        docs.append(doc)
+        nodes.append((doc, indent + depth, path))
 
-    # populate sections
-    for comp in aac_model.components:
-        model_defs = context.get_definitions_by_name(comp.model)
-        if len(model_defs) != 1:
-            print(f"ERROR - must be 1 model with name {comp.name}")
-        else:
-            sections.append(doc_from_model(model_defs[0].instance, ai_prompt_func, ai_client, ai_model, include_eng, parent_reqs, temperature, indent + 1))
+    return docs[0]
 
-    # populate requirements
-    for model_req in aac_model.requirements:
-        req = _req_from_id(model_req, parent_reqs)
-        if len(req):
-            reqs.extend(req)
 
-    # populate content
-    for entry in aac_model.behavior:
-        content.append(_content_from_behavior(entry, parent_reqs))
+def _get_section_groups(nodes: list[tuple[Doc, int, str]]) -> list[list[int]]:
+    """Group the positions of the sections built from the same model, in order of each model's first section."""
+    groups: dict[str, list[int]] = {}
+    for position, (section, _, _) in enumerate(nodes):
+        groups.setdefault(section.title, []).append(position)
+    return list(groups.values())
 
-    doc = Doc(title=title, description=description, generated="", output="", sections=sections, content=content, reqs=reqs)
 
-    prompt = ai_prompt_func(doc)
-    # print(f"DEBUG:  prompt\n{prompt}\n\n")
-    ai_output = generate(ai_client, ai_model, temperature, prompt).strip()
+def _strip_markdown_fence(ai_output: str) -> str:
+    """Remove the markdown code fence the AI sometimes wraps around its response."""
     if ai_output.startswith("```markdown"):
         text_to_replace = "```markdown\n"
         ai_output = ai_output.replace(text_to_replace, "", 1)
         index = ai_output.rfind("```")
         ai_output = ai_output[:index]
-
-    doc.generated = ai_output
-
-    doc.output = _create_markdown_content(include_eng, indent, doc)
-
-    # print(f"DEBUG: created document object\n{json.dumps(doc.model_dump(), indent=4)}")
-
-    return doc
+    return ai_output
+
+
+def _get_section_separators(indents: list[int]) -> list[str]:
+    """
+    Get the blank lines written after each section of a document in depth-first pre-order.
+
+    Each section is followed by a newline, and each nested section's subtree is followed by one more.
+    """
+    separators = []
+    for position, indent in enumerate(indents):
+        next_indent = indents[position + 1] if position + 1 < len(indents) else indents[0] + 1
+        separators.append("\n" * (indent - next_indent + 2))
+    return separators
+
+
+# the generated text of a section whose AI request failed or was still unfinished at the run deadline
+FAILED_SECTION_TEXT = "> **This section was not generated:** {reason}"
+
+
+def doc_from_model(
+    aac_model, ai_prompt_func, ai_client, ai_model, include_eng, parent_reqs, temperature, indent, max_workers: int = 1, cache=None, on_section=None, manifest=None, metrics=None,
+    packer=None, deadline=None, on_failure=None
+) -> Doc:
+    """Create a Doc from an AaC model.
+
+    A section prompt only uses the titles and descriptions of the section and its children, never the
+    generated text of other sections.  The whole tree is therefore built first and the AI calls are made
+    concurrently using at most max_workers threads.  Results are applied in document order so the output
+    is the same as a serial run.  When a ResponseCache is given, responses are reused from earlier runs.
+
+    If on_section is given it is called with each section's position in the document and its markdown text
+    as soon as the section is rendered, in whatever order the AI responses arrive.  The section output is
+    then released rather than kept in the returned Doc, so the rendered markdown is never all held at once.
+    Each section's generated text is still kept in the returned Doc.
+
+    When a DocManifest is given, sections whose inputs are unchanged since it was saved reuse the stored
+    response and only the remaining sections are sent to the AI.  Every section's response is recorded in it.
+
+    When RunMetrics are given, each section's latency, token usage, retries and response source are
+    recorded in them along with the time spent building prompts, waiting on the AI and rendering markdown.
+
+    When an enabled PromptPacker is given, small sibling leaf sections are packed into shared AI requests.
+
+    AI requests still unfinished at the deadline, a time.monotonic() time, fail.  Without on_failure the first
+    failed request fails the whole document.  With it, a section whose request failed gets a placeholder in
+    place of its generated text and is left out of the manifest, so the next run generates it.  on_failure is
+    called with the document title, the section path and the reason.
+    """
+    prepared = _prepare_doc(
+        aac_model, ai_prompt_func, ai_model, include_eng, ModelGraph(ReqIndex(parent_reqs)), temperature, indent, on_section, manifest, metrics, on_failure
+    )
+    if prepared.prompts:
+        on_stats = None
+        if metrics is not None:
+            def on_stats(index: int, stats: RequestStats):
+                metrics.record_section(prepared.doc.title, prepared.section_paths[index], stats)
+        with measure(metrics, "ai"):
+            _generate_sections(
+                ai_client, ai_model, temperature, prepared.prompts, prepared.sibling_keys, max_workers, cache, prepared.on_response, on_stats,
+                packer, prepared.on_error if on_failure is not None else None, deadline
+            )
+    return prepared.doc
+
+
+def docs_from_models(
+    aac_models, ai_prompt_func, ai_client, ai_model, include_eng, parent_reqs, temperature, max_workers: int = 1, cache=None, on_sections=None, manifests=None, metrics=None,
+    packer=None, deadline=None, on_failure=None, req_index: ReqIndex = None
+) -> list[Doc]:
+    """Create the Docs for several AaC models, generating the sections of every document together.
+
+    The requirement index and model graph are built once for all the documents, so their models must all be
+    loaded in the language context first.  A requirement index already built for parent_reqs can be given instead.  A model used by several documents still gets one AI request per
+    document.  The sections of every document are sent to the AI through a single queue of at
+    most max_workers concurrent requests, so a small document finishing early does not leave workers idle.
+
+    on_sections and manifests, if given, hold the on_section callback and DocManifest for each document in
+    the same order as the models.  Each document is the same as doc_from_model would create for its model,
+    and sections are only packed with sibling sections of the same document.
+    """
+    model_graph = ModelGraph(req_index if req_index is not None else ReqIndex(parent_reqs))
+    prepared_docs = []
+    prompts = []
+    sibling_keys = []
+    # the prepared document and the index among that document's prompts of each prompt
+    prompt_owners: list[tuple[_PreparedDoc, int]] = []
+    for doc_index, aac_model in enumerate(aac_models):
+        on_section = on_sections[doc_index] if on_sections else None
+        manifest = manifests[doc_index] if manifests else None
+        prepared = _prepare_doc(aac_model, ai_prompt_func, ai_model, include_eng, model_graph, temperature, 0, on_section, manifest, metrics, on_failure)
+        prepared_docs.append(prepared)
+        prompt_owners.extend((prepared, index) for index in range(len(prepared.prompts)))
+        prompts.extend(prepared.prompts)
+        sibling_keys.extend((doc_index, sibling_key) if sibling_key is not None else None for sibling_key in prepared.sibling_keys)
+
+    def on_response(index: int, ai_output: str):
+        prepared, doc_prompt_index = prompt_owners[index]
+        prepared.on_response(doc_prompt_index, ai_output)
+
+    def on_stats(index: int, stats: RequestStats):
+        prepared, doc_prompt_index = prompt_owners[index]
+        metrics.record_section(prepared.doc.title, prepared.section_paths[doc_prompt_index], stats)
+
+    def on_error(index: int, error: Exception):
+        prepared, doc_prompt_index = prompt_owners[index]
+        prepared.on_error(doc_prompt_index, error)
+
+    if prompts:
+        with measure(metrics, "ai"):
+            _generate_sections(
+                ai_client, ai_model, temperature, prompts, sibling_keys, max_workers, cache, on_response, on_stats if metrics is not None else None,
+                packer, on_error if on_failure is not None else None, deadline
+            )
+    return [prepared.doc for prepared in prepared_docs]
+
+
+def _combine_stats(failed: RequestStats, stats: RequestStats) -> RequestStats:
+    """Add the stats of a packed request that could not be split to the stats of the request sent instead."""
+    return RequestStats(
+        stats.source, failed.seconds + stats.seconds, failed.prompt_tokens + stats.prompt_tokens, failed.completion_tokens + stats.completion_tokens, failed.retries + stats.retries + 1
+    )
+
+
+def _generate_sections(ai_client, ai_model, temperature, prompts, sibling_keys, max_workers, cache, on_response, on_stats, packer=None, on_error=None, deadline=None):
+    """
+    Generate the response to each section prompt, packing the prompts of small sibling sections if a packer is given.
+
+    Each section gets its own response and stats as if it had been sent alone.  The stats of a packed request
+    go to its first section and the other sections are recorded as packed.  If a packed response cannot be
+    split, its sections are sent alone and the first section's stats include the failed request as a retry.
+    If a packed request fails, each of its sections is passed the error.
+    """
+    if packer is None or not packer.enabled:
+        generate_all(ai_client, ai_model, temperature, prompts, max_workers, cache, on_response, on_stats, on_error, deadline)
+    else:
+        _generate_packed_sections(ai_client, ai_model, temperature, prompts, sibling_keys, max_workers, cache, on_response, on_stats, packer, on_error, deadline)
+
+
+def _generate_packed_sections(ai_client, ai_model, temperature, prompts, sibling_keys, max_workers, cache, on_response, on_stats, packer, on_error, deadline):
+    """Generate the section responses with the prompts packed by the packer, see _generate_sections."""
+    packs = packer.pack(prompts, sibling_keys)
+    request_prompts = [prompts[pack[0]] if len(pack) == 1 else packer.create_packed_prompt([prompts[index] for index in pack]) for pack in packs]
+    request_stats: dict[int, RequestStats] = {}
+    failed_stats: dict[int, RequestStats] = {}
+    unpacked: list[int] = []
+
+    def on_request_response(request: int, response: str):
+        pack = packs[request]
+        stats = request_stats.pop(request, None)
+        outputs = [response] if len(pack) == 1 else packer.split_response(response, len(pack))
+        if outputs is None:
+            unpacked.extend(pack)
+            if stats is not None:
+                failed_stats[pack[0]] = stats
+            return
+        for position, (index, output) in enumerate(zip(pack, outputs)):
+            if stats is not None:
+                on_stats(index, stats if position == 0 else RequestStats(SOURCE_PACKED))
+            on_response(index, output)
+
+    def on_request_error(request: int, error: Exception):
+        for index in packs[request]:
+            on_error(index, error)
+
+    def on_unpacked_stats(request: int, stats: RequestStats):
+        failed = failed_stats.pop(unpacked[request], None)
+        on_stats(unpacked[request], stats if failed is None else _combine_stats(failed, stats))
+
+    generate_all(
+        ai_client, ai_model, temperature, request_prompts, max_workers, cache, on_request_response, request_stats.__setitem__ if on_stats is not None else None,
+        on_request_error if on_error is not None else None, deadline
+    )
+    if unpacked:
+        unpacked.sort()
+        generate_all(
+            ai_client, ai_model, temperature, [prompts[index] for index in unpacked], max_workers, cache,
+            lambda request, response: on_response(unpacked[request], response), on_unpacked_stats if on_stats is not None else None,
+            (lambda request, error: on_error(unpacked[request], error)) if on_error is not None else None, deadline
+        )
+
+
+def _record_section(metrics, document: str, section_path: str, source: str) -> None:
+    """Record a section that did not need its own AI request, if metrics are being recorded."""
+    if metrics is not None:
+        metrics.record_section(document, section_path, RequestStats(source))
+
+
+def _record_group_positions(manifest, metrics, document: str, section_paths: list[str], input_hash: Optional[str], ai_output: str, failed: bool) -> None:
+    """Record the response, or the failure, of each section built from the same model, the first of which made the AI request."""
+    for index, section_path in enumerate(section_paths):
+        if manifest is not None and failed:
+            manifest.record_failure(section_path)
+        elif manifest is not None:
+            manifest.record(section_path, input_hash, ai_output)
+        if index > 0:
+            _record_section(metrics, document, section_path, SOURCE_SHARED)
+
+
+class _PreparedDoc:
+    """A document's Doc tree and the prompts of its sections still to be generated, see _prepare_doc."""
+
+    def __init__(self, doc: Doc, prompts: list[str], section_paths: list[str], sibling_keys: list, on_response, on_error):
+        """Hold the prepared document with the section path, sibling key and callbacks of each prompt."""
+        self.doc = doc
+        self.prompts = prompts
+        self.section_paths = section_paths
+        self.sibling_keys = sibling_keys
+        # apply the AI response, or the failure, of the prompt with the given index
+        self.on_response = on_response
+        self.on_error = on_error
+
+
+def _prepare_doc(aac_model, ai_prompt_func, ai_model, include_eng, model_graph: ModelGraph, temperature, indent, on_section, manifest, metrics=None, on_failure=None) -> _PreparedDoc:
+    """
+    Build a document's Doc tree and prompts, applying the manifest's stored responses.
+
+    Sections built from the same model have the same prompt, so it is only sent once and the response and
+    rendered markdown are reused for each of them, with the headings shifted to each section's depth.
+
+    The sibling key of a leaf section's prompt is the path of its parent, and sections with sub-sections have
+    none.  A failed prompt's sections get a placeholder, are not recorded in the manifest and are passed to
+    on_failure, which must be given for the failures to be applied.
+    """
+    nodes: list[tuple[Doc, int, str]] = []
+    doc = _doc_tree_from_model(aac_model, model_graph, indent, nodes)
+    separators = _get_section_separators([section_indent for _, section_indent, _ in nodes])
+    groups = _get_section_groups(nodes)
+
+    # each distinct section is dumped once and the same view feeds both the prompt and the markdown templates
+    views = [_get_section_view(nodes[positions[0]][0]) for positions in groups]
+
+    def on_response(group: int, ai_output: str, failed: bool = False):
+        generated = _strip_markdown_fence(ai_output.strip())
+        view = views[group]
+        view["generated"] = generated
+        with measure(metrics, "markdown"):
+            markdown_parts = _render_markdown_parts(include_eng, view)
+        views[group] = None
+        section_paths = [nodes[position][2] for position in groups[group]]
+        _record_group_positions(manifest, metrics, doc.title, section_paths, input_hashes[group] if manifest is not None else None, ai_output, failed)
+        for position in groups[group]:
+            section, section_indent, _ = nodes[position]
+            section.generated = generated
+            section.output = _indent_markdown_content(*markdown_parts, section_indent)
+            if on_section is not None:
+                on_section(position, section.output + separators[position])
+                section.output = ""
+
+    def on_error(group: int, error: Exception):
+        section_path = nodes[groups[group][0]][2]
+        reason = str(error) or type(error).__name__
+        _record_section(metrics, doc.title, section_path, SOURCE_FAILED)
+        on_failure(doc.title, section_path, reason)
+        on_response(group, FAILED_SECTION_TEXT.format(reason=reason), True)
+
+    with measure(metrics, "prompts"):
+        prompts = [ai_prompt_func(view) for view in views]
+        if manifest is not None:
+            input_hashes = [manifest.input_hash(ai_model, temperature, DOC_MDL_SYSTEM_PROMPT, prompt) for prompt in prompts]
+
+    pending = []
+    for group, positions in enumerate(groups):
+        section_path = nodes[positions[0]][2]
+        stored_output = manifest.get(section_path, input_hashes[group]) if manifest is not None else None
+        if stored_output is None:
+            pending.append(group)
+        else:
+            _record_section(metrics, doc.title, section_path, SOURCE_MANIFEST)
+            on_response(group, stored_output)
+
+    section_paths = [nodes[groups[group][0]][2] for group in pending]
+    return _PreparedDoc(
+        doc,
+        [prompts[group] for group in pending],
+        section_paths,
+        [None if nodes[groups[group][0]][0].sections else section_path.rpartition("/")[0] for group, section_path in zip(pending, section_paths)],
+        lambda index, ai_output: on_response(pending[index], ai_output),
+        lambda index, error: on_error(pending[index], error),
+    )
+
+
+def prompts_from_model(aac_model, ai_prompt_func, ai_model, parent_reqs, temperature, manifest=None) -> list[str]:
+    """Get the AI prompts for the sections of a document in document order without calling the AI.
+
+    Sections built from the same model share one prompt.  When a DocManifest is given, only the prompts for
+    sections whose inputs changed are returned.
+    """
+    nodes: list[tuple[Doc, int, str]] = []
+    _doc_tree_from_model(aac_model, ModelGraph(ReqIndex(parent_reqs)), 0, nodes)
+    prompts = []
+    for positions in _get_section_groups(nodes):
+        section, _, section_path = nodes[positions[0]]
+        prompt = ai_prompt_func(_get_section_view(section))
+        if manifest is None or manifest.get(section_path, manifest.input_hash(ai_model, temperature, DOC_MDL_SYSTEM_PROMPT, prompt)) is None:
+            prompts.append(prompt)
+    return prompts
+
+
+def get_chunk_positions(doc: Doc) -> list[int]:
+    """Get the positions in document order of the document's root section and each of its top level sections."""
+
+    def count_sections(section: Doc) -> int:
+        count = 0
+        stack = [section]
+        while stack:
+            count += 1
+            stack.extend(stack.pop().sections)
+        return count
+
+    positions = [0]
+    next_position = 1
+    for section in doc.sections:
+        positions.append(next_position)
+        next_position += count_sections(section)
+    return positions
+
+
+def _walk_sections(doc: Doc) -> list[tuple[Doc, int]]:
+    """Get each section of a document in document order along with its heading indent."""
+    nodes: list[tuple[Doc, int]] = []
+    stack = [(doc, 0)]
+    while stack:
+        section, indent = stack.pop()
+        nodes.append((section, indent))
+        stack.extend((child, indent + 1) for child in reversed(section.sections))
+    return nodes
+
+
+def render_doc(doc: Doc, include_eng: bool, template_engine: TemplateEngine = None) -> None:
+    """
+    Render the markdown of every section again from the text generated for it, without calling the AI.
+
+    Sections with the same title were built from the same model, so each one is rendered once and its markdown
+    is reused with the headings shifted to each section's depth.  The plugin's templates are used unless another
+    template engine is given.
+    """
+    rendered: dict[str, tuple[str, Optional[str]]] = {}
+    for section, indent in _walk_sections(doc):
+        markdown_parts = rendered.get(section.title)
+        if markdown_parts is None:
+            view = _get_section_view(section)
+            # as when it was generated, the section has no output yet
+            view["output"] = ""
+            markdown_parts = rendered[section.title] = _render_markdown_parts(include_eng, view, template_engine)
+        section.output = _indent_markdown_content(*markdown_parts, indent)
+
+
+def _get_markdown_sections(doc: Doc) -> list[str]:
+    """Get the markdown text of each section in document order, including the blank lines that follow it."""
+    nodes = _walk_sections(doc)
+    separators = _get_section_separators([indent for _, indent in nodes])
+    return [section.output + separator for (section, _), separator in zip(nodes, separators)]
 
 
 def _get_markdown_text(doc: Doc) -> str:
-
-    # recursively walk the document sections
-    markdown_text = doc.output + "\n"
-    if doc.sections:
-        for section in doc.sections:
-            markdown_text = markdown_text + _get_markdown_text(section) + "\n"
-
-    return markdown_text
+    return "".join(_get_markdown_sections(doc))
 
 
-def _write_files(path: str, file_name: str, write_pdf: bool, doc: Doc):
-    """Create an ai prompt using the jinja template."""
-    markdown_text = _get_markdown_text(doc)
-
-    # print(f"DEBUG: markdown_text - \n {markdown_text}")
+def _write_files(path: str, file_name: str, write_pdf_file: bool, doc: Doc):
+    """Write the markdown and optionally the PDF for a document."""
+    markdown_sections = _get_markdown_sections(doc)
 
     md_file_path = os.path.join(path, file_name + ".md")
     with open(md_file_path, "w") as file:
-        file.write(markdown_text)
-        # print(f"DEBUG: markdown generated: {md_file_path}")
-
-    if write_pdf:
-        # Convert Markdown to HTML
-        html_content = markdown(markdown_text, extras=["fenced-code-blocks"])
-
-        # Define the PDF file path
-        pdf_file_path = os.path.join(path, file_name + ".pdf")
-
-        # Convert HTML to PDF
-        HTML(string=html_content, base_url=path).write_pdf(pdf_file_path)
+        file.writelines(markdown_sections)
 
-        # print(f"DEBUG: PDF generated: {pdf_file_path}")
+    if write_pdf_file:
+        section_offsets = [0]
+        for markdown_section in markdown_sections:
+            section_offsets.append(section_offsets[-1] + len(markdown_section))
+        chunk_offsets = [section_offsets[position] for position in get_chunk_positions(doc)]
+        write_pdf(path, file_name, chunk_offsets, *get_pdf_settings(), section_offsets=section_offsets)
 
 
 def write_doc(path: str, file_name: str, doc: Doc, write_pdf: bool):
     _write_files(path, file_name, write_pdf, doc)
 
 
-def _trace_from_model(aac_model, parent_reqs: bool) -> VcrmTrace:
-    title = aac_model.name
-    req_ids = []
+def vcrm_from_model(aac_model, parent_reqs: bool, req_index: ReqIndex = None, model_graph: ModelGraph = None) -> VCRM:
+    """Generate a VCRM as a dict from a document model, reusing the traces already built by the model graph if given."""
 
-    # get the top level requirement traces
-    for id in aac_model.requirements:
-        reqs = _req_from_id(id, parent_reqs)
-        for req in reqs:
-            req_ids.append(req.id)
-
-    # get the feature level requirement traces
-    for item in aac_model.behavior:
-        for feature in item.acceptance:
-            for scenario in feature.scenarios:
-                for id in scenario.requirements:
-                    reqs = _req_from_id(id, parent_reqs)
-                    for req in reqs:
-                        req_ids.append(req.id)
-
-    return VcrmTrace(title=title, req_ids=req_ids)
-
-
-def _get_req_ids_from_model(aac_model, parent_reqs: bool) -> list[Req]:
-
-    context = LanguageContext()
-    req_ids = []
-
-    for comp in aac_model.components:
-        comp_defs = context.get_definitions_by_name(comp.model)
-        if len(comp_defs) != 1:
-            print(f"ERROR:  there should only be 1 model for component {comp.model}")
-            return None
-        else:
-            comp_instance = comp_defs[0].instance
-            req_ids.extend(_get_req_ids_from_model(comp_instance, parent_reqs))
+    if model_graph is None:
+        model_graph = ModelGraph(req_index if req_index is not None else ReqIndex(parent_reqs))
+    req_index = model_graph.req_index
 
-    for req_id in aac_model.requirements:
-        req_ids.extend(_req_from_id(req_id, parent_reqs))
-
-    for item in aac_model.behavior:
-        for feature in item.acceptance:
-            for scenario in feature.scenarios:
-                for id in scenario.requirements:
-                    req_ids.extend(_req_from_id(id, parent_reqs))
-    return req_ids
-
-
-def vcrm_from_model(aac_model, parent_reqs: bool) -> VCRM:
-    """Generate a VCRM as a dict from a document model."""
-
-    context = LanguageContext()
-
-    all_reqs_unsorted = _get_req_ids_from_model(aac_model, parent_reqs)
+    # starting with the provided model, identify all traced requirements of each section in document order
+    model_nodes, missing = model_graph.walk(aac_model)
+    if missing:
+        print(f"ERROR:  there should only be 1 model for component {missing[0].model}")
+        return None
+    traces = [VcrmTrace(model.name, *model_graph.get_trace(model)) for model, _, _, _ in model_nodes]
 
     # sort reqs by id and eliminate dupes
-    req_id_list = [req.id for req in all_reqs_unsorted]
-    print(f"DEBUG: unsorted req ids = {req_id_list}")
-    req_id_list = sorted(req_id_list)
-    print(f"DEBUG: sorted req ids = {req_id_list}")
-    all_reqs = []
-    for id in req_id_list:
-        for req in all_reqs_unsorted:
-            if req.id == id:
-                if req not in all_reqs:
-                    all_reqs.append(req)
-
-    # starting with the provided model, identify all traced requirements and then traverse each section
-    traces: list[VcrmTrace] = []
-    traces.append(_trace_from_model(aac_model, parent_reqs))
-
-    all_sections = []
-    all_sections.append(aac_model.name)
-
-    for comp in aac_model.components:
-        comp_defs = context.get_definitions_by_name(comp.model)
-        if len(comp_defs) != 1:
-            print(f"ERROR:  there should only be 1 model for component {comp.model}")
-            return None
-        else:
-            comp_instance = comp_defs[0].instance
-            comp_vcrm = vcrm_from_model(comp_instance, parent_reqs)
-            all_sections.extend(comp_vcrm.all_sections)
-            for trace in comp_vcrm.traces:
-                traces.append(trace)
-
-    return VCRM(all_reqs=all_reqs, all_sections=all_sections, traces=traces)
+    traced_req_ids = {req_id for trace in traces for req_id in trace.req_ids}
+    all_reqs = [req_index.get(req_id) for req_id in sorted(traced_req_ids)]
 
+    all_sections = [trace.title for trace in traces]
 
-def _prepare_data_for_csv(vcrm):
-    # Step 1: Initialize the dictionary
-    req_to_sections = {req.id: [] for req in vcrm.all_reqs}
+    return VCRM(all_reqs=all_reqs, all_sections=all_sections, traces=traces)
 
-    # Step 2: Populate the dictionary
-    for trace in vcrm.traces:
-        for req_id in trace.req_ids:
-            req_to_sections[req_id].append(trace.title)
 
-    return req_to_sections
+class VcrmMatrix:
+    """
+    The requirement by section trace matrix of a VCRM.
+
+    Each requirement's row is held as a bitset of the section columns it traces to, so the matrix is built in
+    a single pass over the traces and rows are rendered without visiting each cell in Python.  Sections that
+    share a title share their trace marks, matching a lookup of the section by title.
+    """
+
+    def __init__(self, vcrm: VCRM):
+        """Build the matrix from the VCRM traces."""
+        self.req_ids = [req.id for req in vcrm.all_reqs]
+        self.sections = [trace.title for trace in vcrm.traces]
+
+        title_masks: dict[str, int] = {}
+        for column, title in enumerate(self.sections):
+            title_masks[title] = title_masks.get(title, 0) | (1 << column)
+
+        rows = dict.fromkeys(self.req_ids, 0)
+        for trace in vcrm.traces:
+            mask = title_masks[trace.title]
+            for req_id in trace.req_ids:
+                if req_id in rows:
+                    rows[req_id] |= mask
+        self.rows = [rows[req_id] for req_id in self.req_ids]
+        self._byte_tables: dict[tuple[str, str, str], list[str]] = {}
+
+    def get_row_text(self, row: int, separator: str, traced: str = "X", untraced: str = "-") -> str:
+        """Get a row's cells as text, with each section's traced or untraced mark preceded by the separator."""
+        table_key = (separator, traced, untraced)
+        table = self._byte_tables.get(table_key)
+        if table is None:
+            # the rendered text of every combination of eight columns, so a row is rendered a byte at a time
+            table = [
+                "".join(separator + (traced if byte >> bit & 1 else untraced) for bit in range(8)) for byte in range(256)
+            ]
+            self._byte_tables[table_key] = table
+        column_count = len(self.sections)
+        row_bytes = self.rows[row].to_bytes((column_count + 7) // 8, "little")
+        return "".join(map(table.__getitem__, row_bytes))[:column_count * (len(separator) + 1)]
+
+    def get_untraced_req_ids(self) -> list[str]:
+        """Get the IDs of the requirements that do not trace to any section."""
+        return [req_id for req_id, mask in zip(self.req_ids, self.rows) if mask == 0]
+
+
+def _csv_field(value: str) -> str:
+    """Quote a value the way the csv module's default dialect does."""
+    if any(character in value for character in ',"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
 
 
 def vcrm_to_csv(vcrm, output_file):
-    # req_to_sections = _prepare_data_for_csv(vcrm)
-
-    all_sections = []
-    for trace in vcrm.traces:
-        all_sections.append(trace.title)
+    matrix = VcrmMatrix(vcrm)
 
     with open(output_file, "w", newline='') as csvfile:
         csvwriter = csv.writer(csvfile)
@@ -375,35 +918,17 @@ def vcrm_to_csv(vcrm, output_file):
         header = ["Document Section"] + vcrm.all_sections
         csvwriter.writerow(header)
 
-        # Write the CSV rows
-        for req in vcrm.all_reqs:
-            row = [req.id]
-            for section in all_sections:
-                found: bool = False
-                for trace in vcrm.traces:
-                    if section == trace.title and req.id in trace.req_ids:
-                        found = True
-                if found:
-                    row += ['X']
-                else:
-                    row += ['-']
-            csvwriter.writerow(row)
+        # Write the CSV rows, the cells never need quoting
+        for row, req_id in enumerate(matrix.req_ids):
+            csvfile.write(_csv_field(req_id) + matrix.get_row_text(row, ",") + "\r\n")
 
 
 def vcrm_to_markdown(vcrm, output_file):
-    # req_to_sections = _prepare_data_for_csv(vcrm)
-
-    all_req_ids = []
-    for req in vcrm.all_reqs:
-        all_req_ids.append(req.id)
-
-    all_sections = []
-    for trace in vcrm.traces:
-        all_sections.append(trace.title)
+    matrix = VcrmMatrix(vcrm)
 
     with open(output_file, "w") as mdfile:
         # Prepare the Markdown table header
-        header = ["Document Section"] + all_sections
+        header = ["Document Section"] + matrix.sections
         mdfile.write("|" + "|".join(header) + "|\n")
 
         # Prepare the separator row
@@ -411,43 +936,11 @@ def vcrm_to_markdown(vcrm, output_file):
         mdfile.write("|" + "|".join(separator) + "|\n")
 
         # Prepare and write rows
-        for req in vcrm.all_reqs:
-            row = [req.id]
-            for section in all_sections:
-                found: bool = False
-                for trace in vcrm.traces:
-                    if section == trace.title and req.id in trace.req_ids:
-                        found = True
-                if found:
-                    row += ['X']
-                else:
-                    row += ['-']
-            mdfile.write("|" + "|".join(row) + "|\n")
-
-        # Prepare the Markdown table header
-        # header = ["Document Section"] + all_req_ids
-        # mdfile.write("|" + "|".join(header) + "|\n")
-
-        # Prepare the separator row
-        # separator = ["---"] * len(header)
-        # mdfile.write("|" + "|".join(separator) + "|\n")
-
-        # sections = []
-        # for trace in vcrm.traces:
-        #     sections.append(trace.title)
-
-        # Prepare and write rows
-        # for section in sections:  # Unique sections/components, sorted for consistency
-        #     row = [section] + ['X' if section in req_to_sections[req] else '-' for req in all_req_ids]
-        #     mdfile.write("|" + "|".join(row) + "|\n")
+        for row, req_id in enumerate(matrix.req_ids):
+            mdfile.write("|" + req_id + matrix.get_row_text(row, "|") + "|\n")
 
 
 def has_full_coverage(vcrm: VCRM) -> bool:
     """Look to see if there are any requirements that do not trace to the model."""
-
-    req_ids = list(map(type, vcrm.all_reqs))  # deep copy hack
-
-    for trace in vcrm.traces:
-        req_ids = [item for item in req_ids if item not in trace.req_ids]
-
-    return len(req_ids) == 0
+    traced_req_ids = {req_id for trace in vcrm.traces for req_id in trace.req_ids}
+    return all(req.id in traced_req_ids for req in vcrm.all_reqs)
@@ -0,0 +1,116 @@
+"""The AaC Document Model plugin markdown to HTML conversion, one section at a time with a cache of each section's HTML."""
+
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+from importlib.metadata import version
+from typing import Optional
+
+
+HTML_CACHE_VERSION = 1
+MARKDOWN_EXTRAS = ["fenced-code-blocks"]
+# with less markdown than this to convert, starting the processes takes longer than converting it in one
+MIN_PARALLEL_CHARACTERS = 200_000
+
+
+def convert_markdown(markdown_text: str) -> str:
+    """Convert markdown text to HTML."""
+    # imported here because it is slow to import
+    from markdown2 import markdown
+
+    return markdown(markdown_text, extras=MARKDOWN_EXTRAS)
+
+
+def _get_key(markdown_text: str) -> str:
+    return sha256(markdown_text.encode("utf-8")).hexdigest()
+
+
+class HtmlCache:
+    """
+    The HTML converted from each section of a document, kept in a JSON file next to the document.
+
+    A section's HTML is stored under a hash of its markdown, so only the sections whose markdown changed are
+    converted again.  The whole cache is ignored if the markdown2 version or the extras used changed.  Only
+    the sections looked up while rendering are saved, so the file holds the HTML of the current document and
+    does not grow with each edit.
+    """
+
+    def __init__(self, path: str):
+        """Load the cache at the given path, starting empty if it is missing, unreadable or out of date."""
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._settings = f"{HTML_CACHE_VERSION}\0{version('markdown2')}\0{','.join(MARKDOWN_EXTRAS)}"
+        self._previous: dict[str, str] = {}
+        self._fragments: dict[str, str] = {}
+        try:
+            with open(path) as cache_file:
+                data = json.load(cache_file)
+            if data["settings"] == self._settings:
+                self._previous = dict(data["fragments"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def get(self, markdown_text: str) -> Optional[str]:
+        """Get the HTML converted from the markdown, or None if it is not cached."""
+        key = _get_key(markdown_text)
+        html = self._fragments.get(key, self._previous.get(key))
+        if html is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._fragments[key] = html
+        return html
+
+    def put(self, markdown_text: str, html: str) -> None:
+        """Store the HTML converted from the markdown."""
+        self._fragments[_get_key(markdown_text)] = html
+
+    def save(self) -> None:
+        """Write the HTML of the sections looked up or stored since the cache was loaded, replacing the file in one step."""
+        directory = os.path.dirname(self.path) or "."
+        try:
+            file_descriptor, partial_path = tempfile.mkstemp(dir=directory, suffix=".part")
+        except OSError:
+            # the sections were converted, they just won't be reused by the next render
+            return
+        try:
+            with os.fdopen(file_descriptor, "w") as cache_file:
+                json.dump({"settings": self._settings, "fragments": self._fragments}, cache_file)
+            os.replace(partial_path, self.path)
+        except OSError:
+            os.remove(partial_path)
+
+
+def get_html_cache(path: str) -> Optional[HtmlCache]:
+    """Get the section HTML cache at the path, or None if the AAC_HTML_CACHE environment variable disables it."""
+    if os.getenv("AAC_HTML_CACHE", "").lower() == "false":
+        return None
+    return HtmlCache(path)
+
+
+def convert_sections(sections: list[str], cache: Optional[HtmlCache] = None, workers: Optional[int] = None) -> list[str]:
+    """
+    Convert the markdown of each section to HTML, reusing the cached HTML of sections that did not change.
+
+    Each section is converted on its own, as if a blank line ended it, so a block quote or list at the end of a
+    section never runs on into the next section's heading.  Sections with the same markdown are converted once.
+    With enough markdown to convert, the sections are converted at the same time by up to workers processes,
+    or one per CPU by default.
+    """
+    html: list[Optional[str]] = [cache.get(section) if cache is not None else None for section in sections]
+    missing = list(dict.fromkeys(section for section, section_html in zip(sections, html) if section_html is None))
+
+    workers = min(workers or os.cpu_count() or 1, len(missing))
+    if workers > 1 and sum(map(len, missing)) >= MIN_PARALLEL_CHARACTERS:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            converted = dict(zip(missing, executor.map(convert_markdown, missing, chunksize=max(1, len(missing) // (workers * 4)))))
+    else:
+        converted = {section: convert_markdown(section) for section in missing}
+
+    for section, section_html in converted.items():
+        if cache is not None:
+            cache.put(section, section_html)
+    return [section_html if section_html is not None else converted[section] for section, section_html in zip(sections, html)]
@@ -0,0 +1,133 @@
+"""The AaC Document Model plugin section input manifest and journal used for incremental regeneration and resuming runs."""
+
+import json
+import os
+from hashlib import sha256
+from typing import Optional
+
+
+MANIFEST_VERSION = 1
+
+
+class DocManifest:
+    """
+    Remember the inputs and AI response of every section of a generated document.
+
+    Sections are identified by their path in the model's component tree.  Each is stored with a hash of
+    everything that went into its AI request, which covers the section's description, requirements, tests,
+    child titles and descriptions, the prompt template, the AI model and the temperature.  On the next run a
+    section whose hash is unchanged reuses its stored response instead of calling the AI again.
+
+    Only the sections recorded during the current run are saved, so sections removed from the model are
+    dropped from the manifest.
+
+    Every section recorded is also appended to a journal file next to the manifest and synced to disk straight
+    away, so the sections of a run that was killed before it saved the manifest are not lost.  When resuming,
+    the journal's sections are reused like the manifest's and the run appends to it.  Otherwise it is started
+    afresh.  The journal is removed once the manifest is saved.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        """Load the manifest at the given path, and its journal if resuming, starting empty if it is missing or unreadable."""
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.resume = resume
+        self.reused = 0
+        self.resumed = 0
+        self.regenerated = 0
+        self.failed = 0
+        self._previous: dict[str, dict] = {}
+        self._sections: dict[str, dict] = {}
+        self._journal = None
+        self._journaled: set[str] = set()
+        try:
+            with open(path) as manifest_file:
+                data = json.load(manifest_file)
+            if data.get("version") == MANIFEST_VERSION:
+                self._previous = data["sections"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            # without a usable manifest every section is regenerated
+            self._previous = {}
+        if resume:
+            journal = _read_journal(self.journal_path)
+            self._previous.update(journal)
+            self._journaled = set(journal)
+
+    @staticmethod
+    def input_hash(model: str, temperature: float, system_prompt: str, prompt: str) -> str:
+        """Hash the inputs of a section's AI request."""
+        digest = sha256()
+        for part in (str(MANIFEST_VERSION), model, repr(float(temperature)), system_prompt, prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, section_path: str, input_hash: str) -> Optional[str]:
+        """Get the stored response for a section, or None if the section is new or its inputs changed."""
+        entry = self._previous.get(section_path)
+        if entry is None or entry.get("hash") != input_hash:
+            return None
+        return entry.get("response")
+
+    def record(self, section_path: str, input_hash: str, response: str) -> None:
+        """
+        Record the response for a section's inputs, appending it to the journal.
+
+        The section is counted as regenerated if its inputs changed since the stored response, and as reused
+        or resumed otherwise.
+        """
+        previous = self._previous.get(section_path)
+        if previous is None or previous.get("hash") != input_hash:
+            self.regenerated += 1
+        elif section_path in self._journaled:
+            self.resumed += 1
+        else:
+            self.reused += 1
+        entry = {"hash": input_hash, "response": response}
+        self._sections[section_path] = entry
+        if self._journal is None:
+            self._journal = open(self.journal_path, "a" if self.resume else "w")
+        self._journal.write(json.dumps({"path": section_path, **entry}) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def record_failure(self, section_path: str) -> None:
+        """Count a section whose AI request failed.  It is not recorded, so the next run generates it."""
+        self.failed += 1
+
+    def save(self) -> None:
+        """Write the sections recorded during this run, replacing the previous manifest and removing the journal."""
+        partial_path = self.path + ".part"
+        with open(partial_path, "w") as manifest_file:
+            json.dump({"version": MANIFEST_VERSION, "sections": self._sections}, manifest_file, indent=2)
+        os.replace(partial_path, self.path)
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def get_stats_message(self) -> str:
+        """Summarize how many sections were reused, resumed, regenerated and failed."""
+        message = f"Section manifest: {self.reused} sections unchanged, {self.regenerated} sections regenerated"
+        if self.resume:
+            message += f", {self.resumed} sections resumed from the journal"
+        if self.failed:
+            message += f", {self.failed} sections failed"
+        return message
+
+
+def _read_journal(path: str) -> dict[str, dict]:
+    """Read the sections of a journal, skipping a last entry cut short by a crash."""
+    sections = {}
+    try:
+        with open(path) as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                    sections[entry["path"]] = {"hash": entry["hash"], "response": entry["response"]}
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except OSError:
+        pass
+    return sections
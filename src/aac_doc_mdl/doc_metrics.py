@@ -0,0 +1,205 @@
+"""The AaC Document Model plugin performance and token usage metrics."""
+
+import json
+import math
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from threading import Lock
+from typing import Optional
+
+
+# where a section's response came from
+SOURCE_AI = "ai"
+SOURCE_CACHE = "cache"
+SOURCE_MANIFEST = "manifest"
+SOURCE_BATCH = "batch"
+# a section built from the same model as an earlier section of the document, reusing its response
+SOURCE_SHARED = "shared"
+# a section answered by the packed AI request of an earlier sibling section, which holds the request's stats
+SOURCE_PACKED = "packed"
+# a section whose AI request failed or was unfinished at the run deadline, given a placeholder
+SOURCE_FAILED = "failed"
+
+PHASES = ["parse", "prompts", "ai", "markdown", "pdf"]
+
+METRIC_PREFIX = "aac_doc"
+
+
+class RequestStats:
+    """The time, token usage and retries of getting the response to one prompt."""
+
+    def __init__(self, source: str, seconds: float = 0.0, prompt_tokens: int = 0, completion_tokens: int = 0, retries: int = 0):
+        """Create the stats for a response from the given source."""
+        self.source = source
+        self.seconds = seconds
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.retries = retries
+
+    @classmethod
+    def from_usage(cls, seconds: float, usage, retries: int = 0):
+        """Create the stats for an AI response from the usage the AI service reported, if any."""
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        return cls(SOURCE_AI, seconds, prompt_tokens, completion_tokens, retries)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Get the nearest-rank percentile of the values, or 0 if there are none."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class RunMetrics:
+    """
+    Record where the time and tokens of a generation run go.
+
+    Every section gets a record of its AI latency, prompt and completion tokens, retries and where its
+    response came from.  The wall-clock time of each phase of the run is accumulated separately.  Markdown
+    rendering happens as AI responses arrive, so its time is also part of the AI phase.
+    """
+
+    def __init__(self):
+        """Start recording a run."""
+        self.start = time.perf_counter()
+        self.phase_seconds = {phase: 0.0 for phase in PHASES}
+        self.sections: list[dict] = []
+        self._lock = Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Add the time spent in the with block to the named phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + elapsed
+
+    def record_section(self, document: str, section: str, stats: RequestStats) -> None:
+        """Record how a section's response was obtained."""
+        record = {
+            "document": document,
+            "section": section,
+            "source": stats.source,
+            "seconds": stats.seconds,
+            "prompt_tokens": stats.prompt_tokens,
+            "completion_tokens": stats.completion_tokens,
+            "retries": stats.retries,
+        }
+        with self._lock:
+            self.sections.append(record)
+
+    def get_document_summaries(self) -> dict[str, dict]:
+        """Summarize the sections of each document."""
+        sections_by_document: dict[str, list[dict]] = {}
+        for record in self.sections:
+            sections_by_document.setdefault(record["document"], []).append(record)
+        return {document: _summarize(records) for document, records in sections_by_document.items()}
+
+    def get_report(self) -> dict:
+        """Get the full report of the run."""
+        return {
+            "total_seconds": time.perf_counter() - self.start,
+            "phase_seconds": dict(self.phase_seconds),
+            "summary": _summarize(self.sections),
+            "documents": self.get_document_summaries(),
+            "sections": list(self.sections),
+        }
+
+    def write_reports(self, path: str, file_name: str) -> tuple[str, str]:
+        """Write the JSON report and Prometheus text-format metrics into the path, returning their file paths."""
+        report = self.get_report()
+        json_file_path = os.path.join(path, f"{file_name}-metrics.json")
+        with open(json_file_path, "w") as json_file:
+            json.dump(report, json_file, indent=2)
+        prometheus_file_path = os.path.join(path, f"{file_name}-metrics.prom")
+        with open(prometheus_file_path, "w") as prometheus_file:
+            prometheus_file.write(_to_prometheus(report))
+        return json_file_path, prometheus_file_path
+
+    def get_summary_message(self) -> str:
+        """Summarize the run in one line."""
+        summary = _summarize(self.sections)
+        phases = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in self.phase_seconds.items())
+        return (
+            f"Profile: {summary['sections']} sections, AI latency p50 {summary['latency_p50_seconds']:.2f}s p95 {summary['latency_p95_seconds']:.2f}s, "
+            f"{summary['prompt_tokens']} prompt and {summary['completion_tokens']} completion tokens, {summary['retries']} retries, "
+            f"{summary['cache_hits']} cache hits, {summary['manifest_hits']} unchanged; phases: {phases}"
+        )
+
+
+def measure(metrics: Optional[RunMetrics], phase: str):
+    """Time the named phase if metrics are being recorded."""
+    return metrics.phase(phase) if metrics is not None else nullcontext()
+
+
+def _summarize(records: list[dict]) -> dict:
+    latencies = [record["seconds"] for record in records if record["source"] == SOURCE_AI]
+    return {
+        "sections": len(records),
+        "ai_requests": len(latencies),
+        "latency_p50_seconds": percentile(latencies, 0.5),
+        "latency_p95_seconds": percentile(latencies, 0.95),
+        "latency_total_seconds": sum(latencies),
+        "prompt_tokens": sum(record["prompt_tokens"] for record in records),
+        "completion_tokens": sum(record["completion_tokens"] for record in records),
+        "retries": sum(record["retries"] for record in records),
+        "cache_hits": sum(1 for record in records if record["source"] == SOURCE_CACHE),
+        "manifest_hits": sum(1 for record in records if record["source"] == SOURCE_MANIFEST),
+        "batch_responses": sum(1 for record in records if record["source"] == SOURCE_BATCH),
+        "shared_sections": sum(1 for record in records if record["source"] == SOURCE_SHARED),
+        "packed_sections": sum(1 for record in records if record["source"] == SOURCE_PACKED),
+        "failed_sections": sum(1 for record in records if record["source"] == SOURCE_FAILED),
+    }
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _to_prometheus(report: dict) -> str:
+    """Format a report in the Prometheus text exposition format."""
+    lines = []
+
+    def add_metric(name: str, metric_type: str, help_text: str, samples: list[tuple[str, dict, float]]):
+        lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+        for suffix, labels, value in samples:
+            label_text = ",".join(f'{key}="{_escape_label(str(label))}"' for key, label in labels.items())
+            lines.append(f"{METRIC_PREFIX}_{name}{suffix}{{{label_text}}} {value}" if label_text else f"{METRIC_PREFIX}_{name}{suffix} {value}")
+
+    documents = report["documents"]
+    add_metric("run_seconds", "gauge", "Wall-clock time of the generation run.", [("", {}, report["total_seconds"])])
+    add_metric("phase_seconds", "gauge", "Wall-clock time spent in each phase of the run.", [("", {"phase": phase}, seconds) for phase, seconds in report["phase_seconds"].items()])
+
+    latency_samples = []
+    for document, summary in documents.items():
+        latency_samples.append(("", {"document": document, "quantile": "0.5"}, summary["latency_p50_seconds"]))
+        latency_samples.append(("", {"document": document, "quantile": "0.95"}, summary["latency_p95_seconds"]))
+        latency_samples.append(("_sum", {"document": document}, summary["latency_total_seconds"]))
+        latency_samples.append(("_count", {"document": document}, summary["ai_requests"]))
+    add_metric("section_latency_seconds", "summary", "AI latency of the document sections, including retries.", latency_samples)
+
+    token_samples = []
+    for document, summary in documents.items():
+        token_samples.append(("", {"document": document, "type": "prompt"}, summary["prompt_tokens"]))
+        token_samples.append(("", {"document": document, "type": "completion"}, summary["completion_tokens"]))
+    add_metric("tokens", "gauge", "AI tokens used by each document.", token_samples)
+
+    add_metric("retries", "gauge", "AI request retries for each document.", [("", {"document": document}, summary["retries"]) for document, summary in documents.items()])
+
+    section_samples = []
+    for document in documents:
+        counts: dict[str, int] = {}
+        for record in report["sections"]:
+            if record["document"] == document:
+                counts[record["source"]] = counts.get(record["source"], 0) + 1
+        section_samples.extend(("", {"document": document, "source": source}, count) for source, count in sorted(counts.items()))
+    add_metric("sections", "gauge", "Document sections by where their response came from.", section_samples)
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,178 @@
+"""The AaC Document Model plugin parallel, chunked PDF rendering."""
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from aac_doc_mdl.doc_html import convert_sections, get_html_cache
+from aac_doc_mdl.env_settings import get_env_number
+
+
+# the smallest share of the memory ceiling given to each rendering process
+MIN_WORKER_MEMORY_MB = 512
+# with less markdown than this the PDF is rendered in one piece, which is faster than starting the processes
+MIN_CHUNKED_CHARACTERS = 100_000
+
+
+def split_markdown_chunks(markdown_text: str, chunk_offsets: Optional[list[int]]) -> list[str]:
+    """Split the markdown text at the given character offsets, dropping empty chunks."""
+    return ["".join(sections) for sections in split_markdown_sections(markdown_text, chunk_offsets, None)]
+
+
+def split_markdown_sections(markdown_text: str, chunk_offsets: Optional[list[int]], section_offsets: Optional[list[int]]) -> list[list[str]]:
+    """Split the markdown text into chunks at the chunk offsets, and each chunk into sections at the section offsets, dropping empty ones."""
+    chunk_bounds = set(chunk_offsets or [])
+    bounds = sorted(set(offset for offset in (chunk_offsets or []) + (section_offsets or []) if 0 < offset < len(markdown_text)))
+    chunks: list[list[str]] = [[]]
+    for start, end in zip([0] + bounds, bounds + [len(markdown_text)]):
+        if start in chunk_bounds and chunks[-1]:
+            chunks.append([])
+        if markdown_text[start:end].strip():
+            chunks[-1].append(markdown_text[start:end])
+    return [sections for sections in chunks if sections]
+
+
+def get_heading_level(markdown_text: str) -> int:
+    """Get the level of the first heading in the markdown text, or 1 if it has none."""
+    for line in markdown_text.splitlines():
+        stripped = line.lstrip()
+        if stripped.startswith("#"):
+            return len(stripped) - len(stripped.lstrip("#"))
+    return 1
+
+
+def get_pdf_worker_settings(workers: Optional[int], max_memory_mb: Optional[int], chunk_count: int) -> tuple[int, Optional[int]]:
+    """
+    Get the number of rendering processes and the memory limit for each, in MB.
+
+    The memory ceiling is shared evenly between the processes, so fewer processes are used if each would
+    otherwise get less than MIN_WORKER_MEMORY_MB.
+    """
+    workers = min(workers or os.cpu_count() or 1, chunk_count)
+    if not max_memory_mb:
+        return max(1, workers), None
+    workers = max(1, min(workers, max_memory_mb // MIN_WORKER_MEMORY_MB))
+    return workers, max_memory_mb // workers
+
+
+def get_pdf_settings() -> tuple[Optional[int], Optional[int]]:
+    """Get the number of PDF rendering processes and the memory ceiling in MB from the AAC_PDF_* environment variables."""
+    return get_env_number("AAC_PDF_WORKERS", None), get_env_number("AAC_PDF_MAX_MEMORY_MB", None)
+
+
+def _limit_memory(memory_mb: Optional[int]) -> None:
+    """Cap the address space of a rendering process where the platform supports it."""
+    if not memory_mb:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    limit = memory_mb * 1024 * 1024
+    _, hard_limit = resource.getrlimit(resource.RLIMIT_AS)
+    if hard_limit != resource.RLIM_INFINITY:
+        limit = min(limit, hard_limit)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard_limit))
+
+
+def render_pdf_chunk(html_content: str, base_url: str, pdf_file_path: str) -> str:
+    """Render HTML to a PDF file and return the file path."""
+    # imported here because it is slow to import and WeasyPrint needs native libraries
+    from weasyprint import HTML
+
+    HTML(string=html_content, base_url=base_url).write_pdf(pdf_file_path)
+    return pdf_file_path
+
+
+def _flatten_outline(reader, outline: list, depth: int = 0) -> list[tuple[int, str, int]]:
+    """Get the bookmarks of a PDF as (depth, title, page number) in document order."""
+    bookmarks = []
+    for item in outline:
+        if isinstance(item, list):
+            bookmarks.extend(_flatten_outline(reader, item, depth + 1))
+        else:
+            bookmarks.append((depth, item.title, reader.get_destination_page_number(item)))
+    return bookmarks
+
+
+def merge_pdf_chunks(chunk_file_paths: list[str], heading_levels: list[int], pdf_file_path: str) -> None:
+    """
+    Merge the chunk PDFs into one PDF, keeping every chunk's bookmarks.
+
+    Each chunk's bookmarks start at the level of the chunk's first heading, so bookmarks of later chunks are
+    nested under the document title just as they would be in a PDF rendered in one piece.  Pages are numbered
+    continuously across the chunks.
+    """
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    parents = []
+    page_offset = 0
+    for chunk_file_path, heading_level in zip(chunk_file_paths, heading_levels):
+        reader = PdfReader(chunk_file_path)
+        writer.append(reader, import_outline=False)
+        for depth, title, page_number in _flatten_outline(reader, reader.outline):
+            level = heading_level + depth
+            # parents holds the open bookmark at each level above this one
+            while parents and parents[-1][0] >= level:
+                parents.pop()
+            parent = parents[-1][1] if parents else None
+            parents.append((level, writer.add_outline_item(title, page_offset + page_number, parent=parent)))
+        page_offset += len(reader.pages)
+
+    with open(pdf_file_path, "wb") as pdf_file:
+        writer.write(pdf_file)
+
+
+def write_pdf(
+    path: str, file_name: str, chunk_offsets: Optional[list[int]] = None, workers: Optional[int] = None, max_memory_mb: Optional[int] = None, section_offsets: Optional[list[int]] = None
+) -> None:
+    """
+    Render the PDF for a markdown file written to the path.
+
+    When chunk_offsets are given and the markdown has at least MIN_CHUNKED_CHARACTERS, the markdown is split at
+    those character offsets (usually the start of each top level section) and the chunks are rendered at the
+    same time by up to workers processes, or one per CPU by default.  Each chunk is its own WeasyPrint document,
+    so each starts on a new page.  A shorter document is rendered in one piece and flows from one top level
+    section to the next.  If max_memory_mb is given, it is shared between the processes as a limit on each
+    one's address space.
+
+    The markdown is converted to HTML a section at a time, split at the section_offsets, and each section's
+    HTML is kept in a cache file next to the markdown.  Rendering again after a few sections changed only
+    converts those sections.
+    """
+    with open(os.path.join(path, file_name + ".md")) as file:
+        markdown_text = file.read()
+
+    pdf_file_path = os.path.join(path, file_name + ".pdf")
+    chunk_sections = split_markdown_sections(markdown_text, chunk_offsets, section_offsets)
+    html_cache = get_html_cache(os.path.join(path, file_name + "-html-cache.json"))
+    sections_html = convert_sections([section for sections in chunk_sections for section in sections], html_cache, workers)
+    if html_cache is not None:
+        html_cache.save()
+
+    # each chunk's HTML is assembled from the HTML of its sections
+    chunks = []
+    position = 0
+    for sections in chunk_sections:
+        chunks.append("".join(sections_html[position:position + len(sections)]))
+        position += len(sections)
+    if len(chunks) <= 1 or len(markdown_text) < MIN_CHUNKED_CHARACTERS:
+        render_pdf_chunk("".join(chunks), path, pdf_file_path)
+        return
+
+    workers, worker_memory_mb = get_pdf_worker_settings(workers, max_memory_mb, len(chunks))
+    chunk_dir = tempfile.mkdtemp(prefix=f".{file_name}-pdf-", dir=path)
+    try:
+        chunk_file_paths = [os.path.join(chunk_dir, f"{index}.pdf") for index in range(len(chunks))]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_limit_memory, initargs=(worker_memory_mb,)) as executor:
+            # the largest chunks are started first so the pool finishes as evenly as it can
+            order = sorted(range(len(chunks)), key=lambda index: len(chunks[index]), reverse=True)
+            futures = [executor.submit(render_pdf_chunk, chunks[index], path, chunk_file_paths[index]) for index in order]
+            for future in futures:
+                future.result()
+        merge_pdf_chunks(chunk_file_paths, [get_heading_level("".join(sections)) for sections in chunk_sections], pdf_file_path)
+    finally:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
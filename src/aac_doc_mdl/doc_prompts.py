@@ -1,8 +1,18 @@
 """The AaC Documentation Model plugin AI document generation AI prompt implementation."""
 import os
-from jinja2 import Environment, FileSystemLoader
+import re
+from functools import lru_cache
+from threading import Lock
+from typing import Optional
 
-from aac_doc_mdl.doc import Doc
+from aac_doc_mdl.doc_templates import COMPACT_PROMPT_TEMPLATE, PROMPT_TEMPLATE, get_template_engine
+from aac_doc_mdl.env_settings import get_env_number
+
+
+# rough size of a token, used to estimate prompt sizes without the model's tokenizer
+CHARS_PER_TOKEN = 4
+
+DEFAULT_PACK_MAX_SECTIONS = 8
 
 
 ABSTRACT_PROMPT_TEMPLATE = """
@@ -75,22 +85,302 @@ Take a deep breath and think step by step about how to best accomplish this goal
 """
 
 
-def _create_prompt(prompt_starter: str, doc: Doc) -> str:
-    """Create an ai prompt using the jinja template."""
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    env = Environment(loader=FileSystemLoader(current_dir))
-    # env.globals.update({})
-    jinja_template = env.get_template("./prompt_template.jinja2")
-    input = jinja_template.render(doc.model_dump())
-
-    return f"{prompt_starter}{input}"
-
-
-def create_outline_prompt(doc: Doc) -> str:
-    """Create an AI prompt to generate an abstract from a document model."""
-    return _create_prompt(ABSTRACT_PROMPT_TEMPLATE, doc)
+PACKED_INPUT_INSTRUCTIONS = """The input holds {count} separate sections, each starting with a marker line such as `<<<SECTION 1>>>`.  Follow the instructions above for each section on its own.  Start the output for each section with its marker line, exactly as given, and write the sections in the order given.  Do not write anything before the first marker.
 
+"""
 
-def create_document_prompt(doc: Doc) -> str:
-    """Create an AI prompt to generate an abstract from a document model."""
-    return _create_prompt(DOCUMENT_PROMPT_TEMPLATE, doc)
+PACKED_SECTION_MARKER = "<<<SECTION {number}>>>"
+PACKED_SECTION_MARKER_PATTERN = re.compile(r"^<<<SECTION (\d+)>>>[ \t]*$", re.MULTILINE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in the text."""
+    return len(text) // CHARS_PER_TOKEN
+
+
+def _get_first_sentence(text: str) -> str:
+    """Get the first sentence or line of the text."""
+    text = text.strip()
+    end = len(text)
+    for separator in (". ", "\n"):
+        index = text.find(separator)
+        if index != -1:
+            end = min(end, index + 1)
+    return text[:end].strip()
+
+
+def compact_view(doc_view: dict) -> dict:
+    """
+    Compact the template view of a document section for the compact prompt template.
+
+    Every requirement of the section and its tests is listed once with its shall statement, and the tests
+    reference their requirements by ID.  A criterion is only listed for the first test that has it.
+    """
+    reqs = {}
+    for req in doc_view["reqs"]:
+        reqs.setdefault(req["id"], req)
+
+    content = []
+    listed_criteria = set()
+    for entry in doc_view["content"]:
+        tests = []
+        for test in entry["tests"]:
+            for req in test["reqs"]:
+                reqs.setdefault(req["id"], req)
+            criteria = [criterion for criterion in dict.fromkeys(test["criteria"]) if criterion not in listed_criteria]
+            listed_criteria.update(criteria)
+            req_ids = list(dict.fromkeys(req["id"] for req in test["reqs"]))
+            tests.append({"name": test["name"], "req_ids": req_ids, "criteria": criteria})
+        content.append({"heading": entry["heading"], "description": entry["description"], "tests": tests})
+
+    return {
+        "title": doc_view["title"],
+        "description": doc_view["description"],
+        "reqs": list(reqs.values()),
+        "sections": doc_view["sections"],
+        "content": content,
+    }
+
+
+def _estimate_compacted_chars(doc_view: dict, view: dict) -> int:
+    """Estimate the characters compact_view removed from the full prompt of a document section."""
+    full_lines = []
+    compact_lines = []
+    for entry, compact_entry in zip(doc_view["content"], view["content"]):
+        for test, compact_test in zip(entry["tests"], compact_entry["tests"]):
+            if test["reqs"]:
+                full_lines.append("      Requirements:")
+                full_lines.extend(f"        - {req['id']} : {req['shall']}" for req in test["reqs"])
+                compact_lines.append(f"      Requirements: {', '.join(compact_test['req_ids'])}")
+            if test["criteria"]:
+                full_lines.append("      Criteria:")
+                full_lines.extend(f"        - {criterion}" for criterion in test["criteria"])
+            if compact_test["criteria"]:
+                compact_lines.append("      Criteria:")
+                compact_lines.extend(f"        - {criterion}" for criterion in compact_test["criteria"])
+    listed_req_ids = {req["id"] for req in doc_view["reqs"]}
+    compact_lines.extend(f"  - {req['id']} : {req['shall']}" for req in view["reqs"] if req["id"] not in listed_req_ids)
+    return sum(len(line) + 1 for line in full_lines) - sum(len(line) + 1 for line in compact_lines)
+
+
+def _trim_section_descriptions(doc_view: dict) -> dict:
+    sections = [{"title": section["title"], "description": _get_first_sentence(section["description"])} for section in doc_view["sections"]]
+    return {**doc_view, "sections": sections}
+
+
+def _trim_content_descriptions(doc_view: dict) -> dict:
+    content = [{**entry, "description": _get_first_sentence(entry["description"])} for entry in doc_view["content"]]
+    return {**doc_view, "content": content}
+
+
+class PromptCompactor:
+    """
+    Compact section prompts before they are sent to the AI and keep count of the tokens saved.
+
+    Compaction lists each requirement once and removes repeated criteria, see compact_view.  The tokens
+    saved are estimated from the lines compaction removed, so the full prompt is never rendered.  If a token
+    budget is set and the compacted prompt is still over it, the sub-section descriptions and then the
+    content descriptions are cut to their first sentence.  Requirements and criteria are never dropped, so a
+    prompt may stay over the budget.  Those prompts are counted so they can be reported.
+    """
+
+    def __init__(self, enabled: bool = True, token_budget: Optional[int] = None):
+        """Create a compactor, or one that leaves prompts unchanged if enabled is not set."""
+        self.enabled = enabled
+        self.token_budget = token_budget
+        self.original_tokens = 0
+        self.compacted_tokens = 0
+        self.over_budget = 0
+        self._lock = Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Create a compactor configured by the AAC_AI_PROMPT_* environment variables."""
+        return cls(
+            enabled=os.getenv("AAC_AI_PROMPT_COMPACTION", "").lower() == "true",
+            token_budget=get_env_number("AAC_AI_PROMPT_TOKEN_BUDGET", None),
+        )
+
+    def create_prompt(self, prompt_starter: str, doc_view: dict) -> str:
+        """Create the prompt for a document section."""
+        template_engine = get_template_engine()
+        if not self.enabled:
+            return f"{prompt_starter}{template_engine.render(PROMPT_TEMPLATE, doc_view)}"
+
+        view = compact_view(doc_view)
+        prompt = f"{prompt_starter}{template_engine.render(COMPACT_PROMPT_TEMPLATE, view)}"
+        original_tokens = estimate_tokens(prompt) + _estimate_compacted_chars(doc_view, view) // CHARS_PER_TOKEN
+        for trim in (_trim_section_descriptions, _trim_content_descriptions):
+            if self.token_budget is None or estimate_tokens(prompt) <= self.token_budget:
+                break
+            view = trim(view)
+            prompt = f"{prompt_starter}{template_engine.render(COMPACT_PROMPT_TEMPLATE, view)}"
+
+        compacted_tokens = estimate_tokens(prompt)
+        with self._lock:
+            self.original_tokens += original_tokens
+            self.compacted_tokens += compacted_tokens
+            if self.token_budget is not None and compacted_tokens > self.token_budget:
+                self.over_budget += 1
+        return prompt
+
+    def get_counts(self) -> tuple[int, int, int]:
+        """Get the original tokens, compacted tokens and prompts over budget counted so far."""
+        with self._lock:
+            return self.original_tokens, self.compacted_tokens, self.over_budget
+
+    def get_stats_message(self, since: tuple[int, int, int] = (0, 0, 0)) -> str:
+        """Summarize the tokens saved since the counts were taken with get_counts."""
+        original_tokens, compacted_tokens, over_budget = (count - start for count, start in zip(self.get_counts(), since))
+        if not self.enabled:
+            return "Prompt compaction: disabled"
+        saved_tokens = original_tokens - compacted_tokens
+        saved_percent = 100 * saved_tokens / original_tokens if original_tokens else 0
+        message = f"Prompt compaction: about {saved_tokens} of {original_tokens} prompt tokens saved ({saved_percent:.0f}%)"
+        if over_budget:
+            message += f", {over_budget} prompts still over the {self.token_budget} token budget"
+        return message
+
+
+@lru_cache(maxsize=None)
+def get_prompt_compactor() -> PromptCompactor:
+    """Get the prompt compactor configured by the environment, created on first use."""
+    return PromptCompactor.from_env()
+
+
+def _create_prompt(prompt_starter: str, doc_view: dict) -> str:
+    """Create an ai prompt using the jinja template, compacted if compaction is enabled."""
+    return get_prompt_compactor().create_prompt(prompt_starter, doc_view)
+
+
+def create_outline_prompt(doc_view: dict) -> str:
+    """Create an AI prompt to generate an abstract from the template view of a document section."""
+    return _create_prompt(ABSTRACT_PROMPT_TEMPLATE, doc_view)
+
+
+def create_document_prompt(doc_view: dict) -> str:
+    """Create an AI prompt to generate document content from the template view of a document section."""
+    return _create_prompt(DOCUMENT_PROMPT_TEMPLATE, doc_view)
+
+
+def split_prompt(prompt: str) -> Optional[tuple[str, str]]:
+    """Split a section prompt into the instructions it starts with and the section input, if it was created by this module."""
+    for prompt_starter in (ABSTRACT_PROMPT_TEMPLATE, DOCUMENT_PROMPT_TEMPLATE):
+        if prompt.startswith(prompt_starter):
+            return prompt_starter, prompt[len(prompt_starter):]
+    return None
+
+
+def _unwrap_markdown_fence(text: str) -> str:
+    """Remove a markdown code fence wrapped around the whole text."""
+    if text.startswith("```") and text.endswith("```") and "\n" in text:
+        return text[text.index("\n") + 1:-3].strip()
+    return text
+
+
+class PromptPacker:
+    """
+    Pack the prompts of small sibling sections into one AI request and split the response back into sections.
+
+    Only leaf sections with the same parent are packed together, so each pack is about one part of the document.
+    A pack's section inputs are sent after a single copy of the prompt instructions, and the AI is asked to
+    start each section's output with the section's marker line.  A pack holds at most max_sections sections whose
+    inputs total at most token_threshold estimated tokens.  A section over the threshold on its own is sent alone.
+    """
+
+    def __init__(self, token_threshold: Optional[int] = None, max_sections: int = DEFAULT_PACK_MAX_SECTIONS):
+        """Create a packer, or one that sends every section alone if no token threshold is given."""
+        self.token_threshold = token_threshold
+        self.max_sections = max_sections
+        self.packed_requests = 0
+        self.packed_sections = 0
+        self.unpacked_sections = 0
+        self._lock = Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Create a packer configured by the AAC_AI_PROMPT_PACK_* environment variables."""
+        return cls(
+            token_threshold=get_env_number("AAC_AI_PROMPT_PACK_TOKENS", None),
+            max_sections=get_env_number("AAC_AI_PROMPT_PACK_MAX_SECTIONS", DEFAULT_PACK_MAX_SECTIONS),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any sections can be packed."""
+        return bool(self.token_threshold) and self.max_sections > 1
+
+    def pack(self, prompts: list[str], sibling_keys: list) -> list[list[int]]:
+        """
+        Group the prompts into the requests to send, in order of each request's first prompt.
+
+        Prompts with the same sibling key can be packed together, and prompts whose key is None are always sent
+        alone.  Returns the prompt indexes of each request.
+        """
+        packs = []
+        open_packs: dict[tuple, tuple[list[int], int]] = {}
+        for index, (prompt, sibling_key) in enumerate(zip(prompts, sibling_keys)):
+            parts = split_prompt(prompt) if sibling_key is not None and self.enabled else None
+            tokens = estimate_tokens(parts[1]) if parts is not None else 0
+            if parts is None or tokens > self.token_threshold:
+                packs.append([index])
+                continue
+            pack_key = (sibling_key, parts[0])
+            pack, pack_tokens = open_packs.get(pack_key, (None, 0))
+            if pack is None or pack_tokens + tokens > self.token_threshold or len(pack) >= self.max_sections:
+                pack, pack_tokens = [], 0
+                packs.append(pack)
+            pack.append(index)
+            open_packs[pack_key] = (pack, pack_tokens + tokens)
+
+        with self._lock:
+            for pack in packs:
+                if len(pack) > 1:
+                    self.packed_requests += 1
+                    self.packed_sections += len(pack)
+        return packs
+
+    def create_packed_prompt(self, prompts: list[str]) -> str:
+        """Create the prompt for a pack of section prompts that start with the same instructions."""
+        prompt_starter = split_prompt(prompts[0])[0]
+        packed_inputs = [f"{PACKED_SECTION_MARKER.format(number=number)}\n{split_prompt(prompt)[1].strip()}\n" for number, prompt in enumerate(prompts, 1)]
+        return prompt_starter + PACKED_INPUT_INSTRUCTIONS.format(count=len(prompts)) + "\n".join(packed_inputs)
+
+    def split_response(self, response: str, count: int) -> Optional[list[str]]:
+        """
+        Split the response to a packed prompt into the output of each of its count sections.
+
+        Returns None if the response does not have exactly the markers asked for, in order, each followed by
+        some output.  Those sections are counted as unpacked, since they need to be sent alone.
+        """
+        text = _unwrap_markdown_fence(response.strip())
+        markers = list(PACKED_SECTION_MARKER_PATTERN.finditer(text))
+        numbers = [int(marker.group(1)) for marker in markers]
+        outputs = []
+        if numbers == list(range(1, count + 1)) and not text[:markers[0].start()].strip():
+            ends = [marker.start() for marker in markers[1:]] + [len(text)]
+            outputs = [text[marker.end():end].strip() for marker, end in zip(markers, ends)]
+        if not outputs or not all(outputs):
+            with self._lock:
+                self.unpacked_sections += count
+            return None
+        return outputs
+
+    def get_counts(self) -> tuple[int, int, int]:
+        """Get the packed requests, packed sections and sections sent alone after an unreadable response counted so far."""
+        with self._lock:
+            return self.packed_requests, self.packed_sections, self.unpacked_sections
+
+    def get_stats_message(self, since: tuple[int, int, int] = (0, 0, 0)) -> str:
+        """Summarize the packing done since the counts were taken with get_counts."""
+        packed_requests, packed_sections, unpacked_sections = (count - start for count, start in zip(self.get_counts(), since))
+        message = f"Prompt packing: {packed_sections} sections packed into {packed_requests} requests"
+        if unpacked_sections:
+            message += f", {unpacked_sections} sections sent alone after an unreadable packed response"
+        return message
+
+
+@lru_cache(maxsize=None)
+def get_prompt_packer() -> PromptPacker:
+    """Get the prompt packer configured by the environment, created on first use."""
+    return PromptPacker.from_env()
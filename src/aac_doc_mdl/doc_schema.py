@@ -0,0 +1,171 @@
+"""
+The AaC Document Model plugin serialized form of a generated document.
+
+The document tree is stored with each requirement once, and the sections and tests refer to requirements by ID.
+Loading a document interns the requirements again, so the tree has one instance of each.
+
+When the requirement index used to generate the document is given, the sections and tests only refer to the
+requirements their model lists, and each requirement is stored with its parents.  The parent requirements are
+then added when the document is loaded, so it can be rendered with or without them.
+"""
+
+from typing import Optional
+
+from pydantic import BaseModel
+
+from aac_doc_mdl.doc import Content, Doc, Req, ReqIndex, Test
+
+
+SCHEMA_VERSION = 1
+# the file a generated document tree is saved in, next to the document's markdown
+DOC_TREE_SUFFIX = "-doc.json"
+
+
+class ReqSchema(BaseModel):
+    """A requirement, stored once for the whole document."""
+
+    id: str
+    shall: str
+    parents: list[str] = []
+
+
+class TestSchema(BaseModel):
+    """An acceptance test, referring to its requirements by ID."""
+
+    name: str
+    req_ids: list[str]
+    criteria: list[str]
+
+
+class ContentSchema(BaseModel):
+    """A part of a section's content."""
+
+    heading: str
+    description: str
+    tests: list[TestSchema]
+
+
+class SectionSchema(BaseModel):
+    """A section and its sub-sections, referring to its requirements by ID."""
+
+    title: str
+    description: str
+    generated: str
+    output: str
+    content: list[ContentSchema]
+    req_ids: list[str]
+    sections: list["SectionSchema"] = []
+
+
+class DocSchema(BaseModel):
+    """A serialized document tree."""
+
+    version: int = SCHEMA_VERSION
+    parent_reqs: bool = False
+    reqs: list[ReqSchema]
+    root: SectionSchema
+
+
+def _get_direct_reqs(reqs: list[Req], req_index: ReqIndex) -> list[Req]:
+    """Get the requirements a list was looked up from, leaving out the parents the lookups added."""
+    direct_reqs = []
+    position = 0
+    while position < len(reqs):
+        direct_reqs.append(reqs[position])
+        # a lookup returns the requirement first, followed by its parents
+        position += max(1, len(req_index.lookup(reqs[position].id)))
+    return direct_reqs
+
+
+def _section_to_schema(doc: Doc, reqs: dict[str, Req], req_index: Optional[ReqIndex]) -> SectionSchema:
+    def get_req_ids(section_reqs: list[Req]) -> list[str]:
+        if req_index is not None:
+            section_reqs = _get_direct_reqs(section_reqs, req_index)
+        for req in section_reqs:
+            reqs.setdefault(req.id, req)
+        return [req.id for req in section_reqs]
+
+    content = [
+        ContentSchema(
+            heading=item.heading,
+            description=item.description,
+            tests=[TestSchema(name=test.name, req_ids=get_req_ids(test.reqs), criteria=test.criteria) for test in item.tests],
+        )
+        for item in doc.content
+    ]
+    return SectionSchema(
+        title=doc.title,
+        description=doc.description,
+        generated=doc.generated,
+        output=doc.output,
+        content=content,
+        req_ids=get_req_ids(doc.reqs),
+        sections=[_section_to_schema(section, reqs, req_index) for section in doc.sections],
+    )
+
+
+def _section_from_schema(section: SectionSchema, req_index: ReqIndex) -> Doc:
+    def get_reqs(req_ids: list[str]) -> list[Req]:
+        for req_id in req_ids:
+            if req_index.get(req_id) is None:
+                raise ValueError(f"The document refers to requirement {req_id} which it does not contain")
+        return [req for req_id in req_ids for req in req_index.lookup(req_id)]
+
+    content = [
+        Content(
+            heading=item.heading,
+            description=item.description,
+            tests=[Test(name=test.name, reqs=get_reqs(test.req_ids), criteria=test.criteria) for test in item.tests],
+        )
+        for item in section.content
+    ]
+    return Doc(
+        title=section.title,
+        description=section.description,
+        generated=section.generated,
+        output=section.output,
+        sections=[_section_from_schema(sub_section, req_index) for sub_section in section.sections],
+        content=content,
+        reqs=get_reqs(section.req_ids),
+    )
+
+
+def doc_to_json(doc: Doc, req_index: Optional[ReqIndex] = None) -> str:
+    """
+    Serialize a document tree to compact JSON.
+
+    If the requirement index the document was generated with is given, each requirement is stored with its
+    parents, along with every requirement it traces to, instead of the parents being listed in each section.
+    """
+    reqs: dict[str, Req] = {}
+    root = _section_to_schema(doc, reqs, req_index)
+    if req_index is None:
+        req_schemas = [ReqSchema(id=req.id, shall=req.shall) for req in reqs.values()]
+    else:
+        req_ids = list(reqs)
+        for req_id in req_ids:
+            for parent_id in req_index.get_parents(req_id):
+                parent = req_index.get(parent_id)
+                if parent is not None and parent_id not in reqs:
+                    reqs[parent_id] = parent
+                    req_ids.append(parent_id)
+        req_schemas = [ReqSchema(id=req.id, shall=req.shall, parents=req_index.get_parents(req.id)) for req in reqs.values()]
+    schema = DocSchema(parent_reqs=req_index is not None and req_index.parent_reqs, reqs=req_schemas, root=root)
+    return schema.model_dump_json()
+
+
+def doc_from_json(text: str, parent_reqs: Optional[bool] = None) -> Doc:
+    """
+    Load a document tree serialized by doc_to_json.
+
+    The sections and tests list the parents of their requirements if parent_reqs is set, which defaults to
+    how the document was generated.  Parents can only be added if they were stored with the document.
+
+    Raises:
+        ValueError: The text is not a serialized document, or it refers to a requirement it does not contain.
+    """
+    schema = DocSchema.model_validate_json(text)
+    if schema.version != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported document version {schema.version}, expected {SCHEMA_VERSION}")
+    req_index = ReqIndex(schema.parent_reqs if parent_reqs is None else parent_reqs, schema.reqs)
+    return _section_from_schema(schema.root, req_index)
@@ -0,0 +1,77 @@
+"""The AaC Document Model plugin template rendering engine."""
+
+import os
+import time
+from functools import lru_cache
+from threading import Lock
+from typing import Union
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
+
+
+TEMPLATE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PROMPT_TEMPLATE = "prompt_template.jinja2"
+COMPACT_PROMPT_TEMPLATE = "prompt_template_compact.jinja2"
+OUTPUT_MAIN_TEMPLATE = "output_template_main.jinja2"
+OUTPUT_ENG_TEMPLATE = "output_template_eng.jinja2"
+
+DEFAULT_BYTECODE_CACHE_DIR = os.path.join("~", ".cache", "aac-doc-mdl", "templates")
+
+
+class TemplateEngine:
+    """
+    Render the plugin's Jinja templates from a single environment shared by the whole process.
+
+    Each template is compiled once and kept in memory.  The compiled code is also stored in a bytecode cache
+    so later processes load the precompiled templates instead of parsing them again.  The time spent rendering
+    is accumulated so it can be reported separately from the time spent waiting on the AI.
+    """
+
+    def __init__(self, template_dir: Union[str, list[str]], bytecode_cache_dir: str = None):
+        """Create the Jinja environment for the templates in template_dir, or in the first of a list of directories that has each one."""
+        bytecode_cache = None
+        if bytecode_cache_dir is not None:
+            try:
+                os.makedirs(bytecode_cache_dir, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+            except OSError:
+                # the templates still work without the cache, they are just compiled at startup
+                bytecode_cache = None
+        self._env = Environment(loader=FileSystemLoader(template_dir), auto_reload=False, bytecode_cache=bytecode_cache)
+        self._templates: dict[str, Template] = {}
+        self._lock = Lock()
+        self.render_seconds = 0.0
+        self.render_count = 0
+
+    def get_template(self, name: str) -> Template:
+        """Get the compiled template with the given file name."""
+        template = self._templates.get(name)
+        if template is None:
+            with self._lock:
+                template = self._templates.get(name)
+                if template is None:
+                    template = self._templates[name] = self._env.get_template(name)
+        return template
+
+    def render(self, name: str, data: dict) -> str:
+        """Render the template with the given file name."""
+        template = self.get_template(name)
+        start = time.perf_counter()
+        text = template.render(data)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.render_seconds += elapsed
+            self.render_count += 1
+        return text
+
+
+@lru_cache(maxsize=None)
+def get_template_engine() -> TemplateEngine:
+    """Get the template engine for the plugin's templates, created on first use."""
+    return TemplateEngine(TEMPLATE_DIR, os.path.expanduser(DEFAULT_BYTECODE_CACHE_DIR))
+
+
+def create_template_engine(override_dir: str) -> TemplateEngine:
+    """Create a template engine that uses the templates in override_dir in place of the plugin's templates with the same names."""
+    return TemplateEngine([override_dir, TEMPLATE_DIR], os.path.expanduser(DEFAULT_BYTECODE_CACHE_DIR))
@@ -0,0 +1,107 @@
+"""
+The AaC Document Model plugin VCRM output formats.
+
+The matrix format is the requirement by section grid of trace marks, which grows with the number of
+requirements times the number of sections.  The other formats are written straight from the traces, one line
+at a time, so their size and the time taken to write them grow with the number of traces instead:
+
+  - edges: a CSV edge list with a line for each requirement traced by each section.
+  - edges-jsonl: the same edge list as JSON lines.
+  - summary: a CSV line for each requirement with its trace count and the sections it traces to.
+"""
+
+import csv
+import json
+
+from aac_doc_mdl.doc import VCRM, vcrm_to_csv, vcrm_to_markdown
+
+
+FORMAT_MATRIX = "matrix"
+FORMAT_EDGES = "edges"
+FORMAT_EDGES_JSONL = "edges-jsonl"
+FORMAT_SUMMARY = "summary"
+
+VCRM_FORMATS = [FORMAT_MATRIX, FORMAT_EDGES, FORMAT_EDGES_JSONL, FORMAT_SUMMARY]
+DEFAULT_VCRM_FORMATS = FORMAT_MATRIX
+
+# the file name suffixes written for each format
+FORMAT_SUFFIXES = {
+    FORMAT_MATRIX: ["-vcrm.csv", "-vcrm.md"],
+    FORMAT_EDGES: ["-vcrm-edges.csv"],
+    FORMAT_EDGES_JSONL: ["-vcrm-edges.jsonl"],
+    FORMAT_SUMMARY: ["-vcrm-summary.csv"],
+}
+
+SUMMARY_SECTION_SEPARATOR = "; "
+
+
+def parse_vcrm_formats(text: str) -> list[str]:
+    """
+    Get the formats named in a comma separated list, in the order given and without repeats.
+
+    Raises:
+        ValueError: A name is not one of the VCRM formats, or none are named.
+    """
+    formats = list(dict.fromkeys(name.strip().lower() for name in text.split(",") if name.strip()))
+    unknown = [name for name in formats if name not in VCRM_FORMATS]
+    if unknown or not formats:
+        raise ValueError(f"Unknown VCRM format {', '.join(unknown) or repr(text)}, expected a comma separated list of {', '.join(VCRM_FORMATS)}")
+    return formats
+
+
+def vcrm_to_edges_csv(vcrm: VCRM, output_file: str) -> None:
+    """Write a CSV edge list with the requirement, section, behavior and scenario of each trace."""
+    with open(output_file, "w", newline="") as csvfile:
+        csvwriter = csv.writer(csvfile)
+        csvwriter.writerow(["Requirement", "Document Section", "Behavior", "Scenario"])
+        for trace in vcrm.traces:
+            csvwriter.writerows((req_id, trace.title, behavior, scenario) for req_id, (behavior, scenario) in zip(trace.req_ids, trace.sources))
+
+
+def vcrm_to_edges_jsonl(vcrm: VCRM, output_file: str) -> None:
+    """Write a JSON lines edge list, with null for the behavior and scenario of a requirement listed by the section itself."""
+    with open(output_file, "w") as jsonlfile:
+        for trace in vcrm.traces:
+            for req_id, (behavior, scenario) in zip(trace.req_ids, trace.sources):
+                edge = {"req_id": req_id, "section": trace.title, "behavior": behavior or None, "scenario": scenario or None}
+                jsonlfile.write(json.dumps(edge) + "\n")
+
+
+def vcrm_to_summary_csv(vcrm: VCRM, output_file: str) -> None:
+    """
+    Write a CSV line for each requirement with the number of traces, the number of sections and their titles.
+
+    Sections that share a title are the same model, so they are listed once.  A requirement that does not trace
+    to any section has no sections.
+    """
+    req_sections: dict[str, dict[str, None]] = {req.id: {} for req in vcrm.all_reqs}
+    trace_counts = dict.fromkeys(req_sections, 0)
+    for trace in vcrm.traces:
+        for req_id in trace.req_ids:
+            sections = req_sections.get(req_id)
+            if sections is not None:
+                sections[trace.title] = None
+                trace_counts[req_id] += 1
+
+    with open(output_file, "w", newline="") as csvfile:
+        csvwriter = csv.writer(csvfile)
+        csvwriter.writerow(["Requirement", "Traces", "Section Count", "Document Sections"])
+        csvwriter.writerows(
+            (req_id, trace_counts[req_id], len(sections), SUMMARY_SECTION_SEPARATOR.join(sections)) for req_id, sections in req_sections.items()
+        )
+
+
+def write_vcrm(vcrm: VCRM, output_prefix: str, formats: list[str]) -> list[str]:
+    """Write the VCRM in each format to files starting with the output prefix, returning the files written."""
+    writers = {
+        FORMAT_MATRIX: [vcrm_to_csv, vcrm_to_markdown],
+        FORMAT_EDGES: [vcrm_to_edges_csv],
+        FORMAT_EDGES_JSONL: [vcrm_to_edges_jsonl],
+        FORMAT_SUMMARY: [vcrm_to_summary_csv],
+    }
+    output_files = []
+    for vcrm_format in formats:
+        for writer, suffix in zip(writers[vcrm_format], FORMAT_SUFFIXES[vcrm_format]):
+            writer(vcrm, output_prefix + suffix)
+            output_files.append(output_prefix + suffix)
+    return output_files
@@ -0,0 +1,208 @@
+"""The AaC Document Model plugin watch mode, which keeps a VCRM up to date while its architecture files are edited."""
+
+import os
+import time
+from typing import Callable, Optional
+
+from aac.context.definition import Definition
+from aac.context.definition_parser import DefinitionParser
+from aac.context.language_context import LanguageContext
+from aac.context.language_error import LanguageError
+from aac.in_out.parser import ParserError, parse
+from aac.in_out.paths import sanitize_filesystem_path
+
+from aac_doc_mdl.definition_snapshot import FileFingerprint, get_fingerprint, get_source_files
+from aac_doc_mdl.doc import VCRM, ModelGraph, ReqIndex, has_full_coverage, vcrm_from_model
+from aac_doc_mdl.doc_vcrm import write_vcrm
+from aac_doc_mdl.env_settings import get_env_number
+
+
+DEFAULT_WATCH_INTERVAL = 0.25
+
+
+class VcrmWatcher:
+    """
+    Keep the VCRM of a document model up to date while the files of its architecture are edited.
+
+    The watched files are the architecture file and every file it imports, directly or through other imported
+    files.  Each poll compares their sizes and modification times, and hashes a file whose modification time
+    changed, so saving a file without editing it does nothing.  Only the files that changed are parsed and
+    loaded again, and the ModelGraph keeps the traces of every model and requirement that was not in them.
+    Files imported for the first time are loaded, and files that are no longer imported are unloaded.
+
+    A file that cannot be parsed or loaded keeps its previous definitions until it is saved again.
+    """
+
+    def __init__(self, title: str, architecture_file: str, definitions: list[Definition], parent_reqs: bool, output_prefix: str, formats: list[str]):
+        """Watch the definitions already loaded from the architecture file, writing the VCRM of the titled model in the formats."""
+        self.title = title
+        self.architecture_file = sanitize_filesystem_path(architecture_file)
+        self.output_prefix = output_prefix
+        self.formats = formats
+        self.model_graph = ModelGraph(ReqIndex(parent_reqs))
+        self.vcrm: Optional[VCRM] = None
+        self._definitions: dict[str, list[Definition]] = {}
+        self._fingerprints: dict[str, FileFingerprint] = {}
+
+        for definition in definitions:
+            self._definitions.setdefault(definition.source.uri, []).append(definition)
+        for file_path in self._get_imported_files():
+            self._definitions.setdefault(file_path, [])
+            self._fingerprints[file_path] = get_fingerprint(file_path)
+
+    @property
+    def file_count(self) -> int:
+        """Get the number of files watched."""
+        return len(self._fingerprints)
+
+    def write(self) -> str:
+        """Write the VCRM from the definitions loaded, returning a message describing the result."""
+        model = self.model_graph.get_model(self.title)
+        if model is None:
+            self.vcrm = None
+            return f"Unable to locate a document model with name/title {self.title} in {self.architecture_file}."
+        self.vcrm = vcrm_from_model(model, self.model_graph.req_index.parent_reqs, model_graph=self.model_graph)
+        if self.vcrm is None:
+            return f"Unable to trace the document model {self.title}, a component model is missing."
+        write_vcrm(self.vcrm, self.output_prefix, self.formats)
+        trace = "a complete trace" if has_full_coverage(self.vcrm) else "an incomplete trace"
+        return f"Wrote the VCRM for {self.title} with {len(self.vcrm.all_reqs)} requirements and {len(self.vcrm.traces)} sections, {trace}."
+
+    def poll(self) -> Optional[list[str]]:
+        """Reload the files that changed and rewrite the VCRM, returning messages describing the result, or None if no file changed."""
+        changed = [file_path for file_path in self._fingerprints if self._has_changed(file_path)]
+        if not changed:
+            return None
+
+        start = time.perf_counter()
+        messages: list[str] = []
+        removed, added = self._reload(changed, messages)
+        # follow the imports of the reloaded files, loading the files imported for the first time
+        imported = self._get_imported_files()
+        while new_files := [file_path for file_path in imported if file_path not in self._fingerprints]:
+            new_removed, new_added = self._reload(new_files, messages)
+            removed.extend(new_removed)
+            added.extend(new_added)
+            imported = self._get_imported_files()
+        for file_path in [file_path for file_path in self._fingerprints if file_path not in imported]:
+            del self._fingerprints[file_path]
+            unimported = self._definitions.pop(file_path)
+            _unload(LanguageContext(), unimported)
+            removed.extend(unimported)
+
+        model_names = {definition.name for definition in removed + added if definition.get_root_key() == "model"}
+        self.model_graph.update(model_names, _get_reqs(removed), _get_reqs(added))
+        messages.append(self.write())
+        messages.append(f"Updated the VCRM after changes to {len(changed)} files in {(time.perf_counter() - start) * 1000:.0f}ms.")
+        return messages
+
+    def run(self, interval: float, on_messages: Callable[[list[str]], None]) -> None:
+        """Poll the files every interval seconds, passing the messages of each update to on_messages, until interrupted."""
+        while True:
+            time.sleep(interval)
+            messages = self.poll()
+            if messages is not None:
+                on_messages(messages)
+
+    def _has_changed(self, file_path: str) -> bool:
+        fingerprint = self._fingerprints[file_path]
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return fingerprint is not None
+        if fingerprint is not None and (stat.st_size, stat.st_mtime_ns) == fingerprint[:2]:
+            return False
+        current = get_fingerprint(file_path)
+        if fingerprint is not None and current is not None and current[2] == fingerprint[2]:
+            # saved without being edited
+            self._fingerprints[file_path] = current
+            return False
+        return True
+
+    def _reload(self, file_paths: list[str], messages: list[str]) -> tuple[list[Definition], list[Definition]]:
+        """Parse the files and load their definitions in place of the previous ones, returning the definitions unloaded and loaded."""
+        parsed: dict[str, list[Definition]] = {}
+        for file_path in file_paths:
+            self._fingerprints[file_path] = get_fingerprint(file_path)
+            try:
+                parsed[file_path] = _parse_file(file_path)
+            except (ParserError, LanguageError, OSError) as error:
+                messages.append(f"Unable to parse {file_path}, keeping its previous definitions: {error}")
+                self._definitions.setdefault(file_path, [])
+
+        context = LanguageContext()
+        removed = [definition for file_path in parsed for definition in self._definitions.get(file_path, [])]
+        added = [definition for definitions in parsed.values() for definition in definitions]
+        _unload(context, removed)
+        try:
+            DefinitionParser().load_definitions(context, added)
+        except LanguageError as error:
+            messages.append(f"Unable to load {', '.join(parsed)}, keeping the previous definitions: {error}")
+            _unload(context, added)
+            DefinitionParser().load_definitions(context, removed)
+            return [], []
+        for file_path, definitions in parsed.items():
+            self._definitions[file_path] = definitions
+        return removed, added
+
+    def _get_imported_files(self) -> set[str]:
+        """Get the architecture file and the files it imports, directly or through the other files."""
+        imported = {self.architecture_file}
+        to_visit = [self.architecture_file]
+        while to_visit:
+            for file_path in get_source_files(self._definitions.get(to_visit.pop(), [])):
+                if file_path not in imported:
+                    imported.add(file_path)
+                    to_visit.append(file_path)
+        return imported
+
+
+def _parse_file(file_path: str) -> list[Definition]:
+    """Parse the definitions in one file, without following its imports."""
+    if not os.path.isfile(file_path):
+        return []
+    with open(file_path) as architecture_file:
+        content = architecture_file.read()
+    if not content.strip():
+        return []
+    # content without a line separator would be taken for a file path
+    return parse(content if os.linesep in content else content + os.linesep, file_path)
+
+
+def _unload(context: LanguageContext, definitions: list[Definition]) -> None:
+    """
+    Remove definitions from the language context.
+
+    A definition that has since been replaced by another with the same name is left alone.
+    """
+    for definition in definitions:
+        _remove_from_context(context, definition)
+
+
+def _remove_from_context(context: LanguageContext, definition: Definition) -> None:
+    """
+    Remove a definition from the language context's internal tables.
+
+    This is the only place the plugin relies on LanguageContext internals, and it was written against aac 0.4.46.
+    LanguageContext.remove_definitions cannot be used because it looks requirements up without their ID.
+    DefinitionParser.load_definitions keys requirements by their ID as well as their name, so the lookup
+    raises a KeyError.  It also removes whatever definition now has the name, even one that has since replaced
+    this one.  test_doc_vcrm_watch checks these internals so an aac release that changes them fails the tests.
+    """
+    definition.source.is_loaded_in_context = False
+    context.context_instance.definitions.discard(definition)
+    names_to_definitions = context.context_instance.fully_qualified_name_to_definition
+    name = f"{definition.package}.{definition.name}"
+    if definition.get_root_key() == "req":
+        name = f"{name}_{definition.structure['req']['id']}"
+    if names_to_definitions.get(name) is definition:
+        del names_to_definitions[name]
+
+
+def _get_reqs(definitions: list[Definition]) -> list:
+    return [definition.instance for definition in definitions if definition.get_root_key() == "req"]
+
+
+def get_watch_interval() -> float:
+    """Get the seconds between polls configured by the environment."""
+    return get_env_number("AAC_VCRM_WATCH_INTERVAL", DEFAULT_WATCH_INTERVAL)
@@ -0,0 +1,82 @@
+"""The AaC Document Model plugin streaming markdown writer."""
+
+import os
+import tempfile
+
+
+class StreamingDocWriter:
+    """
+    Write document sections to a markdown file as soon as they are ready.
+
+    Sections are numbered by their position in the document and may arrive in any order.  The next section in
+    document order is appended to a partial file right away, while sections that arrive early are spilled to
+    their own files until everything ahead of them has been written.  The writer holds at most one section's
+    markdown in memory, never the whole document's.  The Doc tree still keeps each section's
+    generated text, which is much smaller than its rendered markdown and is needed to save the document tree.
+
+    The partial file replaces the markdown file when the writer is closed.  If generation fails, the partial
+    file and any spilled sections are left in place so the completed work is not lost.
+    """
+
+    def __init__(self, path: str, file_name: str):
+        """Start writing the markdown file for file_name in the path directory."""
+        self.md_file_path = os.path.join(path, file_name + ".md")
+        self.partial_file_path = self.md_file_path + ".part"
+        self.spill_dir = tempfile.mkdtemp(prefix=f".{file_name}-sections-", dir=path)
+        self._file = open(self.partial_file_path, "w")
+        self._next_position = 0
+        self._spilled: set[int] = set()
+        self._offset = 0
+        # the character offset in the markdown file at which each written section starts
+        self.section_offsets: list[int] = []
+
+    def write_section(self, position: int, text: str) -> None:
+        """Write a section's markdown text, or spill it if sections before it are still outstanding."""
+        if position != self._next_position:
+            with open(self._get_spill_file_path(position), "w") as spill_file:
+                spill_file.write(text)
+            self._spilled.add(position)
+            return
+
+        self._write(text)
+        while self._next_position in self._spilled:
+            self._spilled.remove(self._next_position)
+            spill_file_path = self._get_spill_file_path(self._next_position)
+            with open(spill_file_path) as spill_file:
+                self._write(spill_file.read())
+            os.remove(spill_file_path)
+        self._file.flush()
+
+    def _write(self, text: str) -> None:
+        self.section_offsets.append(self._offset)
+        self._file.write(text)
+        self._offset += len(text)
+        self._next_position += 1
+
+    def close(self) -> str:
+        """Finish the markdown file and return its path."""
+        if self._spilled:
+            self._file.close()
+            raise ValueError(f"Sections before position {min(self._spilled)} of {self.md_file_path} were never written.")
+        self._file.close()
+        os.replace(self.partial_file_path, self.md_file_path)
+        os.rmdir(self.spill_dir)
+        return self.md_file_path
+
+    def abort(self) -> None:
+        """Stop writing, keeping the partial file and spilled sections on disk."""
+        self._file.close()
+
+    def __enter__(self):
+        """Use the writer as a context manager that closes it on success."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the writer, or abort it if an exception was raised."""
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _get_spill_file_path(self, position: int) -> str:
+        return os.path.join(self.spill_dir, f"{position}.md")
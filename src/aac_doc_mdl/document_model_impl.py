@@ -6,8 +6,11 @@
 # There may be some unused imports depending on the definition of the plugin, be sure to remove unused imports.
 
 import os
+import time
+import yaml
+from contextlib import ExitStack
+from jinja2 import TemplateError
 
-from aac.context.language_context import LanguageContext
 from aac.execute.aac_execution_result import (
     ExecutionResult,
     ExecutionStatus,
@@ -15,19 +18,32 @@ from aac.execute.aac_execution_result import (
     MessageLevel,
 )
 
-from aac_doc_mdl.ai_util import get_client
-from aac_doc_mdl.doc import Doc, doc_from_model, write_doc, vcrm_from_model, vcrm_to_csv, vcrm_to_markdown, has_full_coverage
-from aac_doc_mdl.doc_prompts import create_outline_prompt, create_document_prompt
+from aac_doc_mdl.ai_batch import AZURE_BATCH_ENDPOINT, BATCH_ENDPOINT, BatchResults, write_batch_requests
+from aac_doc_mdl.ai_cache import get_cache
+from aac_doc_mdl.ai_util import DOC_MDL_SYSTEM_PROMPT, get_client
+from aac_doc_mdl.definition_snapshot import parse_and_load
+from aac_doc_mdl.doc import ReqIndex, docs_from_models, get_chunk_positions, prompts_from_model, render_doc, vcrm_from_model, has_full_coverage, write_doc
+from aac_doc_mdl.doc_manifest import DocManifest
+from aac_doc_mdl.doc_metrics import RunMetrics, measure
+from aac_doc_mdl.doc_pdf import get_pdf_settings, write_pdf
+from aac_doc_mdl.doc_writer import StreamingDocWriter
+from aac_doc_mdl.doc_prompts import create_outline_prompt, create_document_prompt, get_prompt_compactor, get_prompt_packer
+from aac_doc_mdl.doc_vcrm import DEFAULT_VCRM_FORMATS, parse_vcrm_formats, write_vcrm
+from aac_doc_mdl.doc_vcrm_watch import VcrmWatcher, get_watch_interval
+from aac_doc_mdl.doc_schema import DOC_TREE_SUFFIX, doc_from_json, doc_to_json
+from aac_doc_mdl.doc_templates import create_template_engine, get_template_engine
+from aac_doc_mdl.env_settings import check_env_settings, get_env_number
 
 plugin_name = "Document Model"
 
 
 def _get_model_definition_with_name(title: str, architecture_file: str):
 
-    context = LanguageContext()
+    definitions = parse_and_load(architecture_file)
+    return _find_model_definition(definitions, title)
 
-    definitions = context.parse_and_load(architecture_file)
 
+def _find_model_definition(definitions, title: str):
     for definition in definitions:
         if definition.get_root_key() == "model" and definition.instance.name == title:
             # This is the document model
@@ -51,6 +67,225 @@ def _get_filename_from_path(path: str) -> str:
     return file_name
 
 
+def _generate_doc(
+    definition,
+    ai_prompt_func,
+    client,
+    model: str,
+    include_eng: bool,
+    parent_reqs: bool,
+    temperature: float,
+    max_workers: int,
+    output: str,
+    file_name: str,
+    write_pdf_file: bool,
+    metrics: RunMetrics = None,
+    resume: bool = False,
+) -> list[ExecutionMessage]:
+    """Generate a document from its model, write the markdown and optional PDF, and report on the run."""
+    return _generate_docs([definition], ai_prompt_func, client, model, include_eng, parent_reqs, temperature, max_workers, [output], [file_name], write_pdf_file, metrics, resume)
+
+
+def _generate_docs(
+    definitions: list,
+    ai_prompt_func,
+    client,
+    model: str,
+    include_eng: bool,
+    parent_reqs: bool,
+    temperature: float,
+    max_workers: int,
+    outputs: list[str],
+    file_names: list[str],
+    write_pdf_file: bool,
+    metrics: RunMetrics = None,
+    resume: bool = False,
+) -> list[ExecutionMessage]:
+    """
+    Generate documents from their models, write the markdown and optional PDFs, and report on the run.
+
+    The sections of all the documents are generated together, see docs_from_models.  A manifest of each
+    section's inputs is kept next to each output so later runs only regenerate the sections whose inputs
+    changed.  The manifests are saved even if generation fails so completed sections are kept, and their
+    journals keep them if the run is killed.  When resuming, the sections in the journals are reused.
+
+    A section whose AI request fails, or is unfinished when the AAC_AI_RUN_DEADLINE seconds have passed, gets
+    a placeholder and an error message while the rest of the documents are generated.
+
+    Small sibling sections are packed into shared AI requests if packing is enabled, except when the responses
+    come from batch results, which hold one response for each section.
+
+    Each generated document tree is saved next to its output, so gen-doc-render can render it again without the AI.
+    """
+    template_engine = get_template_engine()
+    render_seconds = template_engine.render_seconds
+    prompt_compactor = get_prompt_compactor()
+    prompt_counts = prompt_compactor.get_counts()
+    prompt_packer = None if isinstance(client, BatchResults) else get_prompt_packer()
+    pack_counts = prompt_packer.get_counts() if prompt_packer is not None else None
+    start = time.perf_counter()
+    run_deadline = get_env_number("AAC_AI_RUN_DEADLINE", None)
+    deadline = time.monotonic() + run_deadline if run_deadline is not None else None
+    failures = []
+
+    # the index the documents are generated from also stores their requirements in the saved document trees
+    req_index = ReqIndex(parent_reqs)
+    cache = get_cache()
+    manifests = [DocManifest(os.path.join(output, f"{file_name}-manifest.json"), resume) for output, file_name in zip(outputs, file_names)]
+    try:
+        with ExitStack() as stack:
+            writers = [stack.enter_context(StreamingDocWriter(output, file_name)) for output, file_name in zip(outputs, file_names)]
+            docs = docs_from_models(
+                [definition.instance for definition in definitions],
+                ai_prompt_func,
+                client,
+                model,
+                include_eng,
+                parent_reqs,
+                temperature,
+                max_workers,
+                cache,
+                [writer.write_section for writer in writers],
+                manifests,
+                metrics,
+                prompt_packer,
+                deadline,
+                lambda title, section_path, reason: failures.append(f"{title}: the section {section_path} was not generated: {reason}"),
+                req_index,
+            )
+    finally:
+        for manifest in manifests:
+            manifest.save()
+        if cache is not None:
+            cache.close()
+
+    elapsed = time.perf_counter() - start
+    render_seconds = template_engine.render_seconds - render_seconds
+
+    for doc, output, file_name in zip(docs, outputs, file_names):
+        with open(os.path.join(output, f"{file_name}{DOC_TREE_SUFFIX}"), "w") as doc_tree_file:
+            doc_tree_file.write(doc_to_json(doc, req_index))
+
+    if write_pdf_file:
+        with measure(metrics, "pdf"):
+            for doc, writer, output, file_name in zip(docs, writers, outputs, file_names):
+                # each top level section is rendered as its own chunk
+                chunk_offsets = [writer.section_offsets[position] for position in get_chunk_positions(doc)]
+                write_pdf(output, file_name, chunk_offsets, *get_pdf_settings(), section_offsets=writer.section_offsets)
+
+    messages = [
+        ExecutionMessage(
+            f"Generation took {elapsed:.2f}s: {elapsed - render_seconds:.2f}s building sections and waiting on the AI, {render_seconds:.2f}s rendering templates",
+            MessageLevel.INFO,
+            None,
+            None,
+        ),
+    ]
+    for manifest, file_name in zip(manifests, file_names):
+        manifest_message = manifest.get_stats_message() if len(manifests) == 1 else f"{file_name}: {manifest.get_stats_message()}"
+        messages.append(ExecutionMessage(manifest_message, MessageLevel.INFO, None, None))
+    messages.append(ExecutionMessage(prompt_compactor.get_stats_message(prompt_counts), MessageLevel.INFO, None, None))
+    if prompt_packer is not None and prompt_packer.enabled:
+        messages.append(ExecutionMessage(prompt_packer.get_stats_message(pack_counts), MessageLevel.INFO, None, None))
+    if cache is not None:
+        messages.append(ExecutionMessage(cache.get_stats_message(), MessageLevel.INFO, None, None))
+    messages.extend(ExecutionMessage(failure, MessageLevel.ERROR, None, None) for failure in failures)
+    if failures:
+        messages.append(ExecutionMessage(f"{len(failures)} sections were not generated.  Run the command again to generate them.", MessageLevel.ERROR, None, None))
+    return messages
+
+
+def _get_status(messages: list[ExecutionMessage]) -> ExecutionStatus:
+    """Get the status of a run, which failed if it reported any errors."""
+    return ExecutionStatus.GENERAL_FAILURE if any(message.level == MessageLevel.ERROR for message in messages) else ExecutionStatus.SUCCESS
+
+
+def _write_metrics(metrics: RunMetrics, output: str, file_name: str) -> list[ExecutionMessage]:
+    """Write the profile reports of a run and summarize them, if the run was profiled."""
+    if metrics is None:
+        return []
+    json_file_path, prometheus_file_path = metrics.write_reports(output, file_name)
+    return [
+        ExecutionMessage(metrics.get_summary_message(), MessageLevel.INFO, None, None),
+        ExecutionMessage(f"Wrote the profile to {json_file_path} and {prometheus_file_path}", MessageLevel.INFO, None, None),
+    ]
+
+
+def _run_doc_command(
+    command_name: str,
+    definition,
+    ai_prompt_func,
+    generated_message: str,
+    parent_reqs: bool,
+    temperature: float,
+    max_workers: int,
+    output: str,
+    file_name: str,
+    write_pdf_file: bool,
+    batch_requests: str,
+    batch_results: str,
+    metrics: RunMetrics = None,
+    resume: bool = False,
+) -> ExecutionResult:
+    """
+    Generate a document with the AI, or run one phase of an offline batch generation.
+
+    The first batch phase writes the AI requests for the sections that changed since the last run to the
+    batch_requests file.  The second phase generates the document from the batch_results file returned by the
+    Batch API.  The AI model name is needed by both phases, but no AI client is created.
+    """
+    env_errors = check_env_settings()
+    if env_errors:
+        return _get_error_result(command_name, *env_errors)
+    if batch_requests or batch_results:
+        model = os.getenv("AAC_AI_MODEL")
+        if not model:
+            return _get_error_result(command_name, "The AAC_AI_MODEL environment variable must be set to write or read AI batch files.")
+        manifest = DocManifest(os.path.join(output, f"{file_name}-manifest.json"))
+        prompt_counts = get_prompt_compactor().get_counts()
+        prompts = prompts_from_model(definition.instance, ai_prompt_func, model, parent_reqs, temperature, manifest)
+
+    if batch_requests:
+        endpoint = AZURE_BATCH_ENDPOINT if os.getenv("AAC_AI_TYPE", "").lower() == "azure" else BATCH_ENDPOINT
+        count = write_batch_requests(batch_requests, model, temperature, DOC_MDL_SYSTEM_PROMPT, prompts, endpoint)
+        return ExecutionResult(
+            plugin_name,
+            command_name,
+            ExecutionStatus.SUCCESS,
+            [
+                ExecutionMessage(
+                    f"Wrote {count} AI batch requests to {batch_requests}.  Submit the file to the Batch API, then rerun with --batch-results and the results file.",
+                    MessageLevel.INFO,
+                    definition.source,
+                    None,
+                ),
+                ExecutionMessage(get_prompt_compactor().get_stats_message(prompt_counts), MessageLevel.INFO, None, None),
+            ],
+        )
+
+    if batch_results:
+        client = BatchResults(batch_results)
+        missing_messages = client.get_missing_messages(model, temperature, DOC_MDL_SYSTEM_PROMPT, prompts)
+        if missing_messages:
+            return _get_error_result(command_name, *missing_messages)
+    else:
+        client, model, client_error, error_result = get_client(plugin_name, use_async=True)
+        if client_error:
+            return error_result
+
+    messages = [ExecutionMessage(generated_message, MessageLevel.INFO, definition.source, None)]
+    messages.extend(
+        _generate_doc(definition, ai_prompt_func, client, model, True, parent_reqs, temperature, max_workers, output, file_name, write_pdf_file, metrics, resume)
+    )
+    messages.extend(_write_metrics(metrics, output, file_name))
+    return ExecutionResult(plugin_name, command_name, _get_status(messages), messages)
+
+
+def _get_error_result(command_name: str, *error_messages: str) -> ExecutionResult:
+    messages = [ExecutionMessage(error_message, MessageLevel.ERROR, None, None) for error_message in error_messages]
+    return ExecutionResult(plugin_name, command_name, ExecutionStatus.GENERAL_FAILURE, messages)
+
+
 def gen_doc_outline(
     title: str,
     architecture_file: str,
@@ -59,6 +294,11 @@ def gen_doc_outline(
     parent_reqs: bool,
     output: str,
     temperature: float,
+    max_workers: int,
+    batch_requests: str,
+    batch_results: str,
+    profile: bool,
+    resume: bool,
 ) -> ExecutionResult:
     """
         Business logic for allowing gen-doc-outline command to perform An AI powered command that uses your model definition to generate an annotated outline of the document with abstracts for each section.  The output is a markdown file and a PDF generated from the markdown.
@@ -75,12 +315,19 @@ def gen_doc_outline(
             parent_reqs (bool): Tells AaC to include parent requirements from your spec in the metadata output.  Default does not include parent requirements.
             output (str): The location to output generated document.  Default is current working directory.
             temperature (float): The temperature passed into the AI text generator.  Default value is 0.1
+            max_workers (int): The maximum number of document sections generated by the AI at the same time.  Default value is 1
+            batch_requests (str): Write the AI requests to this OpenAI Batch API JSONL file instead of generating the document.
+            batch_results (str): Generate the document from this OpenAI Batch API JSONL results file instead of calling the AI.
+            profile (bool): Record per-section latency, token usage, retries and cache hits along with the time of each phase, and write them to JSON and Prometheus files next to the output.
+            resume (bool): Reuse the sections completed by an earlier run that was stopped, instead of starting over.
 
        Returns:
             The results of the execution of the gen-doc-outline command.
     """
 
-    definition = _get_model_definition_with_name(title, architecture_file)
+    metrics = RunMetrics() if profile else None
+    with measure(metrics, "parse"):
+        definition = _get_model_definition_with_name(title, architecture_file)
     if definition is None:
         status = ExecutionStatus.GENERAL_FAILURE
         messages: list[ExecutionMessage] = []
@@ -93,26 +340,22 @@ def gen_doc_outline(
         messages.append(error_msg)
         return ExecutionResult(plugin_name, "gen-doc-outline", status, messages)
 
-    client, model, client_error, error_result = get_client(plugin_name)
-    if client_error:
-        return error_result
-
-    doc: Doc = doc_from_model(definition.instance, create_outline_prompt, client, model, True, parent_reqs, temperature, 0)
-
-    write_doc(output, f"{_get_filename_from_path(architecture_file)}-outline", doc, not no_pdf)
-
-    return ExecutionResult(
-        plugin_name,
+    file_name = f"{_get_filename_from_path(architecture_file)}-outline"
+    return _run_doc_command(
         "gen-doc-outline",
-        ExecutionStatus.SUCCESS,
-        [
-            ExecutionMessage(
-                "Generated: an outline with abstracts",
-                MessageLevel.INFO,
-                definition.source,
-                None,
-            )
-        ],
+        definition,
+        create_outline_prompt,
+        "Generated: an outline with abstracts",
+        parent_reqs,
+        temperature,
+        max_workers,
+        output,
+        file_name,
+        not no_pdf,
+        batch_requests,
+        batch_results,
+        metrics,
+        resume,
     )
 
 
@@ -124,6 +367,11 @@ def gen_doc_draft(
     content_only: bool,
     parent_reqs: bool,
     temperature: float,
+    max_workers: int,
+    batch_requests: str,
+    batch_results: str,
+    profile: bool,
+    resume: bool,
 ) -> ExecutionResult:
     """
         Business logic for allowing gen-doc-draft command to perform An AI powered command that uses your model definition to generate an a draft of the document with content for each section.  The output is a markdown file and a PDF generated from the markdown.
@@ -138,12 +386,19 @@ def gen_doc_draft(
     no_pdf (bool): Instructs the plugin to not generate a PDF file, resulting only in a markdown file
     output (str): The location to output generated document.  Default is current working directory.content_only (bool): Instructs the plugin to only produce document content, eliminating additional data such as requirements and test information.
     parent_reqs (bool): Tells AaC to include parent requirements from your spec in the metadata output.  Default does not include parent requirements.temperature (float): The temperature passed into the AI text generator.  Default value is 0.2
+    max_workers (int): The maximum number of document sections generated by the AI at the same time.  Default value is 1
+    batch_requests (str): Write the AI requests to this OpenAI Batch API JSONL file instead of generating the document.
+    batch_results (str): Generate the document from this OpenAI Batch API JSONL results file instead of calling the AI.
+    profile (bool): Record per-section latency, token usage, retries and cache hits along with the time of each phase, and write them to JSON and Prometheus files next to the output.
+    resume (bool): Reuse the sections completed by an earlier run that was stopped, instead of starting over.
 
        Returns:
             The results of the execution of the gen-doc-draft command.
     """
 
-    definition = _get_model_definition_with_name(title, architecture_file)
+    metrics = RunMetrics() if profile else None
+    with measure(metrics, "parse"):
+        definition = _get_model_definition_with_name(title, architecture_file)
     if definition is None:
         status = ExecutionStatus.GENERAL_FAILURE
         messages: list[ExecutionMessage] = []
@@ -156,31 +411,27 @@ def gen_doc_draft(
         messages.append(error_msg)
         return ExecutionResult(plugin_name, "gen-doc-draft", status, messages)
 
-    client, model, client_error, error_result = get_client(plugin_name)
-    if client_error:
-        return error_result
-
-    doc: Doc = doc_from_model(definition.instance, create_document_prompt, client, model, True, parent_reqs, temperature, 0)
-
-    write_doc(output, f"{_get_filename_from_path(architecture_file)}-draft", doc, not no_pdf)
-
-    return ExecutionResult(
-        plugin_name,
+    file_name = f"{_get_filename_from_path(architecture_file)}-draft"
+    return _run_doc_command(
         "gen-doc-draft",
-        ExecutionStatus.SUCCESS,
-        [
-            ExecutionMessage(
-                "Generated: a draft document from a model",
-                MessageLevel.INFO,
-                definition.source,
-                None,
-            )
-        ],
+        definition,
+        create_document_prompt,
+        "Generated: a draft document from a model",
+        parent_reqs,
+        temperature,
+        max_workers,
+        output,
+        file_name,
+        not no_pdf,
+        batch_requests,
+        batch_results,
+        metrics,
+        resume,
     )
 
 
 def gen_doc_vcrm(
-    title: str, doc_architecture_file: str, output: str, parent_reqs: bool
+    title: str, doc_architecture_file: str, output: str, parent_reqs: bool, formats: str = DEFAULT_VCRM_FORMATS, watch: bool = False
 ) -> ExecutionResult:
     """
         Business logic for allowing gen-doc-vcrm command to perform Generate a verification cross-reference matrix for you document.  The creates a table with all the requirements as rows, document sections as columns, and an indicator showing the trace from requirement to section.
@@ -190,12 +441,23 @@ def gen_doc_vcrm(
             doc_architecture_file (str): A path to a YAML file containing an AaC-defined document model to evaluate.
             output (str): The location to output generated document.  Default is current working directory.
             parent_reqs (bool): Tells AaC to include parent requirements from your spec in the VCRM output.  Default does not include parent requirements.
+            formats (str): A comma separated list of the VCRM formats to write: matrix, edges, edges-jsonl or summary.  Default is matrix.
+            watch (bool): Keep running and rewrite the VCRM each time one of the architecture files changes, until interrupted.
 
        Returns:
             The results of the execution of the gen-doc-vcrm command.
     """
 
-    definition = _get_model_definition_with_name(title, doc_architecture_file)
+    try:
+        vcrm_formats = parse_vcrm_formats(formats)
+    except ValueError as error:
+        return ExecutionResult(plugin_name, "gen-doc-vcrm", ExecutionStatus.GENERAL_FAILURE, [ExecutionMessage(str(error), MessageLevel.ERROR, None, None)])
+    env_errors = check_env_settings() if watch else []
+    if env_errors:
+        return _get_error_result("gen-doc-vcrm", *env_errors)
+
+    definitions = parse_and_load(doc_architecture_file)
+    definition = _find_model_definition(definitions, title)
     if definition is None:
         status = ExecutionStatus.GENERAL_FAILURE
         messages: list[ExecutionMessage] = []
@@ -208,13 +470,15 @@ def gen_doc_vcrm(
         messages.append(error_msg)
         return ExecutionResult(plugin_name, "gen-doc-vcrm", status, messages)
 
-    vcrm = vcrm_from_model(definition.instance, parent_reqs)
-
     arch_file_name = _get_filename_from_path(doc_architecture_file)
-    vcrm_to_csv(vcrm, f"{os.path.join(output, arch_file_name)}-vcrm.csv")
-    vcrm_to_markdown(vcrm, f"{os.path.join(output, arch_file_name)}-vcrm.md")
+    output_prefix = os.path.join(output, arch_file_name)
+    if watch:
+        vcrm = _watch_vcrm(title, doc_architecture_file, definitions, parent_reqs, output_prefix, vcrm_formats)
+    else:
+        vcrm = vcrm_from_model(definition.instance, parent_reqs)
+        write_vcrm(vcrm, output_prefix, vcrm_formats)
 
-    if has_full_coverage(vcrm):
+    if vcrm is not None and has_full_coverage(vcrm):
         return ExecutionResult(
             plugin_name,
             "gen-doc-vcrm",
@@ -239,3 +503,176 @@ def gen_doc_vcrm(
         )
         messages.append(error_msg)
         return ExecutionResult(plugin_name, "gen-doc-vcrm", status, messages)
+
+
+def _watch_vcrm(title: str, doc_architecture_file: str, definitions: list, parent_reqs: bool, output_prefix: str, vcrm_formats: list[str]):
+    """Write the VCRM, then rewrite it each time the architecture files change until interrupted, returning the last VCRM written."""
+    watcher = VcrmWatcher(title, doc_architecture_file, definitions, parent_reqs, output_prefix, vcrm_formats)
+    print(watcher.write())
+    print(f"Watching {watcher.file_count} files for changes.  Press Ctrl+C to stop.")
+    try:
+        watcher.run(get_watch_interval(), lambda messages: print("\n".join(messages)))
+    except KeyboardInterrupt:
+        pass
+    return watcher.vcrm
+
+
+def _read_documents_file(documents_file: str) -> list[tuple[str, str, str]]:
+    """
+    Read the title, architecture file and output directory of each document in a documents file.
+
+    Architecture files are relative to the documents file and output directories are relative to the
+    output directory of the command.  Raises ValueError if the file does not list any documents.
+    """
+    with open(documents_file) as file:
+        content = yaml.safe_load(file)
+    entries = content.get("documents") if isinstance(content, dict) else None
+    if not entries or not isinstance(entries, list):
+        raise ValueError("it must have a documents list")
+
+    documents_dir = os.path.dirname(os.path.abspath(documents_file))
+    documents = []
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not entry.get("title") or not entry.get("architecture-file"):
+            raise ValueError(f"document {index + 1} must have a title and an architecture-file")
+        documents.append((entry["title"], os.path.join(documents_dir, entry["architecture-file"]), entry.get("output", "")))
+    return documents
+
+
+def gen_doc_all(
+    documents_file: str,
+    no_pdf: bool,
+    output: str,
+    outline: bool,
+    parent_reqs: bool,
+    temperature: float,
+    max_workers: int,
+    profile: bool,
+    resume: bool,
+) -> ExecutionResult:
+    """
+        Business logic for allowing gen-doc-all command to perform An AI powered command that generates a draft, or an outline, of every document listed in a documents file.
+
+    Every architecture file is parsed once and the documents share the AI client, templates and requirement lookups.  The sections of all the documents are generated from one queue of at most max-workers concurrent AI requests.
+
+        Args:
+            documents_file (str): A path to a YAML file listing the documents, each with a title and an architecture-file.
+            no_pdf (bool): Instructs the plugin to not generate PDF files, resulting only in markdown files.
+            output (str): The location to output generated documents.  Default is current working directory.
+            outline (bool): Generate outlines with abstracts instead of drafts.
+            parent_reqs (bool): Tells AaC to include parent requirements from your spec in the metadata output.  Default does not include parent requirements.
+            temperature (float): The temperature passed into the AI text generator.  Default value is 0.2
+            max_workers (int): The maximum number of document sections generated by the AI at the same time, across all documents.  Default value is 1
+            profile (bool): Record per-section latency, token usage, retries and cache hits along with the time of each phase, and write them to JSON and Prometheus files in the output directory.
+            resume (bool): Reuse the sections completed by an earlier run that was stopped, instead of starting over.
+
+       Returns:
+            The results of the execution of the gen-doc-all command.
+    """
+
+    try:
+        documents = _read_documents_file(documents_file)
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        return _get_error_result("gen-doc-all", f"Unable to read the documents file {documents_file}: {e}")
+
+    metrics = RunMetrics() if profile else None
+    suffix = "outline" if outline else "draft"
+    definitions_by_file = {}
+    definitions = []
+    outputs = []
+    file_names = []
+    output_paths = set()
+    error_messages = []
+    for title, architecture_file, document_output in documents:
+        if architecture_file not in definitions_by_file:
+            with measure(metrics, "parse"):
+                definitions_by_file[architecture_file] = parse_and_load(architecture_file)
+        definition = _find_model_definition(definitions_by_file[architecture_file], title)
+        if definition is None:
+            error_messages.append(f"Unable to locate a document model with name/title {title} in {architecture_file}.")
+            continue
+        file_name = f"{_get_filename_from_path(architecture_file)}-{suffix}"
+        document_output = os.path.join(output, document_output)
+        output_path = os.path.abspath(os.path.join(document_output, file_name))
+        if output_path in output_paths:
+            error_messages.append(f"More than one document would be written to {output_path}.md.  Give {title} its own output directory.")
+            continue
+        output_paths.add(output_path)
+        definitions.append(definition)
+        outputs.append(document_output)
+        file_names.append(file_name)
+    error_messages.extend(check_env_settings())
+    if error_messages:
+        return _get_error_result("gen-doc-all", *error_messages)
+
+    client, model, client_error, error_result = get_client(plugin_name, use_async=True)
+    if client_error:
+        return error_result
+
+    for document_output in outputs:
+        os.makedirs(document_output, exist_ok=True)
+    ai_prompt_func = create_outline_prompt if outline else create_document_prompt
+    messages = [ExecutionMessage(f"Generated: {len(definitions)} documents from {documents_file}", MessageLevel.INFO, None, None)]
+    messages.extend(
+        _generate_docs(definitions, ai_prompt_func, client, model, True, parent_reqs, temperature, max_workers, outputs, file_names, not no_pdf, metrics, resume)
+    )
+    messages.extend(_write_metrics(metrics, output, "gen-doc-all"))
+    return ExecutionResult(plugin_name, "gen-doc-all", _get_status(messages), messages)
+
+
+def gen_doc_render(
+    doc_file: str, output: str, no_pdf: bool, content_only: bool, parent_reqs: bool, no_parent_reqs: bool = False, template_dir: str = None
+) -> ExecutionResult:
+    """
+        Business logic for allowing gen-doc-render command to perform Render the markdown, and a PDF generated from it, again from the document tree saved by gen-doc-draft, gen-doc-outline or gen-doc-all without calling the AI.
+
+        Args:
+            doc_file (str): A path to the document tree file saved next to a generated document.
+            output (str): The location to output the rendered document.  Default is current working directory.
+            no_pdf (bool): Instructs the plugin to not generate a PDF file, resulting only in a markdown file.
+            content_only (bool): Instructs the plugin to only produce document content, eliminating additional data such as requirements and test information.
+            parent_reqs (bool): Tells AaC to include parent requirements in the metadata output.  Default includes them if the document was generated with them.
+            no_parent_reqs (bool): Tells AaC to leave parent requirements out of the metadata output, even if the document was generated with them.
+            template_dir (str): A directory with output templates used in place of the plugin's templates with the same names.
+
+       Returns:
+            The results of the execution of the gen-doc-render command.
+    """
+
+    if parent_reqs and no_parent_reqs:
+        return _get_error_result("gen-doc-render", "Only one of --parent-reqs and --no-parent-reqs can be given.")
+    env_errors = check_env_settings() if not no_pdf else []
+    if env_errors:
+        return _get_error_result("gen-doc-render", *env_errors)
+    start = time.perf_counter()
+    try:
+        with open(doc_file) as doc_tree_file:
+            # without either flag the parent requirements are rendered as the document was generated
+            doc = doc_from_json(doc_tree_file.read(), True if parent_reqs else False if no_parent_reqs else None)
+    except (OSError, ValueError) as error:
+        return _get_error_result("gen-doc-render", f"Unable to load the document tree {doc_file}: {error}")
+    if template_dir and not os.path.isdir(template_dir):
+        return _get_error_result("gen-doc-render", f"The template directory {template_dir} does not exist.")
+
+    try:
+        render_doc(doc, not content_only, create_template_engine(template_dir) if template_dir else None)
+    except TemplateError as error:
+        return _get_error_result("gen-doc-render", f"Unable to render the document with the templates in {template_dir}: {error}")
+
+    base_name = os.path.basename(doc_file)
+    file_name = base_name[: -len(DOC_TREE_SUFFIX)] if base_name.endswith(DOC_TREE_SUFFIX) else _get_filename_from_path(doc_file)
+    os.makedirs(output, exist_ok=True)
+    write_doc(output, file_name, doc, not no_pdf)
+    return ExecutionResult(
+        plugin_name,
+        "gen-doc-render",
+        ExecutionStatus.SUCCESS,
+        [
+            ExecutionMessage(
+                f"Rendered: {os.path.join(output, file_name)}.md from {doc_file} in {time.perf_counter() - start:.2f}s",
+                MessageLevel.INFO,
+                None,
+                None,
+            )
+        ],
+    )
@@ -0,0 +1,64 @@
+"""The AaC Document Model plugin numeric settings read from AAC_* environment variables."""
+
+import os
+from typing import Callable, Optional, Union
+
+
+class EnvSettingError(ValueError):
+    """A numeric setting in the environment is not a valid number."""
+
+
+def _parse_whole_number(value: str) -> int:
+    """Parse a whole number, which may be written with a decimal point such as 6.0."""
+    number = float(value)
+    if not number.is_integer():
+        raise ValueError(value)
+    return int(number)
+
+
+# each numeric setting with how it is parsed and what it must be
+NUMBER_SETTINGS: dict[str, tuple[Callable[[str], Union[int, float]], str]] = {
+    "AAC_AI_RPM": (float, "a number"),
+    "AAC_AI_TPM": (float, "a number"),
+    "AAC_AI_MAX_RETRIES": (_parse_whole_number, "a whole number"),
+    "AAC_AI_BACKOFF_BASE": (float, "a number"),
+    "AAC_AI_BACKOFF_MAX": (float, "a number"),
+    "AAC_AI_REQUEST_TIMEOUT": (float, "a number"),
+    "AAC_AI_RUN_DEADLINE": (float, "a number"),
+    "AAC_AI_MAX_CONNECTIONS": (_parse_whole_number, "a whole number"),
+    "AAC_AI_MAX_KEEPALIVE": (_parse_whole_number, "a whole number"),
+    "AAC_AI_KEEPALIVE_EXPIRY": (float, "a number"),
+    "AAC_AI_CONNECT_TIMEOUT": (float, "a number"),
+    "AAC_AI_READ_TIMEOUT": (float, "a number"),
+    "AAC_AI_CACHE_MAX_MB": (float, "a number"),
+    "AAC_AI_CACHE_MAX_AGE_DAYS": (float, "a number"),
+    "AAC_AI_PROMPT_TOKEN_BUDGET": (_parse_whole_number, "a whole number"),
+    "AAC_AI_PROMPT_PACK_TOKENS": (_parse_whole_number, "a whole number"),
+    "AAC_AI_PROMPT_PACK_MAX_SECTIONS": (_parse_whole_number, "a whole number"),
+    "AAC_PDF_WORKERS": (_parse_whole_number, "a whole number"),
+    "AAC_PDF_MAX_MEMORY_MB": (_parse_whole_number, "a whole number"),
+    "AAC_VCRM_WATCH_INTERVAL": (float, "a number"),
+}
+
+
+def get_env_number(name: str, default: Optional[Union[int, float]]) -> Optional[Union[int, float]]:
+    """Get a numeric setting from the environment, or the default if it is not set, raising an EnvSettingError if it is not valid."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    parse, description = NUMBER_SETTINGS[name]
+    try:
+        return parse(value)
+    except ValueError:
+        raise EnvSettingError(f"The {name} environment variable must be {description}, not '{value}'.") from None
+
+
+def check_env_settings() -> list[str]:
+    """Check every numeric setting in the environment, returning an error message for each one that is not valid."""
+    errors = []
+    for name in NUMBER_SETTINGS:
+        try:
+            get_env_number(name, None)
+        except EnvSettingError as error:
+            errors.append(str(error))
+    return errors
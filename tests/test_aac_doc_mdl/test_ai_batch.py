@@ -0,0 +1,93 @@
+import json
+import os
+from os.path import dirname, join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from aac.execute.aac_execution_result import ExecutionStatus
+
+from aac_doc_mdl.ai_batch import BatchResults, get_custom_id, write_batch_requests
+from aac_doc_mdl.document_model_impl import gen_doc_draft
+
+
+TRADE_STUDY_FILE = join(dirname(dirname(__file__)), "samples", "trade_study", "doc", "cookie_trade_study.aac")
+TRADE_STUDY_TITLE = "Cookie Trade Study"
+
+
+def run_batch_stand_in(requests_path: str, results_path: str, failed_custom_ids: tuple = ()):
+    """Stand in for the Batch API by answering each request in a request file with a digest of its prompt."""
+    with open(requests_path) as requests_file, open(results_path, "w") as results_file:
+        for index, line in enumerate(requests_file):
+            request = json.loads(line)
+            custom_id = request["custom_id"]
+            if custom_id in failed_custom_ids:
+                response = {"status_code": 500, "request_id": f"req_{index}", "body": {"error": {"message": "server error"}}}
+            else:
+                prompt = request["body"]["messages"][-1]["content"]
+                body = {
+                    "id": f"chatcmpl-{index}",
+                    "object": "chat.completion",
+                    "model": request["body"]["model"],
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": f"Batch answer {len(prompt)}"}, "finish_reason": "stop"}],
+                }
+                response = {"status_code": 200, "request_id": f"req_{index}", "body": body}
+            result = {"id": f"batch_req_{index}", "custom_id": custom_id, "response": response, "error": None}
+            results_file.write(json.dumps(result) + "\n")
+
+
+class TestAIBatch(TestCase):
+
+    def test_write_batch_requests_dedupes_prompts_with_stable_ids(self):
+        with TemporaryDirectory() as temp_dir:
+            path = join(temp_dir, "requests.jsonl")
+            self.assertEqual(2, write_batch_requests(path, "test", 0.2, "system", ["one", "two", "one"]))
+            with open(path) as requests_file:
+                requests = [json.loads(line) for line in requests_file]
+
+        self.assertEqual([get_custom_id("test", 0.2, "system", "one"), get_custom_id("test", 0.2, "system", "two")], [request["custom_id"] for request in requests])
+        self.assertEqual(get_custom_id("test", 0.2, "system", "one"), get_custom_id("test", 0.2, "system", "one"))
+        self.assertNotEqual(get_custom_id("test", 0.2, "system", "one"), get_custom_id("test", 0.3, "system", "one"))
+        self.assertEqual(("POST", "/v1/chat/completions"), (requests[0]["method"], requests[0]["url"]))
+        self.assertEqual({"model": "test", "temperature": 0.2, "messages": [{"role": "system", "content": "system"}, {"role": "user", "content": "two"}]}, requests[1]["body"])
+
+    def test_batch_results_report_failed_and_missing_requests(self):
+        with TemporaryDirectory() as temp_dir:
+            requests_path = join(temp_dir, "requests.jsonl")
+            results_path = join(temp_dir, "results.jsonl")
+            write_batch_requests(requests_path, "test", 0.2, "system", ["one", "two"])
+            run_batch_stand_in(requests_path, results_path, (get_custom_id("test", 0.2, "system", "two"),))
+            results = BatchResults(results_path)
+
+            self.assertEqual("Batch answer 3", results.get_response("test", 0.2, "system", "one"))
+            self.assertIsNone(results.get_response("test", 0.2, "system", "two"))
+            messages = results.get_missing_messages("test", 0.2, "system", ["one", "two", "three"])
+            self.assertEqual(2, len(messages))
+            self.assertIn("section 2 failed: server error", messages[0])
+            self.assertIn("has no result for section 3", messages[1])
+
+    def test_gen_doc_draft_two_phase_batch(self):
+        with TemporaryDirectory() as temp_dir, patch.dict(os.environ, {"AAC_AI_MODEL": "test", "AAC_AI_CACHE": "false"}):
+            requests_path = join(temp_dir, "requests.jsonl")
+            results_path = join(temp_dir, "results.jsonl")
+
+            result = gen_doc_draft(TRADE_STUDY_TITLE, TRADE_STUDY_FILE, True, temp_dir, False, True, 0.2, 1, requests_path, None, False, False)
+            self.assertEqual(ExecutionStatus.SUCCESS, result.status_code)
+            self.assertFalse(os.path.exists(join(temp_dir, "cookie_trade_study-draft.md")))
+            with open(requests_path) as requests_file:
+                self.assertEqual(5, len(requests_file.readlines()))
+
+            run_batch_stand_in(requests_path, results_path)
+            result = gen_doc_draft(TRADE_STUDY_TITLE, TRADE_STUDY_FILE, True, temp_dir, False, True, 0.2, 1, None, results_path, False, False)
+            self.assertEqual(ExecutionStatus.SUCCESS, result.status_code)
+            with open(join(temp_dir, "cookie_trade_study-draft.md")) as md_file:
+                self.assertEqual(5, md_file.read().count("Batch answer "))
+
+            # the manifest leaves nothing to request until the model changes
+            result = gen_doc_draft(TRADE_STUDY_TITLE, TRADE_STUDY_FILE, True, temp_dir, False, True, 0.2, 1, requests_path, None, False, False)
+            self.assertIn("Wrote 0 AI batch requests", result.messages[0].message)
+
+            # results for a different temperature cannot answer the prompts
+            result = gen_doc_draft(TRADE_STUDY_TITLE, TRADE_STUDY_FILE, True, join(temp_dir, "other"), False, True, 0.3, 1, None, results_path, False, False)
+            self.assertEqual(ExecutionStatus.GENERAL_FAILURE, result.status_code)
+            self.assertEqual(5, len(result.messages))
@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os.path import join
+from tempfile import TemporaryDirectory
+from threading import Event
+from unittest import TestCase
+
+from aac_doc_mdl.ai_cache import ResponseCache
+
+
+class TestResponseCache(TestCase):
+
+    def test_key_covers_all_request_inputs(self):
+        key = ResponseCache.key("gpt", 0.1, "system", "prompt")
+
+        self.assertEqual(key, ResponseCache.key("gpt", 0.1, "system", "prompt"))
+        self.assertNotEqual(key, ResponseCache.key("gpt-2", 0.1, "system", "prompt"))
+        self.assertNotEqual(key, ResponseCache.key("gpt", 0.2, "system", "prompt"))
+        self.assertNotEqual(key, ResponseCache.key("gpt", 0.1, "other system", "prompt"))
+        self.assertNotEqual(key, ResponseCache.key("gpt", 0.1, "system", "other prompt"))
+
+    def test_responses_persist_between_runs(self):
+        with TemporaryDirectory() as temp_dir:
+            path = join(temp_dir, "cache.sqlite")
+            cache = ResponseCache(path, 1024 * 1024, 1)
+            self.assertEqual("generated", cache.get_or_generate("key", lambda: "generated"))
+            cache.close()
+
+            cache = ResponseCache(path, 1024 * 1024, 1)
+            self.assertEqual("generated", cache.get_or_generate("key", lambda: self.fail("should be cached")))
+            self.assertEqual((1, 0), (cache.hits, cache.misses))
+            cache.close()
+
+    def test_identical_requests_share_one_call(self):
+        with TemporaryDirectory() as temp_dir:
+            cache = ResponseCache(join(temp_dir, "cache.sqlite"), 1024 * 1024, 1)
+            release = Event()
+            calls = []
+
+            def slow_generate():
+                calls.append(1)
+                release.wait(5)
+                return "generated"
+
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                futures = [executor.submit(cache.get_or_generate, "key", slow_generate) for _ in range(4)]
+                time.sleep(0.2)
+                release.set()
+                results = [future.result() for future in futures]
+
+            self.assertEqual(["generated"] * 4, results)
+            self.assertEqual(1, len(calls))
+            self.assertEqual(1, cache.misses)
+            self.assertEqual(3, cache.shared + cache.hits)
+            cache.close()
+
+    def test_failed_generation_is_not_cached(self):
+        with TemporaryDirectory() as temp_dir:
+            cache = ResponseCache(join(temp_dir, "cache.sqlite"), 1024 * 1024, 1)
+
+            def fail():
+                raise RuntimeError("AI unavailable")
+
+            self.assertRaises(RuntimeError, cache.get_or_generate, "key", fail)
+            self.assertIsNone(cache.get("key"))
+            cache.close()
+
+    def test_eviction_by_size_and_age(self):
+        with TemporaryDirectory() as temp_dir:
+            cache = ResponseCache(join(temp_dir, "cache.sqlite"), 10, 1)
+            cache.put("old", "12345678")
+            time.sleep(0.01)
+            cache.put("new", "12345678")
+            cache.evict()
+            self.assertIsNone(cache.get("old"))
+            self.assertEqual("12345678", cache.get("new"))
+
+            cache.max_age_seconds = 0
+            cache.evict()
+            self.assertIsNone(cache.get("new"))
+            cache.close()
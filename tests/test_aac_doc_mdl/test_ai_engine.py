@@ -0,0 +1,168 @@
+import asyncio
+import json
+import time
+from os.path import join
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from unittest import TestCase
+
+import httpx
+from openai import APIStatusError, AsyncOpenAI, BadRequestError, RateLimitError
+
+from aac_doc_mdl.ai_cache import ResponseCache
+from aac_doc_mdl.ai_engine import AdaptiveLimiter, GenerationEngine, TokenBucket, get_retry_after
+from aac_doc_mdl.ai_util import generate_all
+
+
+def make_error(error_class, status_code: int, headers: dict = None):
+    """Create an OpenAI error for a response with the given status code and headers."""
+    request = httpx.Request("POST", "http://localhost/v1/chat/completions")
+    response = httpx.Response(status_code, headers=headers or {}, request=request)
+    return error_class(f"status {status_code}", response=response, body=None)
+
+
+class FakeAsyncAIClient:
+    """A stand-in for the AsyncOpenAI client that fails with the queued errors before answering."""
+
+    def __init__(self, errors: list = None, delay: float = 0.01):
+        """Create a client that fails with the errors in order, then answers after the delay."""
+        self.errors = list(errors or [])
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, messages, model, temperature, **kwargs):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.errors:
+                raise self.errors.pop(0)
+            content = f"response to {messages[-1]['content']}"
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+                usage=SimpleNamespace(total_tokens=10),
+            )
+        finally:
+            self.in_flight -= 1
+
+
+def make_async_openai_client(requests: list, throttle_first: bool = False) -> AsyncOpenAI:
+    """Create a real AsyncOpenAI client whose HTTP requests are answered locally."""
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        prompt = json.loads(request.content)["messages"][-1]["content"]
+        requests.append(prompt)
+        if throttle_first and len(requests) == 1:
+            return httpx.Response(429, headers={"retry-after": "0"}, json={"error": {"message": "slow down"}})
+        return httpx.Response(200, json={
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "test",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": f"response to {prompt}"}}],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 5, "total_tokens": 10},
+        })
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handle))
+    return AsyncOpenAI(base_url="http://localhost/v1", api_key="test", http_client=http_client, max_retries=0)
+
+
+class TestGenerationEngine(TestCase):
+
+    def test_generate_all_keeps_prompt_order_and_concurrency_limit(self):
+        client = FakeAsyncAIClient()
+        engine = GenerationEngine(client, "test", "system", 3)
+
+        responses = engine.generate_all(0.1, [f"prompt {index}" for index in range(10)])
+
+        self.assertEqual([f"response to prompt {index}" for index in range(10)], responses)
+        self.assertEqual(3, client.max_in_flight)
+
+    def test_throttled_requests_are_retried_after_the_requested_delay(self):
+        client = FakeAsyncAIClient([make_error(RateLimitError, 429, {"retry-after-ms": "50"}), make_error(APIStatusError, 503)])
+        engine = GenerationEngine(client, "test", "system", 1, backoff_base=0.01)
+
+        start = time.monotonic()
+        self.assertEqual(["response to prompt"], engine.generate_all(0.1, ["prompt"]))
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+        self.assertEqual((3, 2, 1), (client.calls, engine.retries, engine.throttled))
+
+    def test_retries_are_bounded_and_client_errors_are_not_retried(self):
+        engine = GenerationEngine(FakeAsyncAIClient([make_error(RateLimitError, 429)] * 3), "test", "system", 1, max_retries=2, backoff_base=0.001)
+        self.assertRaises(RateLimitError, engine.generate_all, 0.1, ["prompt"])
+
+        client = FakeAsyncAIClient([make_error(BadRequestError, 400)])
+        engine = GenerationEngine(client, "test", "system", 1)
+        self.assertRaises(BadRequestError, engine.generate_all, 0.1, ["prompt"])
+        self.assertEqual(1, client.calls)
+
+    def test_failures_are_isolated_with_timeouts_and_a_deadline(self):
+        engine = GenerationEngine(FakeAsyncAIClient([make_error(BadRequestError, 400)]), "test", "system", 1)
+        errors = {}
+        self.assertEqual([None, "response to good"], engine.generate_all(0.1, ["bad", "good"], on_error=errors.__setitem__))
+        self.assertIsInstance(errors[0], BadRequestError)
+
+        engine = GenerationEngine(FakeAsyncAIClient(delay=0.2), "test", "system", 2, max_retries=1, backoff_base=0.001, request_timeout=0.01)
+        errors = {}
+        self.assertEqual([None], engine.generate_all(0.1, ["slow"], on_error=errors.__setitem__))
+        self.assertIsInstance(errors[0], TimeoutError)
+        self.assertEqual(1, engine.retries)
+
+        engine = GenerationEngine(FakeAsyncAIClient(delay=1.0), "test", "system", 2)
+        errors = {}
+        start = time.monotonic()
+        self.assertEqual([None, None], engine.generate_all(0.1, ["one", "two"], on_error=errors.__setitem__, deadline=time.monotonic() + 0.05))
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual([0, 1], sorted(errors))
+        self.assertRaises(TimeoutError, engine.generate_all, 0.1, ["one"], deadline=time.monotonic() + 0.05)
+
+    def test_get_retry_after(self):
+        self.assertEqual(2.0, get_retry_after(make_error(RateLimitError, 429, {"retry-after": "2"})))
+        self.assertEqual(0.25, get_retry_after(make_error(RateLimitError, 429, {"retry-after-ms": "250", "retry-after": "2"})))
+        self.assertEqual(0.0, get_retry_after(make_error(RateLimitError, 429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})))
+        self.assertIsNone(get_retry_after(make_error(RateLimitError, 429)))
+
+    def test_adaptive_limiter_halves_on_throttle_and_recovers(self):
+        limiter = AdaptiveLimiter(8)
+        limiter.on_throttle()
+        limiter.on_throttle()
+        self.assertEqual(2, limiter.limit)
+        for _ in range(5):
+            limiter.on_success()
+        self.assertLess(limiter.limit, 5)
+        for _ in range(40):
+            limiter.on_success()
+        self.assertEqual(8, limiter.limit)
+        for _ in range(10):
+            limiter.on_throttle()
+        self.assertEqual(1, limiter.limit)
+
+    def test_token_bucket_waits_for_refill(self):
+        async def drain():
+            bucket = TokenBucket(600)
+            await bucket.acquire(600)
+            start = time.monotonic()
+            await bucket.acquire(2)
+            return time.monotonic() - start
+
+        self.assertGreaterEqual(asyncio.run(drain()), 0.15)
+
+    def test_generate_all_with_async_client_uses_engine_and_cache(self):
+        prompts = ["one", "two", "one"]
+        with TemporaryDirectory() as temp_dir:
+            cache = ResponseCache(join(temp_dir, "cache.sqlite"), 1024 * 1024, 1)
+            requests = []
+            responses = generate_all(make_async_openai_client(requests, throttle_first=True), "test", 0.1, prompts, 2, cache)
+            self.assertEqual(["response to one", "response to two", "response to one"], responses)
+            self.assertEqual(3, len(requests))
+            self.assertEqual((0, 2, 1), (cache.hits, cache.misses, cache.shared))
+
+            requests = []
+            self.assertEqual(responses, generate_all(make_async_openai_client(requests), "test", 0.1, prompts, 2, cache))
+            self.assertEqual([], requests)
+            cache.close()
@@ -0,0 +1,100 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from unittest.mock import patch
+
+from aac_doc_mdl.ai_transport import ClientPool, TransportSettings, create_http_client, get_client_pool
+from aac_doc_mdl.ai_util import generate_all, get_client
+
+
+class ChatCompletionHandler(BaseHTTPRequestHandler):
+    """Answer chat completions over keep-alive connections, recording the client port of each request."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["content-length"])))
+        self.server.client_ports.append(self.client_address[1])
+        body = json.dumps({
+            "id": "test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": request["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "response"}}],
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAiTransport(TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ChatCompletionHandler)
+        self.server.client_ports = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.environ = patch.dict(os.environ, {
+            "AAC_AI_URL": f"http://127.0.0.1:{self.server.server_address[1]}/v1",
+            "AAC_AI_MODEL": "test",
+            "AAC_AI_KEY": "test",
+        })
+        self.environ.start()
+
+    def tearDown(self):
+        self.environ.stop()
+        get_client_pool().close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get_client_shares_clients(self):
+        client, _, _, _ = get_client("test", use_async=True)
+        same_client, _, _, _ = get_client("test", use_async=True)
+        sync_client, _, _, _ = get_client("test")
+        with patch.dict(os.environ, {"AAC_AI_MAX_CONNECTIONS": "4"}):
+            small_pool_client, _, _, _ = get_client("test", use_async=True)
+
+        self.assertIs(client, same_client)
+        self.assertIsNot(client, sync_client)
+        self.assertIsNot(client, small_pool_client)
+
+    def test_connections_are_reused_across_runs(self):
+        client, model, _, _ = get_client("test", use_async=True)
+
+        self.assertEqual(["response"] * 3, generate_all(client, model, 0.2, ["a", "b", "c"]))
+        self.assertEqual(["response"], generate_all(client, model, 0.2, ["d"]))
+
+        self.assertEqual(4, len(self.server.client_ports))
+        self.assertEqual(1, len(set(self.server.client_ports)))
+
+    def test_get_client_settings_from_env(self):
+        with patch.dict(os.environ, {"AAC_AI_CONNECT_TIMEOUT": "2", "AAC_AI_READ_TIMEOUT": "30", "AAC_AI_MAX_RETRIES": "1"}):
+            client, _, _, _ = get_client("test")
+
+        self.assertEqual(2, client.timeout.connect)
+        self.assertEqual(30, client.timeout.read)
+        self.assertEqual(1, client.max_retries)
+
+    def test_proxy_client(self):
+        settings = TransportSettings(max_connections=4, max_keepalive=8)
+        client = create_http_client(settings, True, {"http://": "http://127.0.0.1:3128", "https://": None})
+        client.close()
+
+        self.assertEqual(4, settings.max_keepalive)
+
+    def test_close(self):
+        pool = ClientPool()
+        settings = TransportSettings()
+        sync_client = pool.get(("sync",), lambda: create_http_client(settings, True, {}))
+        async_client = pool.get(("async",), lambda: create_http_client(settings, True, {}, use_async=True))
+
+        pool.close()
+
+        self.assertTrue(sync_client.is_closed)
+        self.assertTrue(async_client.is_closed)
@@ -0,0 +1,52 @@
+import json
+import os
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from benchmarks.fake_ai_server import FakeAIServer
+from benchmarks.run_benchmarks import BENCHMARKS, BenchmarkSettings, find_regressions, load_baselines, run_benchmarks, save_baselines
+from benchmarks.synthetic_models import SIZES, get_parent_indexes
+
+from aac_doc_mdl.ai_transport import get_client_pool
+from aac_doc_mdl.ai_util import generate_all, get_client
+
+
+class TestBenchmarks(TestCase):
+
+    def tearDown(self):
+        get_client_pool().close()
+
+    def test_get_parent_indexes(self):
+        self.assertEqual([-1, 0, 0, 0, 1], get_parent_indexes(5, 2))
+        self.assertEqual([-1, 0, 0, 1, 1, 2, 2], get_parent_indexes(7, 3))
+
+    def test_fake_ai_server_errors_are_retried(self):
+        with FakeAIServer(error_rate=0.3, retry_after_ms=1) as server:
+            with patch.dict(os.environ, {"AAC_AI_URL": server.url, "AAC_AI_MODEL": "test", "AAC_AI_KEY": "test"}):
+                client, model, _, _ = get_client("test", use_async=True)
+                responses = generate_all(client, model, 0.2, [f"Prompt {index}" for index in range(20)], 4)
+
+        self.assertEqual(20, len(set(responses)))
+        self.assertGreater(server.errors, 0)
+        self.assertEqual(20 + server.errors, server.requests)
+
+    def test_run_benchmarks_and_baselines(self):
+        settings = BenchmarkSettings(repeat=1, max_workers=4, latency=0.0)
+        results = run_benchmarks([SIZES["tiny"]], settings)
+
+        self.assertEqual(BENCHMARKS, list(results["tiny"]))
+        with TemporaryDirectory() as temp_dir:
+            baselines_path = join(temp_dir, "baselines.json")
+            self.assertEqual({}, load_baselines(baselines_path)["results"])
+            save_baselines(baselines_path, {"tiny": {"parse": 1.0, "doc_from_model": 0.01}}, settings)
+            with open(baselines_path) as baselines_file:
+                baselines = json.load(baselines_file)
+
+        self.assertEqual(4, baselines["settings"]["max_workers"])
+        slower = {"tiny": {"parse": 1.5, "doc_from_model": 0.04, "write_doc": 9.0}}
+        regressions = find_regressions(slower, baselines["results"], 0.25)
+        self.assertEqual(2, len(regressions))
+        self.assertIn("tiny parse: 1.500s is 50% slower", regressions[0])
+        self.assertEqual(["tiny write_doc: no baseline, record one with --save"], find_regressions(slower, baselines["results"], 0.6))
@@ -0,0 +1,89 @@
+import os
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from aac.context.language_context import LanguageContext
+
+from aac_doc_mdl.definition_snapshot import DefinitionSnapshotCache, parse_and_load
+
+
+MAIN_AAC = """import:
+  files:
+    - ./section.aac
+---
+model:
+  name: Snapshot Doc
+  description: The document.
+  components:
+    - name: section
+      model: Snapshot Section
+"""
+
+SECTION_AAC = """model:
+  name: Snapshot Section
+  description: {description}
+"""
+
+
+def write_file(path: str, content: str):
+    """Write an architecture file."""
+    with open(path, "w") as aac_file:
+        aac_file.write(content)
+
+
+class TestDefinitionSnapshotCache(TestCase):
+
+    def test_snapshot_reused_until_an_imported_file_changes(self):
+        with TemporaryDirectory() as temp_dir:
+            main_file = join(temp_dir, "main.aac")
+            section_file = join(temp_dir, "section.aac")
+            write_file(main_file, MAIN_AAC)
+            write_file(section_file, SECTION_AAC.format(description="First."))
+            cache = DefinitionSnapshotCache(join(temp_dir, "snapshots"))
+
+            parsed = cache.parse(main_file)
+            reloaded = cache.parse(main_file)
+            self.assertEqual((1, 1), (cache.misses, cache.hits))
+            self.assertEqual([definition.structure for definition in parsed], [definition.structure for definition in reloaded])
+
+            # touching a file without changing it keeps the snapshot
+            stat = os.stat(section_file)
+            os.utime(section_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+            cache.parse(main_file)
+            self.assertEqual((1, 2), (cache.misses, cache.hits))
+
+            write_file(section_file, SECTION_AAC.format(description="Second."))
+            changed = cache.parse(main_file)
+            self.assertEqual((2, 2), (cache.misses, cache.hits))
+            section = [definition for definition in changed if definition.name == "Snapshot Section"][0]
+            self.assertEqual("Second.", section.structure["model"]["description"])
+
+    def test_snapshot_rejected_when_a_missing_import_appears(self):
+        with TemporaryDirectory() as temp_dir:
+            main_file = join(temp_dir, "main.aac")
+            write_file(main_file, MAIN_AAC)
+            cache = DefinitionSnapshotCache(join(temp_dir, "snapshots"))
+            self.assertEqual(["Snapshot Doc"], [definition.name for definition in cache.parse(main_file) if definition.get_root_key() == "model"])
+
+            write_file(join(temp_dir, "section.aac"), SECTION_AAC.format(description="New."))
+            names = [definition.name for definition in cache.parse(main_file) if definition.get_root_key() == "model"]
+            self.assertEqual(["Snapshot Doc", "Snapshot Section"], names)
+            self.assertEqual((2, 0), (cache.misses, cache.hits))
+
+    def test_parse_and_load_from_snapshot(self):
+        with TemporaryDirectory() as temp_dir:
+            main_file = join(temp_dir, "main.aac")
+            write_file(main_file, MAIN_AAC)
+            write_file(join(temp_dir, "section.aac"), SECTION_AAC.format(description="Loaded."))
+            os.environ["AAC_DEFINITION_CACHE_DIR"] = join(temp_dir, "snapshots")
+            try:
+                parse_and_load(main_file)
+                definitions = parse_and_load(main_file)
+            finally:
+                del os.environ["AAC_DEFINITION_CACHE_DIR"]
+
+            self.assertEqual(1, len(os.listdir(join(temp_dir, "snapshots"))))
+            self.assertEqual(["Snapshot Doc", "Snapshot Section"], sorted(definition.name for definition in definitions if definition.get_root_key() == "model"))
+            section = LanguageContext().get_definitions_by_name("Snapshot Section")[0]
+            self.assertEqual("Loaded.", section.instance.description)
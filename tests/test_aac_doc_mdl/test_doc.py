@@ -0,0 +1,420 @@
+import json
+import re
+from hashlib import sha256
+from os.path import dirname, join
+from tempfile import TemporaryDirectory
+from threading import Lock
+from types import SimpleNamespace
+from unittest import TestCase
+
+from aac.context.language_context import LanguageContext
+
+from aac_doc_mdl.ai_cache import ResponseCache
+from aac_doc_mdl.doc import (
+    VCRM, ReqIndex, Req, VcrmMatrix, VcrmTrace, doc_from_model, docs_from_models, get_chunk_positions, has_full_coverage, render_doc, vcrm_from_model, vcrm_to_csv, vcrm_to_markdown,
+    _add_markdown_indent, _get_markdown_text
+)
+from aac_doc_mdl.doc_manifest import DocManifest
+from aac_doc_mdl.doc_metrics import SOURCE_AI, SOURCE_MANIFEST, SOURCE_PACKED, SOURCE_SHARED, RunMetrics
+from aac_doc_mdl.doc_prompts import PromptPacker, create_document_prompt
+from aac_doc_mdl.doc_schema import doc_from_json, doc_to_json
+from aac_doc_mdl.doc_writer import StreamingDocWriter
+
+
+TRADE_STUDY_FILE = join(dirname(dirname(__file__)), "samples", "trade_study", "doc", "cookie_trade_study.aac")
+TRADE_STUDY_TITLE = "Cookie Trade Study"
+
+CYCLIC_REQS = """
+req:
+  name: Index Child
+  id: IDX-003
+  shall: The child shall trace to both parents.
+  parents:
+    - IDX-001
+    - IDX-002
+---
+req:
+  name: Index Parent One
+  id: IDX-001
+  shall: The first parent shall trace to the root.
+  parents:
+    - IDX-000
+---
+req:
+  name: Index Parent Two
+  id: IDX-002
+  shall: The second parent shall trace to the root.
+  parents:
+    - IDX-000
+---
+req:
+  name: Index Root
+  id: IDX-000
+  shall: The root shall trace back to the child.
+  parents:
+    - IDX-003
+"""
+
+SHARED_MODELS = """
+model:
+  name: Shared Document
+  description: A document that uses a boilerplate section twice.
+  components:
+    - name: first
+      model: Shared Boilerplate
+    - name: wrapper
+      model: Shared Wrapper
+---
+model:
+  name: Shared Wrapper
+  description: A section holding the boilerplate section and a reference back to the document.
+  components:
+    - name: second
+      model: Shared Boilerplate
+    - name: back
+      model: Shared Document
+---
+model:
+  name: Shared Boilerplate
+  description: Boilerplate used in two places.
+  behavior:
+    - name: Boilerplate
+      description: The boilerplate content.
+      acceptance:
+        - name: Boilerplate
+          scenarios:
+            - name: Boilerplate
+              requirements:
+                - SHR-001
+              given:
+                - The document exists.
+              when:
+                - You read the document.
+              then:
+                - The boilerplate is present.
+---
+req:
+  name: Shared Requirement
+  id: SHR-001
+  shall: The boilerplate shall be included.
+"""
+
+
+class FakeAIClient:
+    """A stand-in for the OpenAI client that answers with a digest of the prompt."""
+
+    def __init__(self):
+        """Create a client that records the prompts it is sent."""
+        self.prompts = []
+        self._lock = Lock()
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, messages, model, temperature, **kwargs):
+        prompt = messages[-1]["content"]
+        with self._lock:
+            self.prompts.append(prompt)
+        content = f"```markdown\nSection {sha256(prompt.encode()).hexdigest()[:12]}\n\n# Heading\nBody text\n```"
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=12),
+        )
+
+
+class TitleAIClient(FakeAIClient):
+    """A stand-in for the OpenAI client that answers each section with its title, and packed prompts section by section."""
+
+    def __init__(self, split_packs=True, failing_title=None):
+        """Create a client that answers packed prompts without their markers unless split_packs is set, and fails the section with failing_title."""
+        super().__init__()
+        self.split_packs = split_packs
+        self.failing_title = failing_title
+
+    def create(self, messages, model, temperature, **kwargs):
+        prompt = messages[-1]["content"]
+        with self._lock:
+            self.prompts.append(prompt)
+        titles = re.findall(r"^Title: (.*)$", prompt, re.MULTILINE)
+        if self.failing_title in titles:
+            raise RuntimeError("service unavailable")
+        if len(titles) == 1:
+            content = f"Section {titles[0]}\n\n# Heading\nBody text"
+        elif self.split_packs:
+            content = "\n".join(f"<<<SECTION {number}>>>\nSection {title}\n\n# Heading\nBody text" for number, title in enumerate(titles, 1))
+        else:
+            content = "Sections without their markers"
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=12),
+        )
+
+
+def load_trade_study():
+    """Load the trade study sample and get its document model."""
+    context = LanguageContext()
+    definitions = context.parse_and_load(TRADE_STUDY_FILE)
+    return [definition for definition in definitions if definition.name == TRADE_STUDY_TITLE][0].instance
+
+
+class TestDoc(TestCase):
+
+    def test_doc_from_model_parallel_matches_serial(self):
+        model = load_trade_study()
+
+        serial_client = FakeAIClient()
+        serial_doc = doc_from_model(model, create_document_prompt, serial_client, "test", True, True, 0.2, 0)
+        parallel_client = FakeAIClient()
+        parallel_doc = doc_from_model(model, create_document_prompt, parallel_client, "test", True, True, 0.2, 0, 4)
+
+        self.assertEqual(_get_markdown_text(serial_doc), _get_markdown_text(parallel_doc))
+        self.assertEqual(sorted(serial_client.prompts), sorted(parallel_client.prompts))
+        self.assertEqual(5, len(parallel_client.prompts))
+
+    def test_docs_from_models_matches_doc_from_model(self):
+        model = load_trade_study()
+        section_model = LanguageContext().get_definitions_by_name("Evaluation")[0].instance
+        expected = [_get_markdown_text(doc_from_model(each, create_document_prompt, FakeAIClient(), "test", True, True, 0.2, 0)) for each in (model, section_model)]
+
+        client = FakeAIClient()
+        docs = docs_from_models([model, section_model], create_document_prompt, client, "test", True, True, 0.2, 4)
+
+        self.assertEqual(expected, [_get_markdown_text(doc) for doc in docs])
+        self.assertEqual(6, len(client.prompts))
+
+    def test_doc_from_model_strips_markdown_fence(self):
+        doc = doc_from_model(load_trade_study(), create_document_prompt, FakeAIClient(), "test", False, False, 0.2, 0, 2)
+
+        self.assertTrue(doc.generated.startswith("Section "))
+        self.assertNotIn("```", doc.generated)
+        self.assertEqual(["Introduction", "EvaluationApproach", "Evaluation", "Result"], [section.title for section in doc.sections])
+        self.assertIn("\n## Heading", doc.sections[0].output)
+
+    def test_doc_from_model_reuses_cached_responses(self):
+        model = load_trade_study()
+        with TemporaryDirectory() as temp_dir:
+            cache = ResponseCache(join(temp_dir, "cache.sqlite"), 1024 * 1024, 1)
+            first_doc = doc_from_model(model, create_document_prompt, FakeAIClient(), "test", True, True, 0.2, 0, 4, cache)
+            rerun_client = FakeAIClient()
+            rerun_doc = doc_from_model(model, create_document_prompt, rerun_client, "test", True, True, 0.2, 0, 4, cache)
+            cache.close()
+
+        self.assertEqual(_get_markdown_text(first_doc), _get_markdown_text(rerun_doc))
+        self.assertEqual(0, len(rerun_client.prompts))
+        self.assertEqual((5, 5), (cache.misses, cache.hits))
+
+    def test_req_index_parent_closure_handles_diamonds_and_cycles(self):
+        LanguageContext().parse_and_load(CYCLIC_REQS)
+
+        self.assertEqual(["IDX-003"], [req.id for req in ReqIndex(False).lookup("IDX-003")])
+        self.assertEqual([], ReqIndex(True).lookup("IDX-999"))
+
+        req_index = ReqIndex(True)
+        self.assertEqual(["IDX-003", "IDX-001", "IDX-000", "IDX-002"], [req.id for req in req_index.lookup("IDX-003")])
+        self.assertEqual(["IDX-000", "IDX-003", "IDX-001", "IDX-002"], [req.id for req in req_index.lookup("IDX-000")])
+        self.assertEqual(["IDX-002", "IDX-000", "IDX-003", "IDX-001"], [req.id for req in req_index.lookup("IDX-002")])
+
+    def test_doc_from_model_streams_sections_to_writer(self):
+        model = load_trade_study()
+        expected = _get_markdown_text(doc_from_model(model, create_document_prompt, FakeAIClient(), "test", True, True, 0.2, 0))
+
+        with TemporaryDirectory() as temp_dir:
+            with StreamingDocWriter(temp_dir, "doc") as writer:
+                doc = doc_from_model(model, create_document_prompt, FakeAIClient(), "test", True, True, 0.2, 0, 4, None, writer.write_section)
+            with open(join(temp_dir, "doc.md")) as md_file:
+                self.assertEqual(expected, md_file.read())
+
+        self.assertEqual("", doc.output)
+        self.assertTrue(doc.generated.startswith("Section "))
+        self.assertEqual([0, 1, 2, 3, 4], get_chunk_positions(doc))
+
+    def test_doc_from_model_only_regenerates_changed_sections(self):
+        model = load_trade_study()
+        with TemporaryDirectory() as temp_dir:
+            manifest_path = join(temp_dir, "doc-manifest.json")
+            manifest = DocManifest(manifest_path)
+            first_doc = doc_from_model(model, create_document_prompt, FakeAIClient(), "test", True, True, 0.2, 0, 2, None, None, manifest)
+            manifest.save()
+
+            rerun_client = FakeAIClient()
+            manifest = DocManifest(manifest_path)
+            rerun_doc = doc_from_model(model, create_document_prompt, rerun_client, "test", True, True, 0.2, 0, 2, None, None, manifest)
+            manifest.save()
+            self.assertEqual(_get_markdown_text(first_doc), _get_markdown_text(rerun_doc))
+            self.assertEqual([], rerun_client.prompts)
+            self.assertEqual((5, 0), (manifest.reused, manifest.regenerated))
+
+            # a section's description is part of its own prompt and its parent's prompt
+            result_model = LanguageContext().get_definitions_by_name("Result")[0].instance
+            result_model.description = "A changed description."
+            edit_client = FakeAIClient()
+            manifest = DocManifest(manifest_path)
+            doc_from_model(model, create_document_prompt, edit_client, "test", True, True, 0.2, 0, 2, None, None, manifest)
+            self.assertEqual(2, len(edit_client.prompts))
+            self.assertEqual((3, 2), (manifest.reused, manifest.regenerated))
+
+    def test_doc_from_model_records_metrics(self):
+        model = load_trade_study()
+        with TemporaryDirectory() as temp_dir:
+            manifest = DocManifest(join(temp_dir, "doc-manifest.json"))
+            client = FakeAIClient()
+            metrics = RunMetrics()
+            doc_from_model(model, create_document_prompt, client, "test", True, True, 0.2, 0, 2, None, None, manifest, metrics)
+            manifest.save()
+
+            rerun_metrics = RunMetrics()
+            doc_from_model(model, create_document_prompt, FakeAIClient(), "test", True, True, 0.2, 0, 2, None, None, DocManifest(manifest.path), rerun_metrics)
+
+        summary = metrics.get_document_summaries()[TRADE_STUDY_TITLE]
+        self.assertEqual((5, 5), (summary["sections"], summary["ai_requests"]))
+        self.assertEqual(sum(len(prompt) // 4 for prompt in client.prompts), summary["prompt_tokens"])
+        self.assertEqual(5 * 12, summary["completion_tokens"])
+        self.assertEqual({SOURCE_AI}, {record["source"] for record in metrics.sections})
+        self.assertGreater(metrics.phase_seconds["ai"], 0.0)
+        self.assertEqual([SOURCE_MANIFEST] * 5, [record["source"] for record in rerun_metrics.sections])
+
+    def test_doc_from_model_generates_shared_sections_once(self):
+        definitions = LanguageContext().parse_and_load(SHARED_MODELS)
+        model = [definition for definition in definitions if definition.name == "Shared Document"][0].instance
+        client = FakeAIClient()
+        metrics = RunMetrics()
+
+        doc = doc_from_model(model, create_document_prompt, client, "test", True, True, 0.2, 0, 2, None, None, None, metrics)
+
+        self.assertEqual(3, len(client.prompts))
+        self.assertEqual(["Shared Boilerplate", "Shared Wrapper"], [section.title for section in doc.sections])
+        self.assertEqual(["Shared Boilerplate"], [section.title for section in doc.sections[1].sections])
+        first, second = doc.sections[0], doc.sections[1].sections[0]
+        self.assertEqual(first.generated, second.generated)
+        self.assertTrue(first.output.startswith("## Shared Boilerplate\n"))
+        self.assertTrue(second.output.startswith("### Shared Boilerplate\n"))
+        self.assertEqual([SOURCE_AI, SOURCE_AI, SOURCE_AI, SOURCE_SHARED], sorted(record["source"] for record in metrics.sections))
+
+        vcrm = vcrm_from_model(model, False)
+        self.assertEqual(["Shared Document", "Shared Boilerplate", "Shared Wrapper", "Shared Boilerplate"], vcrm.all_sections)
+        self.assertEqual(["SHR-001"], [req.id for req in vcrm.all_reqs])
+
+    def test_doc_from_model_packs_sibling_sections(self):
+        model = load_trade_study()
+        expected = _get_markdown_text(doc_from_model(model, create_document_prompt, TitleAIClient(), "test", True, True, 0.2, 0, 2))
+
+        client = TitleAIClient()
+        metrics = RunMetrics()
+        packer = PromptPacker(token_threshold=100000)
+        doc = doc_from_model(model, create_document_prompt, client, "test", True, True, 0.2, 0, 2, None, None, None, metrics, packer)
+
+        self.assertEqual(expected, _get_markdown_text(doc))
+        self.assertEqual(2, len(client.prompts))
+        self.assertEqual((1, 4, 0), packer.get_counts())
+        self.assertEqual([SOURCE_AI, SOURCE_AI, SOURCE_PACKED, SOURCE_PACKED, SOURCE_PACKED], sorted(record["source"] for record in metrics.sections))
+
+        client = TitleAIClient(split_packs=False)
+        metrics = RunMetrics()
+        packer = PromptPacker(token_threshold=100000)
+        doc = doc_from_model(model, create_document_prompt, client, "test", True, True, 0.2, 0, 2, None, None, None, metrics, packer)
+
+        self.assertEqual(expected, _get_markdown_text(doc))
+        self.assertEqual(6, len(client.prompts))
+        self.assertEqual((1, 4, 4), packer.get_counts())
+        self.assertEqual([0, 0, 0, 0, 1], sorted(record["retries"] for record in metrics.sections))
+
+    def test_doc_from_model_isolates_failed_sections(self):
+        model = load_trade_study()
+        self.assertRaises(RuntimeError, doc_from_model, model, create_document_prompt, TitleAIClient(failing_title="Evaluation"), "test", True, True, 0.2, 0, 2)
+
+        with TemporaryDirectory() as temp_dir:
+            manifest_path = join(temp_dir, "doc-manifest.json")
+            manifest = DocManifest(manifest_path)
+            failures = []
+            doc = doc_from_model(
+                model, create_document_prompt, TitleAIClient(failing_title="Evaluation"), "test", True, True, 0.2, 0, 2, None, None, manifest, None, None, None,
+                lambda *failure: failures.append(failure)
+            )
+            manifest.save()
+            self.assertEqual((4, 1), (manifest.regenerated, manifest.failed))
+
+            self.assertEqual(1, len(failures))
+            title, section_path, reason = failures[0]
+            self.assertEqual((TRADE_STUDY_TITLE, "service unavailable"), (title, reason))
+            self.assertTrue(section_path.endswith(":Evaluation"))
+            self.assertIn("> **This section was not generated:** service unavailable", doc.sections[2].output)
+            self.assertIn("Section Result", doc.sections[3].output)
+
+            client = TitleAIClient()
+            doc = doc_from_model(model, create_document_prompt, client, "test", True, True, 0.2, 0, 2, None, None, DocManifest(manifest_path))
+
+            self.assertEqual(1, len(client.prompts))
+            self.assertIn("Section Evaluation", doc.sections[2].output)
+
+    def test_doc_json_round_trip_interns_reqs(self):
+        doc = doc_from_model(load_trade_study(), create_document_prompt, FakeAIClient(), "test", True, True, 0.2, 0, 2)
+
+        text = doc_to_json(doc)
+        loaded = doc_from_json(text)
+
+        self.assertEqual(_get_markdown_text(doc), _get_markdown_text(loaded))
+        self.assertEqual(text, doc_to_json(loaded))
+        req_ids = [req["id"] for req in json.loads(text)["reqs"]]
+        self.assertEqual(len(set(req_ids)), len(req_ids))
+        section = loaded.sections[0]
+        section_reqs = {req.id: req for req in section.reqs}
+        for test in [test for content in section.content for test in content.tests]:
+            for req in test.reqs:
+                self.assertIs(section_reqs.get(req.id, req), req)
+
+        missing_req = {"reqs": [], "root": {"title": "Doc", "description": "", "generated": "", "output": "", "content": [], "req_ids": ["MISSING-001"]}}
+        with self.assertRaises(ValueError):
+            doc_from_json(json.dumps(missing_req))
+
+    def test_render_doc_from_json_with_other_options(self):
+        model = load_trade_study()
+        with_parents = doc_from_model(model, create_document_prompt, TitleAIClient(), "test", True, True, 0.2, 0, 2)
+        without_parents = doc_from_model(model, create_document_prompt, TitleAIClient(), "test", True, False, 0.2, 0, 2)
+        content_only = doc_from_model(model, create_document_prompt, TitleAIClient(), "test", False, False, 0.2, 0, 2)
+
+        text = doc_to_json(with_parents, ReqIndex(True))
+        self.assertTrue(json.loads(text)["parent_reqs"])
+        for parent_reqs, include_eng, expected in [(None, True, with_parents), (False, True, without_parents), (False, False, content_only)]:
+            loaded = doc_from_json(text, parent_reqs)
+            render_doc(loaded, include_eng)
+            self.assertEqual(_get_markdown_text(expected), _get_markdown_text(loaded))
+
+        # the parents are stored with the requirements, so they can be added to a document generated without them
+        loaded = doc_from_json(doc_to_json(without_parents, ReqIndex(False)), True)
+        render_doc(loaded, True)
+        self.assertEqual(_get_markdown_text(with_parents), _get_markdown_text(loaded))
+
+    def test_add_markdown_indent_shifts_headings(self):
+        self.assertEqual("### Title\nText # not a heading\n##  # Indented\n\n", _add_markdown_indent("# Title\nText # not a heading\n  # Indented\n", 2))
+        self.assertEqual("# Title", _add_markdown_indent("# Title", 0))
+
+    def test_vcrm_from_model_traces_every_section(self):
+        vcrm = vcrm_from_model(load_trade_study(), True)
+
+        self.assertEqual([TRADE_STUDY_TITLE, "Introduction", "EvaluationApproach", "Evaluation", "Result"], vcrm.all_sections)
+        self.assertEqual(sorted(req.id for req in vcrm.all_reqs), [req.id for req in vcrm.all_reqs])
+        self.assertTrue(has_full_coverage(vcrm))
+
+    def test_vcrm_matrix_rows_and_coverage(self):
+        reqs = [Req(id=f"REQ-{index}", shall="It shall.") for index in range(3)]
+        traces = [VcrmTrace(title=f"S{column}", req_ids=["REQ-0"] if column % 3 == 0 else []) for column in range(11)]
+        traces.append(VcrmTrace(title="S1", req_ids=["REQ-1", "REQ-9"]))
+        vcrm = VCRM(all_reqs=reqs, all_sections=[trace.title for trace in traces], traces=traces)
+
+        matrix = VcrmMatrix(vcrm)
+
+        self.assertEqual("|X|-|-|X|-|-|X|-|-|X|-|-", matrix.get_row_text(0, "|"))
+        self.assertEqual(",-,X,-,-,-,-,-,-,-,-,-,X", matrix.get_row_text(1, ","))
+        self.assertEqual(["REQ-2"], matrix.get_untraced_req_ids())
+        self.assertFalse(has_full_coverage(vcrm))
+
+    def test_vcrm_writers(self):
+        reqs = [Req(id="REQ,1", shall="It shall."), Req(id="REQ-2", shall="It shall.")]
+        traces = [VcrmTrace(title="One", req_ids=["REQ,1"]), VcrmTrace(title="Two", req_ids=["REQ-2"])]
+        vcrm = VCRM(all_reqs=reqs, all_sections=["One", "Two"], traces=traces)
+
+        with TemporaryDirectory() as temp_dir:
+            vcrm_to_csv(vcrm, join(temp_dir, "vcrm.csv"))
+            vcrm_to_markdown(vcrm, join(temp_dir, "vcrm.md"))
+            with open(join(temp_dir, "vcrm.csv"), newline="") as csv_file:
+                self.assertEqual('Document Section,One,Two\r\n"REQ,1",X,-\r\nREQ-2,-,X\r\n', csv_file.read())
+            with open(join(temp_dir, "vcrm.md")) as md_file:
+                self.assertEqual("|Document Section|One|Two|\n|---|---|---|\n|REQ,1|X|-|\n|REQ-2|-|X|\n", md_file.read())
@@ -0,0 +1,65 @@
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from aac_doc_mdl import doc_html
+from aac_doc_mdl.doc_html import HtmlCache, convert_markdown, convert_sections
+
+
+SECTIONS = [
+    "# Doc\n\n> A quoted summary\n",
+    "## One\n\n```\ncode\n```\n",
+    "## Two\n\n- a list\n",
+    "## One\n\n```\ncode\n```\n",
+]
+
+
+class TestDocHtml(TestCase):
+
+    def test_convert_sections_matches_converting_the_document(self):
+        sections_html = convert_sections(SECTIONS)
+
+        self.assertEqual(4, len(sections_html))
+        self.assertEqual(sections_html[1], sections_html[3])
+        # a section ends as if followed by a blank line, so the next heading is not taken into its block quote
+        self.assertEqual(convert_markdown("\n".join(SECTIONS)).split(), "".join(sections_html).split())
+        self.assertNotIn("<h2>One</h2>", sections_html[0])
+
+    def test_convert_sections_in_parallel(self):
+        with patch.object(doc_html, "MIN_PARALLEL_CHARACTERS", 0):
+            self.assertEqual(convert_sections(SECTIONS, workers=1), convert_sections(SECTIONS, workers=2))
+
+    def test_html_cache_converts_only_changed_sections(self):
+        with TemporaryDirectory() as temp_dir:
+            cache_path = join(temp_dir, "doc-html-cache.json")
+            cache = HtmlCache(cache_path)
+            first_html = convert_sections(SECTIONS, cache)
+            cache.save()
+            self.assertEqual(0, cache.hits)
+
+            changed = SECTIONS[:2] + ["## Two\n\n- a changed list\n"]
+            cache = HtmlCache(cache_path)
+            with patch.object(doc_html, "convert_markdown", wraps=convert_markdown) as convert:
+                changed_html = convert_sections(changed, cache)
+            cache.save()
+
+            self.assertEqual([changed[2]], [call.args[0] for call in convert.call_args_list])
+            self.assertEqual(first_html[:2], changed_html[:2])
+            self.assertIn("a changed list", changed_html[2])
+            self.assertEqual((2, 1), (cache.hits, cache.misses))
+
+            # only the sections of the latest render are kept
+            cache = HtmlCache(cache_path)
+            self.assertIsNone(cache.get(SECTIONS[2]))
+            self.assertEqual(changed_html[2], cache.get(changed[2]))
+
+    def test_html_cache_ignores_unreadable_file(self):
+        with TemporaryDirectory() as temp_dir:
+            cache_path = join(temp_dir, "doc-html-cache.json")
+            with open(cache_path, "w") as cache_file:
+                cache_file.write("{not json")
+
+            cache = HtmlCache(cache_path)
+
+            self.assertIsNone(cache.get(SECTIONS[0]))
@@ -0,0 +1,73 @@
+from os.path import exists, join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from aac_doc_mdl.doc_manifest import DocManifest
+
+
+class TestDocManifest(TestCase):
+
+    def test_unchanged_sections_are_reused_and_stale_sections_dropped(self):
+        with TemporaryDirectory() as temp_dir:
+            path = join(temp_dir, "doc-manifest.json")
+            manifest = DocManifest(path)
+            self.assertIsNone(manifest.get("Doc", "hash"))
+            manifest.record("Doc", "hash", "doc response")
+            manifest.record("Doc/old:Old", "hash", "old response")
+            manifest.save()
+
+            manifest = DocManifest(path)
+            self.assertEqual("doc response", manifest.get("Doc", "hash"))
+            self.assertIsNone(manifest.get("Doc/old:Old", "changed"))
+            manifest.record("Doc", "hash", "doc response")
+            manifest.record("Doc/new:New", "hash", "new response")
+            manifest.record_failure("Doc/failed:Failed")
+            manifest.save()
+            # only the responses recorded count, not every lookup that missed
+            self.assertEqual((1, 1, 1), (manifest.reused, manifest.regenerated, manifest.failed))
+            self.assertIn("1 sections failed", manifest.get_stats_message())
+
+            manifest = DocManifest(path)
+            self.assertEqual("doc response", manifest.get("Doc", "hash"))
+            self.assertIsNone(manifest.get("Doc/old:Old", "hash"))
+
+    def test_resume_reuses_journaled_sections_of_a_killed_run(self):
+        with TemporaryDirectory() as temp_dir:
+            path = join(temp_dir, "doc-manifest.json")
+            manifest = DocManifest(path)
+            manifest.record("Doc", "hash", "doc response")
+            manifest.record("Doc/intro:Intro", "hash", "intro response")
+            # the run is killed before the manifest is saved, part way through writing the next entry
+            with open(manifest.journal_path, "a") as journal_file:
+                journal_file.write('{"path": "Doc/end:End", "ha')
+
+            self.assertIsNone(DocManifest(path).get("Doc", "hash"))
+            manifest = DocManifest(path, resume=True)
+            self.assertEqual("doc response", manifest.get("Doc", "hash"))
+            self.assertEqual("intro response", manifest.get("Doc/intro:Intro", "hash"))
+            self.assertIsNone(manifest.get("Doc/end:End", "hash"))
+            manifest.record("Doc", "hash", "doc response")
+            manifest.record("Doc/intro:Intro", "hash", "intro response")
+            self.assertIn("2 sections resumed from the journal", manifest.get_stats_message())
+            manifest.save()
+
+            self.assertFalse(exists(manifest.journal_path))
+            self.assertEqual("doc response", DocManifest(path).get("Doc", "hash"))
+
+    def test_unreadable_manifest_starts_empty(self):
+        with TemporaryDirectory() as temp_dir:
+            path = join(temp_dir, "doc-manifest.json")
+            with open(path, "w") as manifest_file:
+                manifest_file.write("{not json")
+            self.assertIsNone(DocManifest(path).get("Doc", "hash"))
+
+            with open(path, "w") as manifest_file:
+                manifest_file.write('{"version": 0, "sections": {"Doc": {"hash": "hash", "response": "old"}}}')
+            self.assertIsNone(DocManifest(path).get("Doc", "hash"))
+
+    def test_input_hash_covers_model_and_temperature(self):
+        base = DocManifest.input_hash("model", 0.2, "system", "prompt")
+        self.assertEqual(base, DocManifest.input_hash("model", 0.2, "system", "prompt"))
+        self.assertNotEqual(base, DocManifest.input_hash("other", 0.2, "system", "prompt"))
+        self.assertNotEqual(base, DocManifest.input_hash("model", 0.3, "system", "prompt"))
+        self.assertNotEqual(base, DocManifest.input_hash("model", 0.2, "system", "prompt changed"))
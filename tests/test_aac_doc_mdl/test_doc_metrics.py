@@ -0,0 +1,59 @@
+import json
+from os.path import exists
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from unittest import TestCase
+
+from aac_doc_mdl.doc_metrics import SOURCE_CACHE, SOURCE_MANIFEST, RequestStats, RunMetrics, measure, percentile
+
+
+class TestDocMetrics(TestCase):
+
+    def test_percentile(self):
+        self.assertEqual(0.0, percentile([], 0.5))
+        self.assertEqual(2.0, percentile([3.0, 1.0, 2.0, 4.0], 0.5))
+        self.assertEqual(19.0, percentile([float(value) for value in range(1, 21)], 0.95))
+        self.assertEqual(1.0, percentile([1.0], 0.95))
+
+    def test_request_stats_from_usage(self):
+        stats = RequestStats.from_usage(1.5, SimpleNamespace(prompt_tokens=100, completion_tokens=None), 2)
+
+        self.assertEqual((1.5, 100, 0, 2), (stats.seconds, stats.prompt_tokens, stats.completion_tokens, stats.retries))
+        self.assertEqual(0, RequestStats.from_usage(1.0, None).prompt_tokens)
+
+    def test_write_reports(self):
+        metrics = RunMetrics()
+        with measure(metrics, "parse"):
+            pass
+        with measure(None, "pdf"):
+            pass
+        metrics.record_section("Doc \"A\"", "Intro", RequestStats.from_usage(1.0, SimpleNamespace(prompt_tokens=10, completion_tokens=5), 1))
+        metrics.record_section("Doc \"A\"", "Intro/Scope", RequestStats.from_usage(3.0, SimpleNamespace(prompt_tokens=20, completion_tokens=5)))
+        metrics.record_section("Doc \"A\"", "Summary", RequestStats(SOURCE_CACHE))
+        metrics.record_section("Doc B", "Intro", RequestStats(SOURCE_MANIFEST))
+
+        with TemporaryDirectory() as output:
+            json_file_path, prometheus_file_path = metrics.write_reports(output, "doc")
+            with open(json_file_path) as json_file:
+                report = json.load(json_file)
+            with open(prometheus_file_path) as prometheus_file:
+                prometheus_text = prometheus_file.read()
+
+        summary = report["documents"]["Doc \"A\""]
+        self.assertEqual(3, summary["sections"])
+        self.assertEqual(2, summary["ai_requests"])
+        self.assertEqual((1.0, 3.0), (summary["latency_p50_seconds"], summary["latency_p95_seconds"]))
+        self.assertEqual((30, 10, 1, 1), (summary["prompt_tokens"], summary["completion_tokens"], summary["retries"], summary["cache_hits"]))
+        self.assertEqual(1, report["summary"]["manifest_hits"])
+        self.assertGreater(report["phase_seconds"]["parse"], 0.0)
+        self.assertEqual(0.0, report["phase_seconds"]["pdf"])
+
+        self.assertIn("# TYPE aac_doc_section_latency_seconds summary", prometheus_text)
+        self.assertIn('aac_doc_section_latency_seconds{document="Doc \\"A\\"",quantile="0.95"} 3.0', prometheus_text)
+        self.assertIn('aac_doc_tokens{document="Doc \\"A\\"",type="prompt"} 30', prometheus_text)
+        self.assertIn('aac_doc_sections{document="Doc B",source="manifest"} 1', prometheus_text)
+        self.assertFalse(exists(json_file_path))
+
+        message = metrics.get_summary_message()
+        self.assertTrue(message.startswith("Profile: 4 sections"))
+        self.assertIn("30 prompt and 10 completion tokens", message)
@@ -0,0 +1,110 @@
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+from pypdf import PdfReader, PdfWriter
+
+from aac_doc_mdl import doc_pdf
+from aac_doc_mdl.doc_pdf import get_heading_level, get_pdf_worker_settings, merge_pdf_chunks, split_markdown_chunks, split_markdown_sections, write_pdf
+
+
+def is_weasyprint_available() -> bool:
+    """Check if WeasyPrint and the native libraries it needs can be loaded."""
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+RENDER_SECTIONS = ["# Doc\n\nThe opening section.\n\n", "## One\n\nThe first section.\n\n", "## Two\n\nThe second section.\n\n"]
+
+
+def write_chunk_pdf(path: str, page_count: int, bookmarks: list[tuple[str, int, int]]):
+    """Write a PDF of blank pages with the given (title, page number, parent index) bookmarks."""
+    writer = PdfWriter()
+    for _ in range(page_count):
+        writer.add_blank_page(200, 200)
+    items = []
+    for title, page_number, parent_index in bookmarks:
+        parent = items[parent_index] if parent_index is not None else None
+        items.append(writer.add_outline_item(title, page_number, parent=parent))
+    with open(path, "wb") as pdf_file:
+        writer.write(pdf_file)
+
+
+def get_outline(reader: PdfReader, outline: list, depth: int = 0) -> list[tuple[int, str, int]]:
+    """Flatten the PDF bookmarks into their depth, title and page number."""
+    bookmarks = []
+    for item in outline:
+        if isinstance(item, list):
+            bookmarks.extend(get_outline(reader, item, depth + 1))
+        else:
+            bookmarks.append((depth, item.title, reader.get_destination_page_number(item)))
+    return bookmarks
+
+
+class TestDocPdf(TestCase):
+
+    def test_split_markdown_chunks(self):
+        text = "# Doc\n\nIntro\n## One\n\nText\n## Two\n\nMore\n"
+        self.assertEqual([text], split_markdown_chunks(text, None))
+        self.assertEqual(["# Doc\n\nIntro\n", "## One\n\nText\n", "## Two\n\nMore\n"], split_markdown_chunks(text, [0, 13, 26]))
+        self.assertEqual([text], split_markdown_chunks(text, [0, len(text)]))
+
+    def test_split_markdown_sections(self):
+        text = "# Doc\n\nIntro\n## One\n\nText\n### Sub\n\nMore\n## Two\n\n"
+        self.assertEqual([[text]], split_markdown_sections(text, None, None))
+        self.assertEqual(
+            [["# Doc\n\nIntro\n"], ["## One\n\nText\n", "### Sub\n\nMore\n"], ["## Two\n\n"]],
+            split_markdown_sections(text, [0, 13, 40], [0, 13, 26, 40, len(text)]),
+        )
+
+    def test_get_heading_level(self):
+        self.assertEqual(2, get_heading_level("\n## Section\n\n### Sub\n"))
+        self.assertEqual(1, get_heading_level("No headings here"))
+
+    def test_get_pdf_worker_settings_shares_memory_ceiling(self):
+        self.assertEqual((3, None), get_pdf_worker_settings(8, None, 3))
+        self.assertEqual((4, 1024), get_pdf_worker_settings(4, 4096, 10))
+        self.assertEqual((3, 512), get_pdf_worker_settings(8, 1536, 10))
+        self.assertEqual((1, 256), get_pdf_worker_settings(8, 256, 10))
+
+    def test_merge_pdf_chunks_numbers_pages_and_nests_bookmarks(self):
+        with TemporaryDirectory() as temp_dir:
+            chunk_paths = [join(temp_dir, f"{index}.pdf") for index in range(3)]
+            write_chunk_pdf(chunk_paths[0], 2, [("Doc", 0, None), ("Intro Heading", 1, 0)])
+            write_chunk_pdf(chunk_paths[1], 3, [("One", 0, None), ("One Sub", 2, 0)])
+            write_chunk_pdf(chunk_paths[2], 1, [("Two", 0, None)])
+            pdf_path = join(temp_dir, "doc.pdf")
+
+            merge_pdf_chunks(chunk_paths, [1, 2, 2], pdf_path)
+
+            reader = PdfReader(pdf_path)
+            self.assertEqual(6, len(reader.pages))
+            self.assertEqual(
+                [(0, "Doc", 0), (1, "Intro Heading", 1), (1, "One", 2), (2, "One Sub", 4), (1, "Two", 5)],
+                get_outline(reader, reader.outline),
+            )
+
+    @skipUnless(is_weasyprint_available(), "WeasyPrint or its native libraries are not installed")
+    def test_write_pdf_renders_chunks_on_their_own_pages(self):
+        with TemporaryDirectory() as temp_dir:
+            with open(join(temp_dir, "doc.md"), "w") as markdown_file:
+                markdown_file.write("".join(RENDER_SECTIONS))
+            section_offsets = [0]
+            for section in RENDER_SECTIONS:
+                section_offsets.append(section_offsets[-1] + len(section))
+
+            with patch.object(doc_pdf, "MIN_CHUNKED_CHARACTERS", 0):
+                write_pdf(temp_dir, "doc", section_offsets[:-1], 2, None, section_offsets)
+            reader = PdfReader(join(temp_dir, "doc.pdf"))
+            self.assertEqual(3, len(reader.pages))
+            self.assertEqual([(0, "Doc", 0), (1, "One", 1), (1, "Two", 2)], get_outline(reader, reader.outline))
+
+            # a short document is rendered in one piece, so its sections share a page
+            write_pdf(temp_dir, "doc", section_offsets[:-1], 2, None, section_offsets)
+            reader = PdfReader(join(temp_dir, "doc.pdf"))
+            self.assertEqual(1, len(reader.pages))
+            self.assertEqual([(0, "Doc", 0), (1, "One", 0), (1, "Two", 0)], get_outline(reader, reader.outline))
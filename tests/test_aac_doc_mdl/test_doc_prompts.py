@@ -0,0 +1,95 @@
+import os
+from unittest import TestCase
+from unittest.mock import patch
+
+from aac_doc_mdl.doc_prompts import DOCUMENT_PROMPT_TEMPLATE, PromptCompactor, PromptPacker, compact_view, estimate_tokens
+
+
+def make_view(test_count: int) -> dict:
+    """A section view whose tests all repeat the same requirements and criterion."""
+    reqs = [{"id": "REQ-001", "shall": "The document shall be short."}, {"id": "REQ-002", "shall": "The document shall be clear."}]
+    tests = [{"name": f"Test {index}", "reqs": reqs, "criteria": ["There is a summary.", f"Criterion {index}."]} for index in range(test_count)]
+    return {
+        "title": "Section",
+        "description": "A section.  It has a long description.",
+        "reqs": reqs[:1],
+        "sections": [{"title": "Child", "description": "The first sentence. The second sentence."}],
+        "content": [{"heading": "Content", "description": "Content description. More detail.", "tests": tests}],
+    }
+
+
+class TestDocPrompts(TestCase):
+
+    def test_compact_view(self):
+        view = compact_view(make_view(3))
+
+        self.assertEqual(["REQ-001", "REQ-002"], [req["id"] for req in view["reqs"]])
+        tests = view["content"][0]["tests"]
+        self.assertEqual([["REQ-001", "REQ-002"]] * 3, [test["req_ids"] for test in tests])
+        self.assertEqual(["There is a summary.", "Criterion 0."], tests[0]["criteria"])
+        self.assertEqual(["Criterion 2."], tests[2]["criteria"])
+
+    def test_create_prompt_lists_each_requirement_once(self):
+        compactor = PromptCompactor()
+        prompt = compactor.create_prompt("Instructions\n", make_view(20))
+        original_prompt = PromptCompactor(enabled=False).create_prompt("Instructions\n", make_view(20))
+
+        self.assertEqual(1, prompt.count("The document shall be clear."))
+        self.assertEqual(20, original_prompt.count("The document shall be clear."))
+        self.assertIn("Criterion 19.", prompt)
+        original_tokens, compacted_tokens, over_budget = compactor.get_counts()
+        self.assertAlmostEqual(estimate_tokens(original_prompt), original_tokens, delta=estimate_tokens(original_prompt) // 20)
+        self.assertEqual((estimate_tokens(prompt), 0), (compacted_tokens, over_budget))
+        self.assertIn("prompt tokens saved", compactor.get_stats_message())
+
+    def test_compaction_is_opt_in(self):
+        with patch.dict(os.environ, {"AAC_AI_PROMPT_COMPACTION": ""}):
+            self.assertFalse(PromptCompactor.from_env().enabled)
+        with patch.dict(os.environ, {"AAC_AI_PROMPT_COMPACTION": "true"}):
+            self.assertTrue(PromptCompactor.from_env().enabled)
+
+    def test_create_prompt_token_budget(self):
+        unlimited_prompt = PromptCompactor().create_prompt("Instructions\n", make_view(1))
+        compactor = PromptCompactor(token_budget=estimate_tokens(unlimited_prompt) - 5)
+        prompt = compactor.create_prompt("Instructions\n", make_view(1))
+
+        self.assertNotIn("The second sentence.", prompt)
+        self.assertIn("Child : The first sentence.", prompt)
+        self.assertIn("More detail.", prompt)
+        self.assertEqual(0, compactor.over_budget)
+
+        compactor = PromptCompactor(token_budget=10)
+        prompt = compactor.create_prompt("Instructions\n", make_view(1))
+
+        self.assertNotIn("More detail.", prompt)
+        self.assertIn("The document shall be clear.", prompt)
+        self.assertEqual(1, compactor.over_budget)
+        self.assertIn("1 prompts still over the 10 token budget", compactor.get_stats_message())
+
+    def test_prompt_packer_packs_small_siblings(self):
+        small = [f"{DOCUMENT_PROMPT_TEMPLATE}Title: Section {index}\n" for index in range(5)]
+        large = f"{DOCUMENT_PROMPT_TEMPLATE}Title: Large\n{'x' * 400}\n"
+        prompts = small[:2] + [large, "Custom instructions\nTitle: Custom\n"] + small[2:]
+        packer = PromptPacker(token_threshold=20, max_sections=2)
+
+        packs = packer.pack(prompts, ["parent", "parent", "parent", "parent", "other", "parent", "parent"])
+
+        self.assertEqual([[0, 1], [2], [3], [4], [5, 6]], packs)
+        self.assertEqual((2, 4, 0), packer.get_counts())
+        self.assertEqual([[index] for index in range(7)], PromptPacker().pack(prompts, ["parent"] * 7))
+
+        packed_prompt = packer.create_packed_prompt(small[:2])
+        self.assertEqual(1, packed_prompt.count(DOCUMENT_PROMPT_TEMPLATE))
+        self.assertIn("<<<SECTION 1>>>\nTitle: Section 0\n\n<<<SECTION 2>>>\nTitle: Section 1\n", packed_prompt)
+
+    def test_prompt_packer_splits_responses(self):
+        packer = PromptPacker(token_threshold=100)
+
+        self.assertEqual(["First", "Second\n\nMore"], packer.split_response("<<<SECTION 1>>>\nFirst\n<<<SECTION 2>>>\nSecond\n\nMore\n", 2))
+        self.assertEqual(["First", "Second"], packer.split_response("```markdown\n<<<SECTION 1>>>\nFirst\n<<<SECTION 2>>>\nSecond\n```", 2))
+        self.assertIsNone(packer.split_response("<<<SECTION 1>>>\nFirst\n", 2))
+        self.assertIsNone(packer.split_response("<<<SECTION 2>>>\nSecond\n<<<SECTION 1>>>\nFirst\n", 2))
+        self.assertIsNone(packer.split_response("Intro\n<<<SECTION 1>>>\nFirst\n<<<SECTION 2>>>\nSecond\n", 2))
+        self.assertIsNone(packer.split_response("<<<SECTION 1>>>\n<<<SECTION 2>>>\nSecond\n", 2))
+        self.assertEqual(8, packer.unpacked_sections)
+        self.assertIn("8 sections sent alone", packer.get_stats_message())
@@ -0,0 +1,41 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from aac_doc_mdl.doc_templates import OUTPUT_ENG_TEMPLATE, OUTPUT_MAIN_TEMPLATE, TEMPLATE_DIR, TemplateEngine, create_template_engine, get_template_engine
+
+
+class TestTemplateEngine(TestCase):
+
+    def test_templates_compiled_once_per_process(self):
+        engine = get_template_engine()
+
+        self.assertIs(engine, get_template_engine())
+        self.assertIs(engine.get_template(OUTPUT_MAIN_TEMPLATE), engine.get_template(OUTPUT_MAIN_TEMPLATE))
+
+    def test_render_is_timed(self):
+        engine = TemplateEngine(TEMPLATE_DIR)
+
+        text = engine.render(OUTPUT_MAIN_TEMPLATE, {"title": "Title", "generated": "Body"})
+
+        self.assertEqual("# Title\n\nBody", text)
+        self.assertEqual(1, engine.render_count)
+        self.assertGreater(engine.render_seconds, 0)
+
+    def test_compiled_templates_are_stored_for_later_processes(self):
+        with TemporaryDirectory() as temp_dir:
+            TemplateEngine(TEMPLATE_DIR, temp_dir).get_template(OUTPUT_MAIN_TEMPLATE)
+            self.assertEqual(1, len(os.listdir(temp_dir)))
+
+            engine = TemplateEngine(TEMPLATE_DIR, temp_dir)
+            self.assertEqual("# Title\n\nBody", engine.render(OUTPUT_MAIN_TEMPLATE, {"title": "Title", "generated": "Body"}))
+
+    def test_override_templates_replace_the_templates_with_the_same_names(self):
+        with TemporaryDirectory() as temp_dir:
+            with open(os.path.join(temp_dir, OUTPUT_MAIN_TEMPLATE), "w") as template_file:
+                template_file.write("## {{ title }}")
+
+            engine = create_template_engine(temp_dir)
+
+            self.assertEqual("## Title", engine.render(OUTPUT_MAIN_TEMPLATE, {"title": "Title", "generated": "Body"}))
+            self.assertEqual(os.path.join(TEMPLATE_DIR, OUTPUT_ENG_TEMPLATE), engine.get_template(OUTPUT_ENG_TEMPLATE).filename)
@@ -0,0 +1,59 @@
+import json
+from os import listdir
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from aac_doc_mdl.doc import VCRM, Req, VcrmTrace
+from aac_doc_mdl.doc_vcrm import parse_vcrm_formats, write_vcrm
+
+
+def create_vcrm() -> VCRM:
+    """Create a VCRM with a repeated section, a requirement traced through a scenario and an untraced requirement."""
+    reqs = [Req(id="REQ,1", shall="It shall."), Req(id="REQ-2", shall="It shall."), Req(id="REQ-3", shall="It shall.")]
+    traces = [
+        VcrmTrace(title="One", req_ids=["REQ,1", "REQ-2"], sources=[("", ""), ("Behavior", "Scenario")]),
+        VcrmTrace(title="Two", req_ids=["REQ-2"]),
+        VcrmTrace(title="One", req_ids=["REQ,1", "REQ-2"], sources=[("", ""), ("Behavior", "Scenario")]),
+    ]
+    return VCRM(all_reqs=reqs, all_sections=[trace.title for trace in traces], traces=traces)
+
+
+class TestDocVcrm(TestCase):
+
+    def test_parse_vcrm_formats(self):
+        self.assertEqual(["summary", "edges"], parse_vcrm_formats(" Summary, edges,summary"))
+        self.assertRaises(ValueError, parse_vcrm_formats, "matrix,grid")
+        self.assertRaises(ValueError, parse_vcrm_formats, " , ")
+
+    def test_write_vcrm_sparse_formats(self):
+        with TemporaryDirectory() as temp_dir:
+            output_files = write_vcrm(create_vcrm(), join(temp_dir, "doc"), ["edges", "edges-jsonl", "summary"])
+            self.assertEqual(["doc-vcrm-edges.csv", "doc-vcrm-edges.jsonl", "doc-vcrm-summary.csv"], sorted(listdir(temp_dir)))
+            self.assertEqual(3, len(output_files))
+            with open(join(temp_dir, "doc-vcrm-edges.csv"), newline="") as csv_file:
+                edges_csv = csv_file.read()
+            with open(join(temp_dir, "doc-vcrm-edges.jsonl")) as jsonl_file:
+                edges = [json.loads(line) for line in jsonl_file]
+            with open(join(temp_dir, "doc-vcrm-summary.csv"), newline="") as csv_file:
+                summary_csv = csv_file.read()
+
+        self.assertEqual(
+            'Requirement,Document Section,Behavior,Scenario\r\n"REQ,1",One,,\r\nREQ-2,One,Behavior,Scenario\r\n'
+            'REQ-2,Two,,\r\n"REQ,1",One,,\r\nREQ-2,One,Behavior,Scenario\r\n',
+            edges_csv,
+        )
+        self.assertEqual(5, len(edges))
+        self.assertEqual({"req_id": "REQ,1", "section": "One", "behavior": None, "scenario": None}, edges[0])
+        self.assertEqual({"req_id": "REQ-2", "section": "One", "behavior": "Behavior", "scenario": "Scenario"}, edges[1])
+        self.assertEqual(
+            'Requirement,Traces,Section Count,Document Sections\r\n"REQ,1",2,1,One\r\nREQ-2,3,2,One; Two\r\nREQ-3,0,0,\r\n',
+            summary_csv,
+        )
+
+    def test_write_vcrm_matrix_format(self):
+        with TemporaryDirectory() as temp_dir:
+            write_vcrm(create_vcrm(), join(temp_dir, "doc"), ["matrix"])
+            self.assertEqual(["doc-vcrm.csv", "doc-vcrm.md"], sorted(listdir(temp_dir)))
+            with open(join(temp_dir, "doc-vcrm.md")) as md_file:
+                self.assertIn("|REQ-2|X|X|X|\n|REQ-3|-|-|-|\n", md_file.read())
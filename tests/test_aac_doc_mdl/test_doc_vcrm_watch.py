@@ -0,0 +1,112 @@
+import os
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from aac.context.language_context import LanguageContext
+
+from aac_doc_mdl.definition_snapshot import parse_and_load
+from aac_doc_mdl.doc_vcrm_watch import VcrmWatcher, _unload
+
+
+DOCUMENT_FILE = """import:
+  files:
+    - ./watch_reqs.aac
+    - ./watch_section.aac
+---
+model:
+  name: Watch Document
+  description: A document that is watched.
+  components:
+    - name: section
+      model: Watch Section
+"""
+
+SECTION_FILE = """model:
+  name: Watch Section
+  description: A section that is watched.
+  requirements:
+    - {req_id}
+"""
+
+REQ_FILE = """req:
+  name: Watch Req {number}
+  id: WCH-00{number}
+  shall: The watched document shall {shall}.
+"""
+
+
+def write_file(file_path: str, content: str) -> None:
+    """Write a file, moving its modification time on so every write is seen as a change."""
+    modified = os.stat(file_path).st_mtime_ns + 1_000_000 if os.path.exists(file_path) else None
+    with open(file_path, "w") as architecture_file:
+        architecture_file.write(content)
+    if modified is not None:
+        os.utime(file_path, ns=(modified, modified))
+
+
+def read_summary(temp_dir: str) -> list[str]:
+    """Read the lines of the summary VCRM after its header."""
+    with open(join(temp_dir, "watch-vcrm-summary.csv")) as summary_file:
+        return summary_file.read().splitlines()[1:]
+
+
+class TestDocVcrmWatch(TestCase):
+
+    def test_watcher_reloads_changed_files(self):
+        with TemporaryDirectory() as temp_dir:
+            document_file = join(temp_dir, "watch_document.aac")
+            write_file(document_file, DOCUMENT_FILE)
+            write_file(join(temp_dir, "watch_section.aac"), SECTION_FILE.format(req_id="WCH-001"))
+            write_file(join(temp_dir, "watch_reqs.aac"), REQ_FILE.format(number=1, shall="be watched"))
+            with patch.dict(os.environ, {"AAC_DEFINITION_CACHE": "false"}):
+                definitions = parse_and_load(document_file)
+
+            watcher = VcrmWatcher("Watch Document", document_file, definitions, False, join(temp_dir, "watch"), ["summary"])
+            self.assertEqual(3, watcher.file_count)
+            self.assertIn("a complete trace", watcher.write())
+            self.assertEqual(["WCH-001,1,1,Watch Section"], read_summary(temp_dir))
+            self.assertIsNone(watcher.poll())
+
+            # saving a file without editing it does not rewrite the VCRM
+            write_file(join(temp_dir, "watch_reqs.aac"), REQ_FILE.format(number=1, shall="be watched"))
+            self.assertIsNone(watcher.poll())
+
+            # a section refers to a requirement that is not defined yet, then it is defined in a newly imported file
+            write_file(join(temp_dir, "watch_section.aac"), SECTION_FILE.format(req_id="WCH-002"))
+            self.assertIsNotNone(watcher.poll())
+            self.assertEqual([], read_summary(temp_dir))
+            write_file(join(temp_dir, "watch_more_reqs.aac"), REQ_FILE.format(number=2, shall="be imported"))
+            write_file(join(temp_dir, "watch_reqs.aac"), "import:\n  files:\n    - ./watch_more_reqs.aac\n---\n" + REQ_FILE.format(number=1, shall="be watched"))
+            messages = watcher.poll()
+            self.assertIn("after changes to 1 files", messages[-1])
+            self.assertEqual(4, watcher.file_count)
+            self.assertEqual(["WCH-002,1,1,Watch Section"], read_summary(temp_dir))
+            self.assertEqual("The watched document shall be imported.", watcher.model_graph.req_index.get("WCH-002").shall)
+
+            # a file that cannot be parsed keeps its definitions, and a file no longer imported is unloaded
+            write_file(join(temp_dir, "watch_section.aac"), "model: [\n")
+            self.assertIn("Unable to parse", watcher.poll()[0])
+            self.assertEqual(["WCH-002,1,1,Watch Section"], read_summary(temp_dir))
+            write_file(join(temp_dir, "watch_reqs.aac"), REQ_FILE.format(number=1, shall="be watched"))
+            watcher.poll()
+            self.assertEqual(3, watcher.file_count)
+            self.assertIsNone(watcher.model_graph.req_index.get("WCH-002"))
+
+    def test_unload_matches_the_language_context_internals(self):
+        context = LanguageContext()
+        req, model = context.parse_and_load(REQ_FILE.format(number=9, shall="be unloaded") + "---\n" + SECTION_FILE.format(req_id="WCH-009"))
+
+        # _unload relies on how aac 0.4 stores loaded definitions, which has no public API to remove requirements
+        names_to_definitions = context.context_instance.fully_qualified_name_to_definition
+        self.assertIs(req, names_to_definitions[f"{req.package}.{req.name}_WCH-009"])
+        self.assertIs(model, names_to_definitions[f"{model.package}.{model.name}"])
+        self.assertIn(req, context.context_instance.definitions)
+
+        _unload(context, [req, model])
+
+        self.assertNotIn(req, context.get_definitions_by_root("req"))
+        self.assertEqual([], context.get_definitions_by_name("Watch Section"))
+        self.assertNotIn(req, context.context_instance.definitions)
+        self.assertFalse(req.source.is_loaded_in_context)
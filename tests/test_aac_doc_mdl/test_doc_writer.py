@@ -0,0 +1,44 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from aac_doc_mdl.doc_writer import StreamingDocWriter
+
+
+class TestStreamingDocWriter(TestCase):
+
+    def test_sections_written_in_document_order(self):
+        with TemporaryDirectory() as temp_dir:
+            writer = StreamingDocWriter(temp_dir, "doc")
+            for position in [2, 0, 3, 1, 5, 4]:
+                writer.write_section(position, f"section {position}\n")
+                if position == 0:
+                    with open(writer.partial_file_path) as partial_file:
+                        self.assertEqual("section 0\n", partial_file.read())
+            self.assertEqual([len(f"section {position}\n") * position for position in range(6)], writer.section_offsets)
+            md_file_path = writer.close()
+
+            with open(md_file_path) as md_file:
+                self.assertEqual("".join(f"section {position}\n" for position in range(6)), md_file.read())
+            self.assertEqual(["doc.md"], os.listdir(temp_dir))
+
+    def test_missing_section_fails_close(self):
+        with TemporaryDirectory() as temp_dir:
+            writer = StreamingDocWriter(temp_dir, "doc")
+            writer.write_section(0, "section 0\n")
+            writer.write_section(2, "section 2\n")
+
+            self.assertRaises(ValueError, writer.close)
+            self.assertFalse(os.path.exists(os.path.join(temp_dir, "doc.md")))
+
+    def test_failed_generation_keeps_completed_sections(self):
+        with TemporaryDirectory() as temp_dir:
+            with self.assertRaises(RuntimeError):
+                with StreamingDocWriter(temp_dir, "doc") as writer:
+                    writer.write_section(0, "section 0\n")
+                    writer.write_section(2, "section 2\n")
+                    raise RuntimeError("AI unavailable")
+
+            with open(writer.partial_file_path) as partial_file:
+                self.assertEqual("section 0\n", partial_file.read())
+            self.assertEqual(["2.md"], os.listdir(writer.spill_dir))
@@ -1,6 +1,11 @@
+import os
 from click.testing import CliRunner
+from os.path import dirname, join
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
 from typing import Tuple
 from unittest import TestCase
+from unittest.mock import patch
 
 from aac.execute.aac_execution_result import ExecutionStatus
 from aac.execute.command_line import cli, initialize_cli
@@ -10,7 +15,13 @@ from aac_doc_mdl.document_model_impl import (
     gen_doc_outline,
     gen_doc_draft,
     gen_doc_vcrm,
+    gen_doc_render,
 )
+from aac_doc_mdl.doc import Doc, ReqIndex
+from aac_doc_mdl.doc_schema import doc_to_json
+
+
+TRADE_STUDY_FILE = join(dirname(dirname(__file__)), "samples", "trade_study", "doc", "cookie_trade_study.aac")
 
 
 class TestDocumentModel(TestCase):
@@ -137,3 +148,38 @@ class TestDocumentModel(TestCase):
         )  # asserts the command did not run successfully
         self.assertTrue(len(output_message) > 0)  # asserts the command produced output
         # TODO:  assert the output message contains correct failure message
+
+    def test_gen_doc_draft_invalid_setting(self):
+        with TemporaryDirectory() as temp_dir, patch.dict(os.environ, {"AAC_AI_RUN_DEADLINE": "ten"}):
+            result = gen_doc_draft("Cookie Trade Study", TRADE_STUDY_FILE, True, temp_dir, False, False, 0.2, 1, None, None, False, False)
+
+        self.assertEqual(ExecutionStatus.GENERAL_FAILURE, result.status_code)
+        self.assertEqual(["The AAC_AI_RUN_DEADLINE environment variable must be a number, not 'ten'."], [message.message for message in result.messages])
+
+    def test_gen_doc_render(self):
+        reqs = [SimpleNamespace(id="RND-002", shall="The child shall.", parents=["RND-001"]), SimpleNamespace(id="RND-001", shall="The parent shall.", parents=[])]
+        req_index = ReqIndex(True, reqs)
+        doc = Doc(title="Rendered", description="A rendered document.", generated="Generated text", output="", reqs=req_index.lookup("RND-002"))
+
+        with TemporaryDirectory() as temp_dir:
+            doc_file = join(temp_dir, "rendered-draft-doc.json")
+            with open(doc_file, "w") as doc_tree_file:
+                doc_tree_file.write(doc_to_json(doc, req_index))
+
+            # a document generated with parent requirements keeps them without the flag
+            result = gen_doc_render(doc_file, temp_dir, True, False, False)
+            self.assertEqual(ExecutionStatus.SUCCESS, result.status_code)
+            with open(join(temp_dir, "rendered-draft.md")) as markdown_file:
+                markdown = markdown_file.read()
+            self.assertIn("Generated text", markdown)
+            self.assertIn("RND-001", markdown)
+
+            gen_doc_render(doc_file, temp_dir, True, False, False, True)
+            with open(join(temp_dir, "rendered-draft.md")) as markdown_file:
+                markdown = markdown_file.read()
+            self.assertIn("RND-002", markdown)
+            self.assertNotIn("RND-001", markdown)
+
+            self.assertEqual(ExecutionStatus.GENERAL_FAILURE, gen_doc_render(doc_file, temp_dir, True, False, True, True).status_code)
+            self.assertEqual(ExecutionStatus.GENERAL_FAILURE, gen_doc_render(join(temp_dir, "missing-doc.json"), temp_dir, True, False, False).status_code)
+
@@ -0,0 +1,27 @@
+import os
+from unittest import TestCase
+from unittest.mock import patch
+
+from aac_doc_mdl.env_settings import EnvSettingError, check_env_settings, get_env_number
+
+
+class TestEnvSettings(TestCase):
+
+    def test_get_env_number(self):
+        with patch.dict(os.environ, {"AAC_AI_RUN_DEADLINE": "2.5", "AAC_AI_PROMPT_TOKEN_BUDGET": "6.0", "AAC_PDF_WORKERS": ""}):
+            self.assertEqual(2.5, get_env_number("AAC_AI_RUN_DEADLINE", None))
+            self.assertEqual(6, get_env_number("AAC_AI_PROMPT_TOKEN_BUDGET", None))
+            self.assertIsInstance(get_env_number("AAC_AI_PROMPT_TOKEN_BUDGET", None), int)
+            self.assertEqual(4, get_env_number("AAC_PDF_WORKERS", 4))
+
+    def test_invalid_settings_are_reported(self):
+        with patch.dict(os.environ, {"AAC_AI_RUN_DEADLINE": "ten", "AAC_AI_PROMPT_TOKEN_BUDGET": "2.5"}):
+            with self.assertRaisesRegex(EnvSettingError, "AAC_AI_RUN_DEADLINE environment variable must be a number, not 'ten'"):
+                get_env_number("AAC_AI_RUN_DEADLINE", None)
+            self.assertEqual(
+                [
+                    "The AAC_AI_RUN_DEADLINE environment variable must be a number, not 'ten'.",
+                    "The AAC_AI_PROMPT_TOKEN_BUDGET environment variable must be a whole number, not '2.5'.",
+                ],
+                check_env_settings(),
+            )
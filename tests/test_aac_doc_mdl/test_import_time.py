@@ -0,0 +1,31 @@
+import json
+import subprocess
+import sys
+from unittest import TestCase
+
+
+# the time importing the plugin may add to every aac command, on top of aac's own imports
+IMPORT_BUDGET_SECONDS = 0.1
+
+HEAVY_MODULES = ["openai", "httpx", "weasyprint", "markdown2", "pypdf", "pydantic", "jinja2", "aac_doc_mdl.document_model_impl"]
+
+MEASURE_IMPORT = f"""
+import json, sys, time
+import aac.context.language_context, aac.execute.plugin_runner, aac.execute.aac_execution_result
+already_imported = set(sys.modules)
+start = time.perf_counter()
+import aac_doc_mdl
+elapsed = time.perf_counter() - start
+imported = [name for name in {HEAVY_MODULES!r} if name in sys.modules and name not in already_imported]
+print(json.dumps({{"elapsed": elapsed, "imported": imported}}))
+"""
+
+
+class TestImportTime(TestCase):
+
+    def test_plugin_import_defers_heavy_dependencies(self):
+        output = subprocess.run([sys.executable, "-c", MEASURE_IMPORT], capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.splitlines()[-1])
+
+        self.assertEqual([], result["imported"])
+        self.assertLess(result["elapsed"], IMPORT_BUDGET_SECONDS)